@@ -1,251 +1,199 @@
 import streamlit as st
-import serial
+import io
 import json
-import re
-import plotly.graph_objects as go
-import time
 from collections import deque
-from streamlit_lottie import st_lottie
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+from datetime import datetime, timedelta
+from functools import partial
 import numpy as np
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from pymongo import MongoClient
-from datetime import datetime
-from cryptography.fernet import Fernet
-import os
-from dotenv import load_dotenv
+from heartbot.config import (
+    SERIAL_PORT, SERIAL_BAUD, SERIAL_PROTOCOL, SERIAL_BUFFER_SIZE, LIVE_REFRESH_SECONDS, MAX_READINGS,
+    LIVE_CHART_MODE, LIVE_CHART_FPS, LIVE_CHART_WINDOW, LIVE_WAVEFORM_SECONDS, LIVE_WAVEFORM_POINTS, LIVE_SLICE_SECONDS, STATS_WINDOW_SECONDS, HISTORY_MAX_POINTS,
+    BPM_SOURCE, GATEWAY_HOST, GATEWAY_PORT, METRICS_HOST, METRICS_PORT, ADMIN_USERS, CURATOR_USERS,
+)
+from heartbot.serial_reader import SerialReader, GatewaySubscriber
+from heartbot.crypto import KEY_GENERATED
+from heartbot.auth import issue_token, verify_token
+from heartbot.chatbot import get_chatbot
+from heartbot.bpm_stats import BpmMonitor
+from heartbot.export import MIME_TYPES, export_bpm
+from heartbot.history import history_series, lttb
+from heartbot.metrics import count, set_gauge, start_http_server, timed
+from heartbot.db import get_db, revoke_tokens, token_generation, CHAT_MESSAGES, BPM_BUCKETS
+from heartbot.storage import (
+    new_session_id, append_bpm_samples, load_bpm_samples, latest_bpm_session, bpm_time_range,
+    append_chat_messages, load_chat_page,
+)
 
 # ====================== LOAD ENV & ENCRYPTION ======================
-load_dotenv()
-
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "").strip()
-if not ENCRYPTION_KEY or len(ENCRYPTION_KEY) != 44:
-    ENCRYPTION_KEY = Fernet.generate_key().decode()
-    with open(".env", "w") as f:
-        f.write(f"ENCRYPTION_KEY={ENCRYPTION_KEY}\n")
-        f.write("MONGODB_URI=mongodb://localhost:27017/heartbot\n")
+if KEY_GENERATED:
     st.success("NEW ENCRYPTION KEY GENERATED & SAVED!")
-else:
-    pass  # Clean UI
-
-cipher_suite = Fernet(ENCRYPTION_KEY.encode())
-
-def encrypt_data(data):
-    if isinstance(data, list):
-        data_str = json.dumps(data)
-        return cipher_suite.encrypt(data_str.encode()).decode()
-    return cipher_suite.encrypt(str(data).encode()).decode()
-
-def decrypt_data(encrypted_data):
-    try:
-        decrypted = cipher_suite.decrypt(encrypted_data.encode()).decode()
-        return json.loads(decrypted) if decrypted.startswith('[') else decrypted
-    except:
-        return []
 
 # ====================== MONGODB SETUP ======================
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/heartbot")
-DB_NAME = "heartbot_db"
+db = get_db()
+chat_collection = db[CHAT_MESSAGES]
+readings_collection = db[BPM_BUCKETS]
 
+# ====================== METRICS ======================
 @st.cache_resource
-def get_mongo_client():
-    return MongoClient(MONGODB_URI)
-
-client = get_mongo_client()
-db = client[DB_NAME]
-chat_collection = db["chat_history"]
-readings_collection = db["bpm_readings"]
-
-def save_chat_history(username, chat_history):
-    if chat_history:
-        encrypted = encrypt_data(chat_history)
-        chat_collection.delete_many({"username": username})
-        chat_collection.insert_one({
-            "username": username,
-            "timestamp": datetime.now(),
-            "chat": encrypted
-        })
-
-def load_chat_history(username):
-    doc = chat_collection.find_one({"username": username})
-    return decrypt_data(doc["chat"]) if doc and "chat" in doc else []
-
-def save_bpm_readings(username, readings):
-    if readings:
-        encrypted = encrypt_data(readings)
-        readings_collection.delete_many({"username": username})
-        readings_collection.insert_one({
-            "username": username,
-            "timestamp": datetime.now(),
-            "readings": encrypted
-        })
-
-def load_bpm_readings(username):
-    doc = readings_collection.find_one({"username": username})
-    return decrypt_data(doc["readings"]) if doc and "readings" in doc else []
-
-# ====================== NLTK & MODEL ======================
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
+def start_metrics_endpoint():
+    # One Prometheus /metrics server per process, whatever the number of sessions
+    return start_http_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
 
-@st.cache_resource
-def load_model():
-    return SentenceTransformer('all-MiniLM-L6-v2')
-
-model = load_model()
-
-faq = [
-    {"question": "Hello!", "answer": "Hey there! Welcome to HeartBot, your AI heart health buddy. How can I help you today?"},
-    {"question": "Hi!", "answer": "Hi! Glad you're here with HeartBot. What's on your mind about your heart?"},
-    {"question": "Good morning!", "answer": "Good morning! Nice to see you. How can HeartBot assist you with your heart health today?"},
-    {"question": "Good afternoon!", "answer": "Good afternoon! I'm HeartBot, here to help. What would you like to know about your heart?"},
-    {"question": "Good evening!", "answer": "Good evening! Welcome to HeartBot. How can I support your heart health tonight?"},
-    {"question": "What is normal BPM?", "answer": "A normal heart rate is between 60 and 100 BPM when you're resting."},
-    {"question": "What is bpm?", "answer": "BPM means 'beats per minute' — how many times your heart beats in one minute."},
-    {"question": "My heart rate is 120, is that bad?", "answer": "120 BPM is a bit high if you're resting. Try sitting calmly and taking deep breaths. If it stays high, you should talk to a doctor."},
-    {"question": "What happens if my bpm is too low?", "answer": "If your BPM is below 60 and you feel dizzy or tired, you should get it checked. But some fit people naturally have low BPM."},
-    {"question": "Why does my heart beat fast sometimes?", "answer": "It can happen due to stress, fear, exercise, or caffeine. Usually it's normal if it slows down after some rest."},
-    {"question": "How can I calm my heart rate?", "answer": "Sit down, relax, take slow deep breaths, and drink some water. Avoid stress or caffeine."},
-    {"question": "Does coffee increase bpm?", "answer": "Yes! Coffee has caffeine, which can make your heart beat faster for a while."},
-    {"question": "Why does my heart race when I'm scared?", "answer": "That's normal! Your body releases adrenaline when you're scared, making your heart beat faster."},
-    {"question": "What should I do if my heart rate is too high?", "answer": "Sit quietly, breathe slowly, and relax. If it doesn't come down or you feel unwell, contact a doctor."},
-    {"question": "Is 70 bpm good?", "answer": "Yes! 70 BPM is perfectly normal for most people."},
-    {"question": "What is a healthy heart rate for adults?", "answer": "Most adults have a healthy resting heart rate between 60 and 100 BPM."},
-    {"question": "Can emotions change heart rate?", "answer": "Yes! Happiness, anger, or fear can make your heart beat faster or slower."},
-    {"question": "Does exercise increase bpm?", "answer": "Yes. When you exercise, your heart beats faster to send oxygen to your muscles."},
-    {"question": "Why does my heart beat fast after climbing stairs?", "answer": "That's normal! Your body needs more oxygen, so your heart beats faster to keep up."},
-    {"question": "Can dehydration cause fast heart rate?", "answer": "Yes, if you're dehydrated your heart works harder to pump blood, so BPM can go up."},
-    {"question": "Can I check my bpm with my finger?", "answer": "Yes, you can feel your pulse on your wrist or neck and count beats for 60 seconds."},
-    {"question": "What causes irregular heartbeats?", "answer": "Irregular heartbeats can be caused by stress, lack of sleep, alcohol, or medical conditions like arrhythmia. Consult a doctor if it persists."},
-    {"question": "Is it normal to feel my heart pounding?", "answer": "Yes, if you're active or excited, but if it happens at rest or with dizziness, see a doctor."},
-    {"question": "How can I improve my heart health?", "answer": "Eat a balanced diet, exercise regularly, avoid smoking, and manage stress for better heart health."},
-    {"question": "What is a heart attack?", "answer": "A heart attack occurs when blood flow to the heart is blocked. Symptoms include chest pain, shortness of breath—seek emergency help immediately."},
-    {"question": "What are signs of a heart attack?", "answer": "Look for chest pain, shortness of breath, arm or jaw discomfort, or nausea—call emergency services (e.g., 108 in India) right away if you notice these."},
-    {"question": "Should I exercise if my heart rate is high?", "answer": "No, rest and hydrate. If it doesn't normalize, contact a doctor or emergency services."},
-    {"question": "What to do if I feel chest pain?", "answer": "Stop what you're doing, sit down, and call emergency services (e.g., 108 in India) if the pain lasts more than a few minutes or worsens."}
-]
-
-def update_faq_embeddings():
-    dynamic = st.session_state.get("dynamic_faq", [])
-    all_faq = faq + dynamic
-    questions = [item['question'] for item in all_faq]
-    q_embeddings = model.encode(questions)
-    return all_faq, questions, q_embeddings
+start_metrics_endpoint()
+
+def load_older_chat():
+    older, st.session_state.chat_cursor = load_chat_page(
+        chat_collection, st.session_state.username, before=st.session_state.chat_cursor
+    )
+    st.session_state.chat_history = older + st.session_state.chat_history
+
+def save_new_readings():
+    # Append only what arrived since the last save to the current session.
+    # With BPM_SOURCE=gateway the gateway has already stored them.
+    if BPM_SOURCE == "gateway":
+        return
+    saved = st.session_state.saved_count
+    new = list(zip(st.session_state.reading_times[saved:], st.session_state.readings[saved:]))
+    if new:
+        append_bpm_samples(readings_collection, st.session_state.username, st.session_state.session_id, new)
+        st.session_state.saved_count = len(st.session_state.readings)
+
+def load_latest_session(username):
+    session = latest_bpm_session(readings_collection, username)
+    if session is None:
+        return new_session_id(), []
+    return session, load_bpm_samples(readings_collection, username, session=session)
 
 # ====================== PAGE CONFIG ======================
 st.set_page_config(page_title="HeartBot Live", page_icon="Heart", layout="wide")
 st.markdown("<style>[data-testid='stSidebarNav'] {display: none;}</style>", unsafe_allow_html=True)
 
 # ====================== LOGIN CHECK ======================
+# A reload starts a new session: the signed token in the URL restores the login
+if not st.session_state.get("logged_in"):
+    token_user = verify_token(st.query_params.get("session"), partial(token_generation, db))
+    if token_user:
+        st.session_state.logged_in = True
+        st.session_state.username = token_user
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
     st.error("Please log in to access the dashboard.")
     st.markdown("[Go to Login](./login)")
     st.stop()
 
+# ====================== CHATBOT WARM-UP ======================
+# Loads in the background; one per process, shared by every session and page
+bot = get_chatbot()
+
 # ====================== SESSION INIT ======================
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = load_chat_history(st.session_state.username)
-if "dynamic_faq" not in st.session_state:
-    st.session_state.dynamic_faq = []
+    st.session_state.chat_history, st.session_state.chat_cursor = load_chat_page(chat_collection, st.session_state.username)
 if "context" not in st.session_state:
     st.session_state.context = ""
-if "count" not in st.session_state:
-    st.session_state.count = 0
-if "x_data" not in st.session_state:
-    st.session_state.x_data = deque(maxlen=50)
-if "y_data" not in st.session_state:
-    st.session_state.y_data = deque(maxlen=50)
 if "readings" not in st.session_state:
-    st.session_state.readings = load_bpm_readings(st.session_state.username)
-
-# Load previous data if exists
-if st.session_state.readings:
-    st.session_state.count = len(st.session_state.readings)
-    st.session_state.x_data = deque(range(1, st.session_state.count + 1), maxlen=50)
-    st.session_state.y_data = deque(st.session_state.readings, maxlen=50)
-
-# Update embeddings
-all_faq, questions, q_embeddings = update_faq_embeddings()
+    st.session_state.session_id, samples = load_latest_session(st.session_state.username)
+    st.session_state.reading_times = [t for t, _ in samples]
+    st.session_state.readings = [bpm for _, bpm in samples]
+    st.session_state.saved_count = len(samples)
+    st.session_state.count = len(samples)
+    st.session_state.x_data = deque(range(1, len(samples) + 1), maxlen=LIVE_CHART_WINDOW)
+    st.session_state.y_data = deque(st.session_state.readings, maxlen=LIVE_CHART_WINDOW)
+if "bpm_stats" not in st.session_state:
+    st.session_state.bpm_stats = BpmMonitor()
+    for t, bpm in zip(st.session_state.reading_times, st.session_state.readings):
+        st.session_state.bpm_stats.add(t, bpm)
 
 # ====================== CHATBOT FUNCTIONS ======================
-def preprocess_input(text):
-    lemmatizer = WordNetLemmatizer()
-    stop_words = set(stopwords.words('english'))
-    tokens = word_tokenize(text.lower())
-    tokens = [lemmatizer.lemmatize(t) for t in tokens if t.isalnum() and t not in stop_words]
-    return ' '.join(tokens)
-
 def get_answer(user_input):
-    global all_faq, questions, q_embeddings
-    processed = preprocess_input(user_input)
-    u_emb = model.encode([processed])
-    sims = cosine_similarity(u_emb, q_embeddings)[0]
-    idx = np.argmax(sims)
-    
-    if sims[idx] < 0.5:
-        fallback = "I'm not sure about that, but it sounds important! Can you tell me more?"
+    processed = bot.preprocess(user_input)
+    best, score = bot.best_match(processed, bot.faq_index)
+    st.session_state.last_confidence = score
+
+    if score < 0.5:
         if len(processed) > 10:
-            st.session_state.dynamic_faq.append({"question": user_input, "answer": fallback})
-            all_faq, questions, q_embeddings = update_faq_embeddings()
-        return fallback
+            # Counted in the shared learned FAQ for curators to answer
+            bot.learn(user_input, processed)
+        return "I'm not sure about that, but it sounds important! Can you tell me more?"
     
     st.session_state.context = processed
-    return all_faq[idx]['answer']
+    return best['answer']
 
 def send_message():
     user_input = st.session_state.chat_input.strip()
-    if user_input:
+    if user_input and bot.is_ready:
         reply = get_answer(user_input)
-        st.session_state.chat_history.append(("You", user_input))
-        st.session_state.chat_history.append(("HeartBot", reply))
-        save_chat_history(st.session_state.username, st.session_state.chat_history)
+        messages = [("You", user_input), ("HeartBot", reply)]
+        st.session_state.chat_history.extend(messages)
+        append_chat_messages(chat_collection, st.session_state.username, messages)
         st.session_state.chat_input = ""
 
 # ====================== SIDEBAR ======================
 col1, col2 = st.sidebar.columns(2)
 with col1:
     if st.button("Logout"):
+        revoke_tokens(db, st.session_state.username)  # the token left in the browser history stops working
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.session_state.logged_in = False
+        st.query_params.clear()  # drop the session token
         st.switch_page("pages/login.py")
 with col2:
     if st.button("Restart"):
-        if st.session_state.get("ser") and st.session_state.ser.is_open:
-            st.session_state.ser.close()
-            st.session_state.ser = None
+        if st.session_state.get("reader"):
+            st.session_state.reader.stop()
+            st.session_state.reader = None
+        st.session_state.pop("reader_error", None)
+        st.session_state.pop("hrv", None)
         st.session_state.chat_history = []
+        st.session_state.chat_cursor = None
         st.session_state.count = 0
-        st.session_state.x_data = deque(maxlen=50)
-        st.session_state.y_data = deque(maxlen=50)
+        st.session_state.x_data = deque(maxlen=LIVE_CHART_WINDOW)
+        st.session_state.y_data = deque(maxlen=LIVE_CHART_WINDOW)
         st.session_state.readings = []
+        st.session_state.reading_times = []
+        st.session_state.saved_count = 0
+        st.session_state.bpm_stats = BpmMonitor()
+        st.session_state.session_id = new_session_id()
         st.rerun()
 
 st.sidebar.title(f"HeartBot - {st.session_state.username}")
 st.sidebar.markdown("**Your AI Heart Health Companion**")
+if st.session_state.username in ADMIN_USERS:
+    st.sidebar.page_link("pages/admin.py", label="Metrics & profiling", icon="📈")
+if st.session_state.username in CURATOR_USERS + ADMIN_USERS:
+    st.sidebar.page_link("pages/curate.py", label="Unanswered questions", icon="📝")
 
-# Lottie Animation
-try:
-    with open("ECG.json", "r") as f:
-        heart_anim = json.load(f)
-except:
-    heart_anim = None
+# Lottie Animation, parsed once per process
+@st.cache_resource
+def load_heart_animation():
+    try:
+        with open("ECG.json", "r") as f:
+            return json.load(f)
+    except:
+        return None
+
+heart_anim = load_heart_animation()
 
 # Chat UI
-st.sidebar.text_input("Ask about your heart...", key="chat_input", on_change=send_message)
-st.sidebar.markdown("### 💬 Chat History")
-chat_container = st.sidebar.empty()
-with chat_container.container():
+# A fragment: sending a message or loading older ones reruns only this panel,
+# not the dashboard. Callbacks run before the fragment does.
+@st.fragment(run_every=1)
+def chatbot_warmup_status():
+    # Reruns the page once the chatbot is ready, or once get_chatbot() has started a retry of a failed load
+    if bot.is_ready or get_chatbot() is not bot:
+        st.rerun()
+    if not bot.ready.is_set():
+        st.caption("⏳ HeartBot is warming up...")
+
+@st.fragment
+def chat_panel():
+    if bot.error:
+        st.error(f"HeartBot failed to load: {bot.error}. Retrying shortly...")
+    else:
+        st.text_input("Ask about your heart...", key="chat_input", on_change=send_message, disabled=not bot.is_ready)
+    if "last_confidence" in st.session_state:
+        st.caption(f"Match confidence: {st.session_state.last_confidence:.0%}")
+    st.markdown("### 💬 Chat History")
     for i in range(len(st.session_state.chat_history)-1, -1, -2):
         if i >= 0:
             user_msg = st.session_state.chat_history[i]
@@ -253,6 +201,13 @@ with chat_container.container():
             if bot_msg:
                 st.markdown(f"<p style='text-align:left; color:#f72585; margin:2px;'><b>{bot_msg[0]}:</b> {bot_msg[1]}</p>", unsafe_allow_html=True)
             st.markdown(f"<p style='text-align:right; color:#00b4d8; margin:2px;'><b>{user_msg[0]}:</b> {user_msg[1]}</p>", unsafe_allow_html=True)
+    if st.session_state.chat_cursor is not None:
+        st.button("Load older messages", on_click=load_older_chat)
+
+with st.sidebar:
+    if not bot.is_ready:
+        chatbot_warmup_status()
+    chat_panel()
 
 # Auto-scroll
 st.markdown("""
@@ -263,117 +218,284 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ====================== MAIN DASHBOARD ======================
+import plotly.graph_objects as go
+from streamlit_lottie import st_lottie
+from heartbot.streaming_chart import FrameClock, WaveformStream, make_stream
+
 st.title("Live Heartbeat Monitoring Dashboard")
 st.caption(f"Real-Time BPM Stream | User: {st.session_state.username}")
 
 if heart_anim:
     st_lottie(heart_anim, height=200, key="heart", speed=1)
 
-col1, col2, col3 = st.columns(3)
-bpm_placeholder = col1.empty()
-avg_placeholder = col2.empty()
-status_placeholder = col3.empty()
-
-st.subheader("Live Heart Rate Graph")
-chart_placeholder = st.empty()
-
-# ====================== MAX READINGS & ARDUINO CONNECTION ======================
-max_readings = 15
-
-# Arduino connection (HAMESHA TRY KARO)
-if "ser" not in st.session_state or st.session_state.ser is None:
+STATUS_LABELS = {"low": "🔵 Low", "normal": "🟢 Normal", "high": "🔴 High"}
+
+def render_metrics(slots, stats):
+    # Status follows the recent trend, not the session average
+    bpm_slot, avg_slot, status_slot = slots
+    bpm_slot.metric("Current BPM", round(stats.last_bpm, 1))
+    avg_slot.metric(f"Average BPM ({STATS_WINDOW_SECONDS:g} s)", round(stats.window.mean, 1),
+                    help=f"Session: {stats.overall.mean:.1f} avg, {stats.overall.min:.0f}–{stats.overall.max:.0f} range")
+    status_slot.metric("Status", STATUS_LABELS[stats.status])
+
+def render_episodes(stats):
+    for episode in stats.active:
+        st.warning(f"⚠️ {episode['kind'].capitalize()} since {datetime.fromtimestamp(episode['start']):%H:%M:%S} "
+                   f"(extreme {episode['extreme']:.0f} BPM)")
+
+def render_episode_log(stats):
+    if stats.episodes:
+        st.subheader("Episodes")
+        st.table([
+            {"Episode": e["kind"], "Start": f"{datetime.fromtimestamp(e['start']):%H:%M:%S}",
+             "End": "ongoing" if e["end"] is None else f"{datetime.fromtimestamp(e['end']):%H:%M:%S}",
+             "Extreme BPM": round(e["extreme"], 1)}
+            for e in stats.episodes
+        ])
+
+def render_hrv(hrv):
+    col1, col2, col3 = st.columns(3)
+    col1.metric("RMSSD", "–" if hrv["rmssd"] is None else f"{hrv['rmssd']:.0f} ms")
+    col2.metric("SDNN", "–" if hrv["sdnn"] is None else f"{hrv['sdnn']:.0f} ms")
+    col3.metric("pNN50", "–" if hrv["pnn50"] is None else f"{hrv['pnn50']:.0f}%")
+
+def render_dashboard(stats, x, y, key=None):
+    render_metrics(st.columns(3), stats)
+    if st.session_state.get("hrv"):
+        render_hrv(st.session_state.hrv)
+
+    st.subheader("Live Heart Rate Graph")
+    if len(y) > HISTORY_MAX_POINTS:
+        picked, _ = lttb(np.asarray(x, dtype=float), np.asarray(y, dtype=float), HISTORY_MAX_POINTS)
+        x, y = [x[i] for i in picked], [y[i] for i in picked]
+    with timed("figure"):
+        fig = go.Figure().update_layout(
+            xaxis_title="Beat #", yaxis_title="BPM", template="plotly_dark",
+            height=400, margin=dict(l=20, r=20, t=30, b=20)
+        )
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            mode='lines+markers',
+            name='Heart Rate',
+            line=dict(color='#f72585')
+        ))
+        st.plotly_chart(fig, width="stretch", key=key)
+
+# ====================== ARDUINO CONNECTION ======================
+# The reader thread owns the port; the page only drains its ring buffer.
+need_live = st.session_state.count < MAX_READINGS and "reader_error" not in st.session_state
+if need_live and st.session_state.get("reader") is None:
     try:
-        ser = serial.Serial('COM7', 9600, timeout=2)
-        time.sleep(2)
-        st.session_state.ser = ser
-        st.success("Arduino Connected!")
+        if BPM_SOURCE == "gateway":
+            # A one-minute session token: the gateway only streams the user it was signed for
+            token = issue_token(st.session_state.username, token_generation(db, st.session_state.username), ttl_hours=1 / 60)
+            reader = GatewaySubscriber(GATEWAY_HOST, GATEWAY_PORT, st.session_state.username, token, SERIAL_BUFFER_SIZE)
+        else:
+            reader = SerialReader(SERIAL_PORT, SERIAL_BAUD, SERIAL_BUFFER_SIZE, protocol=SERIAL_PROTOCOL)
+        reader.start()
+        st.session_state.reader = reader
+        st.session_state.reader_cursor = 0
+        st.session_state.waveform = deque()
+        st.session_state.waveform_cursor = 0
+        st.success("Subscribed to the ingestion gateway!" if BPM_SOURCE == "gateway" else "Arduino Connected!")
     except Exception as e:
-        st.session_state.ser = None
+        st.session_state.reader = None
         st.error(f"Arduino Connection Failed: {e}")
         st.stop()
-else:
+elif need_live:
     st.success("Arduino already connected.")
 
-# ====================== LIVE DATA LOOP (ONLY IF NEEDED) ======================
-if st.session_state.count < max_readings:
-    try:
-        while st.session_state.count < max_readings:
-            if st.session_state.ser.in_waiting > 0:
-                line = st.session_state.ser.readline().decode('utf-8', errors='ignore').strip()
-                match = re.search(r"BPM:\s*([\d.]+)", line)
-                if match:
-                    bpm = float(match.group(1))
-                    st.session_state.count += 1
-                    st.session_state.x_data.append(st.session_state.count)
-                    st.session_state.y_data.append(bpm)
-                    st.session_state.readings.append(bpm)
-
-                    avg_bpm = np.mean(st.session_state.readings)
-
-                    fig_live = go.Figure().update_layout(
-                        xaxis_title="Beat #", yaxis_title="BPM", template="plotly_dark",
-                        height=400, margin=dict(l=20, r=20, t=30, b=20)
-                    )
-                    fig_live.add_trace(go.Scatter(
-                        x=list(st.session_state.x_data),
-                        y=list(st.session_state.y_data),
-                        mode='lines+markers',
-                        name='Heart Rate',
-                        line=dict(color='#f72585')
-                    ))
-
-                    # KEY HATA DIYA — placeholder update karega
-                    chart_placeholder.plotly_chart(fig_live, use_container_width=True)
-                    bpm_placeholder.metric("Current BPM", round(bpm, 1))
-                    avg_placeholder.metric("Average BPM", round(avg_bpm, 1))
-
-                    status = "🔵 Low" if avg_bpm < 60 else "🔴 High" if avg_bpm > 100 else "🟢 Normal"
-                    status_placeholder.metric("Status", status)
-
-            time.sleep(0.1)
-
-    finally:
-        if st.session_state.get("ser") and st.session_state.ser.is_open:
-            st.session_state.ser.close()
-            st.session_state.ser = None
-            st.info("Arduino port closed safely.")  # YEHI RAKHA HAI
+# ====================== LIVE DATA (NON-BLOCKING) ======================
+# A self-rerunning fragment: each run drains the reader's ring buffer frame by
+# frame for LIVE_SLICE_SECONDS, redrawing the chart window, the raw waveform
+# (when the sketch streams samples) and the metrics at most once per frame,
+# then returns so that queued chat
+# interactions get their turn before the next slice. Readings are stored once,
+# as a single encrypted chunk, when the measurement is complete.
+@st.fragment(run_every=1 / LIVE_CHART_FPS)
+def live_data():
+    reader = st.session_state.reader
+    col1, col2, col3 = st.columns(3)
+    metric_slots = (col1.empty(), col2.empty(), col3.empty())
+    hrv_slot = st.empty()
+    episode_slot = st.empty()
+    st.subheader("Live Heart Rate Graph")
+    chart = make_stream(LIVE_CHART_MODE, st.session_state.x_data, st.session_state.y_data, LIVE_CHART_WINDOW)
+    waveform = WaveformStream(st.session_state.waveform, LIVE_WAVEFORM_SECONDS, LIVE_WAVEFORM_POINTS)
+    status_line = st.empty()
+    stats = st.session_state.bpm_stats
+    if st.session_state.readings:
+        render_metrics(metric_slots, stats)
+
+    clock = FrameClock(LIVE_CHART_FPS)
+    last_tick = 0.0
+    slice_end = time.monotonic() + LIVE_SLICE_SECONDS
+    while time.monotonic() < slice_end:
+        clock.tick()
+        samples, st.session_state.reader_cursor, dropped = reader.buffer.read_from(st.session_state.reader_cursor)
+        set_gauge("serial_backlog", len(samples))  # readings waiting in the ring buffer for this frame
+        if dropped:
+            count("serial_dropped", dropped)
+        blocks, st.session_state.waveform_cursor, _ = reader.waveform.read_from(st.session_state.waveform_cursor)
+        for block in blocks:
+            waveform.append(*block)
+        if blocks:
+            with timed("figure"):
+                waveform.flush()
+        new = samples[:MAX_READINGS - st.session_state.count]
+        for t, bpm in new:
+            st.session_state.count += 1
+            st.session_state.x_data.append(st.session_state.count)
+            st.session_state.y_data.append(bpm)
+            st.session_state.readings.append(bpm)
+            st.session_state.reading_times.append(t)
+            stats.add(t, bpm)
+            chart.append(st.session_state.count, bpm)
+
+        if new:
+            times = st.session_state.reading_times
+            first = max(len(times) - len(new) - 1, 0)  # the new readings and the one before them
+            if any(a > b for a, b in zip(times[first:], times[first + 1:])):
+                # Readings backfilled from the device's batch summary: keep time order,
+                # and rebuild the chart window from the sorted readings so x and y stay paired
+                order = sorted(range(len(times)), key=times.__getitem__)
+                st.session_state.readings = [st.session_state.readings[i] for i in order]
+                st.session_state.reading_times = [times[i] for i in order]
+                st.session_state.x_data = deque(range(1, st.session_state.count + 1), maxlen=LIVE_CHART_WINDOW)
+                st.session_state.y_data = deque(st.session_state.readings, maxlen=LIVE_CHART_WINDOW)
+                chart.reset(st.session_state.x_data, st.session_state.y_data)
+            with timed("figure"):
+                chart.flush()
+            render_metrics(metric_slots, stats)
+            with episode_slot.container():
+                render_episodes(stats)
+            hrv = reader.hrv_snapshot()
+            if hrv is not None:
+                st.session_state.hrv = hrv
+                with hrv_slot.container():
+                    render_hrv(st.session_state.hrv)
+
+        now = time.monotonic()
+        if new or now - last_tick >= LIVE_REFRESH_SECONDS:
+            last_tick = now
+            if st.session_state.readings:
+                status_line.caption(f"🟢 Live · {st.session_state.count}/{MAX_READINGS} readings")
+            else:
+                status_line.caption("Waiting for heartbeat...")
+
+        if st.session_state.count >= MAX_READINGS or not reader.is_running:
+            if reader.error or st.session_state.count < MAX_READINGS:
+                st.session_state.reader_error = str(reader.error or "reader stopped")
+            reader.stop()
+            st.session_state.reader = None
+            st.rerun()
+
+if need_live:
+    live_data()
+    st.stop()
 
+if "reader_error" in st.session_state:
+    st.warning(f"Arduino link lost before the session finished ({st.session_state.reader_error}). Press Restart to reconnect.")
 else:
     st.info("Session complete. Data saved below.")
 
 # ====================== SAVE & EXPORT (CLEAN) ======================
-if st.session_state.readings:
-    save_bpm_readings(st.session_state.username, st.session_state.readings)
-    
-    fig_final = go.Figure().update_layout(
-        xaxis_title="Beat #", yaxis_title="BPM", template="plotly_dark",
-        height=400, margin=dict(l=20, r=20, t=30, b=20)
-    )
-    fig_final.add_trace(go.Scatter(
-        x=list(range(1, len(st.session_state.readings) + 1)),
-        y=st.session_state.readings,
-        mode='lines+markers',
-        name='Heart Rate',
-        line=dict(color='#f72585')
-    ))
-    
-    chart_placeholder.plotly_chart(fig_final, use_container_width=True, key="final_chart")
+# Its own fragment, so chat traffic never rebuilds and resends the final
+# figure; downloading does not rerun anything.
+def prepare_history_export(first_day, last_day, fmt):
+    # Streams every session in the range through heartbot.export; only the
+    # compressed file is kept, until the next export replaces it
+    buffer = io.BytesIO()
+    rows = export_bpm(readings_collection, buffer, fmt, [st.session_state.username],
+                      start=datetime.combine(first_day, datetime.min.time()),
+                      end=datetime.combine(last_day + timedelta(days=1), datetime.min.time()))
+    name = f"heartbot_{st.session_state.username}_{first_day:%Y%m%d}-{last_day:%Y%m%d}.{fmt}"
+    st.session_state.history_export = (name, fmt, buffer.getvalue(), rows)
+
+@st.fragment
+def export_section():
+    if st.session_state.readings:
+        render_dashboard(st.session_state.bpm_stats,
+                         list(range(1, len(st.session_state.readings) + 1)), st.session_state.readings,
+                         key="final_chart")
+        render_episode_log(st.session_state.bpm_stats)
+
+        csv_data = "Beat,BPM\n" + "\n".join([f"{i+1},{bpm}" for i, bpm in enumerate(st.session_state.readings)])
+        st.download_button(
+            label="Download BPM Data (CSV)",
+            data=csv_data,
+            file_name=f"heartbot_{st.session_state.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            on_click="ignore",
+        )
+
+    with st.expander("Export history"):
+        today = datetime.now().date()
+        days = st.date_input("Days", value=(today - timedelta(days=30), today), max_value=today, key="export_days")
+        fmt = st.selectbox("Format", ["csv", "parquet"], key="export_format",
+                           format_func=lambda f: {"csv": "CSV", "parquet": "Parquet (compressed, for analysis)"}[f])
+        if st.button("Prepare export", disabled=len(days) != 2):
+            prepare_history_export(*days, fmt)
+        if "history_export" in st.session_state:
+            name, fmt, data, rows = st.session_state.history_export
+            st.download_button(f"Download {rows:,} readings ({name})", data=data, file_name=name,
+                               mime=MIME_TYPES[fmt], on_click="ignore")
+
+# ====================== HISTORY ======================
+# Every stored session on one time axis. Picking a span or box-selecting on
+# the chart to zoom reruns only this fragment, which reads rollups (raw
+# readings for short spans) and sends at most HISTORY_MAX_POINTS points.
+HISTORY_SPANS = {"6 hours": timedelta(hours=6), "Day": timedelta(days=1), "Week": timedelta(weeks=1),
+                 "Month": timedelta(days=30), "Year": timedelta(days=365), "All": None}
+
+def clear_history_zoom():
+    st.session_state.pop("history_zoom", None)
+
+@st.fragment
+def history_section():
+    stored = bpm_time_range(readings_collection, st.session_state.username)
+    if stored is None:
+        return
+    st.subheader("History")
+    col1, col2 = st.columns([4, 1])
+    span = col1.radio("Span", list(HISTORY_SPANS), index=2, horizontal=True, key="history_span",
+                      on_change=clear_history_zoom, label_visibility="collapsed")
+    zoom = st.session_state.get("history_zoom")
+    if zoom:
+        col2.button("Reset zoom", on_click=clear_history_zoom)
+        lo, hi = zoom
+    else:
+        hi = stored[1].timestamp() + 1
+        lo = stored[0].timestamp() if HISTORY_SPANS[span] is None else hi - HISTORY_SPANS[span].total_seconds()
+
+    series = history_series(readings_collection, st.session_state.username, lo, hi)
+    times = [datetime.fromtimestamp(t) for t in series["t"]]
+    with timed("figure"):
+        fig = go.Figure().update_layout(
+            xaxis_title="Time", yaxis_title="BPM", template="plotly_dark", dragmode="select",
+            height=350, margin=dict(l=20, r=20, t=30, b=20)
+        )
+        if series["low"] is not None:
+            fig.add_trace(go.Scatter(x=times, y=series["high"], mode="lines", line=dict(width=0),
+                                     showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scatter(x=times, y=series["low"], mode="lines", line=dict(width=0), fill="tonexty",
+                                     fillcolor="rgba(247, 37, 133, 0.2)", name="Min–max"))
+        fig.add_trace(go.Scatter(x=times, y=series["bpm"], mode="lines", name="BPM", line=dict(color="#f72585")))
+        event = st.plotly_chart(fig, width="stretch", key=f"history_chart_{lo:.0f}_{hi:.0f}",
+                                on_select="rerun", selection_mode="box")
+    boxes = event.selection.get("box") if event else None
+    if boxes:
+        x0, x1 = sorted(datetime.fromisoformat(str(x)).timestamp() for x in boxes[0]["x"])
+        if x1 - x0 >= 60:
+            st.session_state.history_zoom = (x0, x1)
+            st.rerun(scope="fragment")
+    source = "readings" if series["source"] == "readings" else f"{series['source']} rollups"
+    st.caption(f"{len(times):,} points from {source} · drag a box on the chart to zoom in")
 
-    avg_bpm = np.mean(st.session_state.readings)
-    last_bpm = st.session_state.readings[-1]
-    status = "Low" if avg_bpm < 60 else "High" if avg_bpm > 100 else "Normal"
-    
-    bpm_placeholder.metric("Current BPM", round(last_bpm, 1))
-    avg_placeholder.metric("Average BPM", round(avg_bpm, 1))
-    status_placeholder.metric("Status", status)
-
-    csv_data = "Beat,BPM\n" + "\n".join([f"{i+1},{bpm}" for i, bpm in enumerate(st.session_state.readings)])
-    st.download_button(
-        label="Download BPM Data (CSV)",
-        data=csv_data,
-        file_name=f"heartbot_{st.session_state.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv"
-    )
-    
+if st.session_state.readings:
+    save_new_readings()
 else:
-    st.info("No readings captured yet.")
\ No newline at end of file
+    st.info("No readings captured yet.")
+export_section()
+history_section()
@@ -0,0 +1,105 @@
+# Login load test: N users sign in at the same moment while one signed-in
+# session keeps rerunning its dashboard (tens of ms of Python, every 200 ms).
+# "inline" is bcrypt on the session threads, as the login page used to do;
+# "pool" is heartbot.auth (bounded, low-priority worker processes).
+#   python -m benchmarks.bench_auth [--users 8 32] [--rounds 12] [--max-p99-ms 5000]
+# Users are in mongomock. Exits with status 1 if the pool's login p99 misses --max-p99-ms.
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import bcrypt
+import numpy as np
+
+from heartbot import auth
+from heartbot import db as heartbot_db
+from heartbot.config import AUTH_WORKERS, AUTH_QUEUE_SIZE
+
+PASSWORD = "correct horse"
+
+
+def login_inline(db, username):
+    user = heartbot_db.find_user(db, username)
+    return user and bcrypt.checkpw(PASSWORD.encode("utf-8"), user["password"])
+
+def login_pool(db, username):
+    user = heartbot_db.find_user(db, username)
+    return user and auth.check_password(PASSWORD, user["password"])
+
+def rerun_probe(stop, samples):
+    # Stand-in for another session's rerun: fixed Python work, timed wall-clock
+    while not stop.is_set():
+        start = time.perf_counter()
+        sum(i * i for i in range(400000))
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.2)
+
+def burst(db, login, users):
+    def one(username):
+        start = time.perf_counter()
+        try:
+            ok = login(db, username)
+        except auth.AuthBusy:
+            return None
+        if not ok:
+            raise RuntimeError(f"login failed for {username}")
+        return (time.perf_counter() - start) * 1000
+
+    stop, probe = threading.Event(), []
+    prober = threading.Thread(target=rerun_probe, args=(stop, probe))
+    prober.start()
+    with ThreadPoolExecutor(users) as sessions:
+        results = list(sessions.map(one, [f"user{i}" for i in range(users)]))
+    stop.set()
+    prober.join()
+    done = [r for r in results if r is not None]
+    return np.array(done), results.count(None), np.array(probe)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--max-p99-ms", type=float)
+    args = parser.parse_args()
+
+    import mongomock
+    db = mongomock.MongoClient()["heartbot_bench"]
+    heartbot_db.ensure_indexes(db)
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(args.rounds))
+    for i in range(max(args.users)):
+        heartbot_db.create_user(db, f"user{i}", hashed)
+
+    start = time.perf_counter()
+    bcrypt.checkpw(PASSWORD.encode("utf-8"), hashed)
+    print(f"one bcrypt check at cost {args.rounds}: {(time.perf_counter() - start) * 1000:.0f} ms")
+    auth.check_password(PASSWORD, hashed)  # start the worker processes
+    print(f"pool: {AUTH_WORKERS} workers, {AUTH_QUEUE_SIZE} queued at most")
+
+    idle = []
+    stop = threading.Event()
+    threading.Timer(1.0, stop.set).start()
+    rerun_probe(stop, idle)
+    print(f"other session's rerun, idle server: p99 {np.percentile(idle, 99):.1f} ms")
+
+    failed = False
+    print(f"  {'users':>5} {'mode':<7}{'login p50':>11}{'login p99':>11}{'turned away':>13}{'rerun p99':>11}")
+    for users in args.users:
+        for mode, login in [("inline", login_inline), ("pool", login_pool)]:
+            lat, rejected, probe = burst(db, login, users)
+            p50, p99 = np.percentile(lat, [50, 99]) if lat.size else (float("nan"),) * 2
+            print(f"  {users:>5} {mode:<7}{p50:>8.0f} ms{p99:>8.0f} ms{rejected:>13}{np.percentile(probe, 99):>8.1f} ms")
+            if mode == "pool" and args.max_p99_ms is not None and p99 > args.max_p99_ms:
+                failed = True
+
+    token = auth.issue_token("user0", heartbot_db.token_generation(db, "user0"))
+    start = time.perf_counter()
+    for _ in range(10000):
+        auth.verify_token(token, partial(heartbot_db.token_generation, db))
+    print(f"reload with a session token: {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs, one users read, no bcrypt")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
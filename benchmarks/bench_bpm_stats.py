@@ -0,0 +1,37 @@
+# Per-reading cost of the live metrics: np.mean over the whole history (what
+# app.py used to do on every beat) vs the streaming BpmMonitor.
+#   python -m benchmarks.bench_bpm_stats
+import time
+
+import numpy as np
+
+from heartbot.bpm_stats import BpmMonitor
+
+PROBES = 1000
+
+def main():
+    print(f"{'history':>8} | {'np.mean us':>10} | {'monitor us':>10}")
+    for n in [1_000, 10_000, 100_000]:
+        rng = np.random.default_rng(0)
+        bpms = list(rng.normal(75, 8, n))
+        times = list(np.cumsum(60 / np.array(bpms)))
+        monitor = BpmMonitor()
+        for t, bpm in zip(times, bpms):
+            monitor.add(t, bpm)
+
+        start = time.perf_counter()
+        for i in range(PROBES):
+            bpms.append(75.0)
+            np.mean(bpms)
+        full = (time.perf_counter() - start) / PROBES
+
+        t = times[-1]
+        start = time.perf_counter()
+        for i in range(PROBES):
+            t += 0.8
+            monitor.add(t, 75.0)
+        streaming = (time.perf_counter() - start) / PROBES
+        print(f"{n:>8,} | {full * 1e6:>10.1f} | {streaming * 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Time until the dashboard can paint, in a fresh interpreter each run.
+# "before" is what app.py used to do ahead of the login check (all heavy
+# imports, NLTK lookup, model load); "after" is every module-level import of
+# the current app.py, read from the file so it stays in step with the app,
+# with the chatbot stack deferred to the warm-up thread.
+#   python -m benchmarks.bench_cold_start
+# Run from the repository root.
+import ast
+import statistics
+import subprocess
+import sys
+import time
+
+BEFORE = """
+import streamlit, serial, plotly.graph_objects, streamlit_lottie, numpy, pymongo, cryptography.fernet
+import sklearn.metrics.pairwise, nltk
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+try:
+    nltk.data.find('tokenizers/punkt'); nltk.data.find('corpora/stopwords'); nltk.data.find('corpora/wordnet')
+except LookupError:
+    nltk.download('punkt', quiet=True); nltk.download('stopwords', quiet=True); nltk.download('wordnet', quiet=True)
+from sentence_transformers import SentenceTransformer
+SentenceTransformer('all-MiniLM-L6-v2')
+"""
+
+def app_imports(path="app.py"):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+RUNS = 5
+
+def time_script(code):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines() if "Error" in line]
+            return None, errors[-1] if errors else f"exit code {result.returncode}"
+    return statistics.median(samples), None
+
+def main():
+    for name, code in (("before", BEFORE), ("after", app_imports())):
+        seconds, error = time_script(code)
+        if seconds is None:
+            print(f"{name:>6}: failed ({error})")
+        else:
+            print(f"{name:>6}: {seconds:.2f} s to first paint (median of {RUNS})")
+
+if __name__ == "__main__":
+    main()
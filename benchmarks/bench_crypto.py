@@ -0,0 +1,54 @@
+# Storage encryption cost: one Fernet blob per history (the original
+# encrypt_data path) vs per-chunk envelope encryption (heartbot.crypto.KeyRing).
+#   python -m benchmarks.bench_crypto
+import time
+
+import mongomock
+import numpy as np
+
+from heartbot.config import BPM_BUCKET_SIZE
+from heartbot.crypto import KeyRing, decrypt_data, encrypt_data
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    keyring = KeyRing(mongomock.MongoClient().db.data_keys)
+    user = "bench"
+    print(f"{'history':>8} | {'blob save ms':>12} {'blob read-last ms':>17} | "
+          f"{'chunk save ms':>13} {'chunk read-last ms':>18} {'chunk read-all ms':>17}")
+    for n in [1_000, 10_000, 100_000]:
+        rng = np.random.default_rng(0)
+        history = [[float(t), float(b)] for t, b in zip(np.arange(n) * 0.8, rng.normal(75, 8, n).round(1))]
+        chunk = history[-BPM_BUCKET_SIZE:]
+        repeat = max(3, 30_000 // n)
+
+        # Original: every save re-encrypts the whole history, every read decrypts all of it
+        blob = encrypt_data(history)
+        blob_save = timed(lambda: encrypt_data(history), repeat)
+        blob_read = timed(lambda: decrypt_data(blob)[-BPM_BUCKET_SIZE:], repeat)
+
+        chunks = [keyring.encrypt(user, history[i:i + BPM_BUCKET_SIZE]) for i in range(0, n, BPM_BUCKET_SIZE)]
+        chunk_save = timed(lambda: keyring.encrypt(user, chunk), 200)
+        chunk_read = timed(lambda: keyring.decrypt(user, chunks[-1]), 200)
+        chunk_all = timed(lambda: [s for c in chunks for s in keyring.decrypt(user, c)], repeat)
+        print(f"{n:>8,} | {blob_save:>12.2f} {blob_read:>17.2f} | {chunk_save:>13.3f} {chunk_read:>18.3f} {chunk_all:>17.2f}")
+
+    fernet_chunk = encrypt_data(chunk)
+    aes_chunk = keyring.encrypt(user, chunk)
+    print(f"one {BPM_BUCKET_SIZE}-sample chunk, encrypt/decrypt ms: "
+          f"Fernet {timed(lambda: encrypt_data(chunk), 2000):.3f}/{timed(lambda: decrypt_data(fernet_chunk), 2000):.3f}  "
+          f"AES-GCM {timed(lambda: keyring.encrypt(user, chunk), 2000):.3f}/{timed(lambda: keyring.decrypt(user, aes_chunk), 2000):.3f}  "
+          f"size {len(fernet_chunk)} vs {len(aes_chunk)} bytes")
+
+    def cold():
+        keyring._ciphers.clear()
+        keyring.cipher(user)
+    print(f"data key lookup: cached {timed(lambda: keyring.cipher(user), 2000) * 1000:.1f} us, "
+          f"unwrap from storage {timed(cold, 500) * 1000:.1f} us")
+
+if __name__ == "__main__":
+    main()
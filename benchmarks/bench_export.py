@@ -0,0 +1,102 @@
+# Multi-patient, multi-day export: throughput, file size and Python heap peak.
+# "before" loads every reading into a list and joins one CSV string, like the
+# old dashboard button; the others stream through heartbot.export.
+#   python -m benchmarks.bench_export [--patients 4] [--days 2] [--rate 0.5]
+#   python -m benchmarks.bench_export --uri mongodb://localhost:27017/ --workers 4
+# The heap peak is tracemalloc's, so it counts Python objects only; Arrow
+# buffers are freed after each slice. Without --uri the data is in mongomock
+# and reading runs in process.
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from heartbot import db as heartbot_db
+from heartbot.config import BPM_BUCKET_SIZE
+from heartbot.crypto import get_keyring
+from heartbot.export import FORMATS, export_bpm
+from heartbot.storage import load_bpm_samples
+
+CHUNK = 15  # readings per stored chunk, one dashboard session's worth
+
+
+def populate(collection, patients, days, rate):
+    # Buckets written directly in the storage layout, to skip per-save round trips
+    keyring = get_keyring(collection.database)
+    start = time.time() - days * 86400
+    rng = np.random.default_rng(0)
+    total = 0
+    for p in range(patients):
+        username = f"patient{p}"
+        times = start + np.sort(rng.uniform(0, days * 86400, int(days * 86400 * rate)))
+        bpms = np.round(rng.normal(75, 10, times.size), 1)
+        docs = []
+        for b in range(0, times.size, BPM_BUCKET_SIZE):
+            t, v = times[b:b + BPM_BUCKET_SIZE], bpms[b:b + BPM_BUCKET_SIZE]
+            docs.append({
+                "username": username, "session": f"day{int((t[0] - start) // 86400)}",
+                "start": datetime.fromtimestamp(t[0]), "end": datetime.fromtimestamp(t[-1]), "count": t.size,
+                "chunks": [keyring.encrypt(username, [[float(x), float(y)] for x, y in zip(t[c:c + CHUNK], v[c:c + CHUNK])])
+                           for c in range(0, t.size, CHUNK)],
+            })
+        collection.insert_many(docs)
+        total += times.size
+    return [f"patient{p}" for p in range(patients)], total
+
+def before(collection, usernames, sink):
+    lines = ["username,timestamp,bpm"]
+    for username in usernames:
+        lines.extend(f"{username},{t},{bpm}" for t, bpm in load_bpm_samples(collection, username))
+    sink.write("\n".join(lines).encode())
+    return len(lines) - 1
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=4)
+    parser.add_argument("--days", type=float, default=2)
+    parser.add_argument("--rate", type=float, default=0.5, help="readings per second per patient")
+    parser.add_argument("--uri", help="local mongod to use instead of mongomock (database heartbot_bench)")
+    parser.add_argument("--workers", type=int, default=0, help="reader processes, needs --uri")
+    args = parser.parse_args()
+
+    if args.uri:
+        import os
+        os.environ["MONGODB_URI"], os.environ["MONGO_DB_NAME"] = args.uri, "heartbot_bench"  # for the workers
+        client = heartbot_db.create_client(args.uri)
+        client.drop_database("heartbot_bench")
+        db = client["heartbot_bench"]
+    else:
+        import mongomock
+        db = mongomock.MongoClient()["heartbot_bench"]
+        args.workers = 0
+    heartbot_db.ensure_indexes(db)
+    collection = db[heartbot_db.BPM_BUCKETS]
+    usernames, total = populate(collection, args.patients, args.days, args.rate)
+    print(f"{args.patients} patients x {args.days:g} days = {total:,} readings, workers={args.workers}")
+
+    print(f"  {'format':<22}{'seconds':>9}{'readings/s':>13}{'MB':>8}{'heap peak MB':>14}")
+    variants = [("before: list + string", lambda sink: before(collection, usernames, sink))]
+    variants += [(fmt, lambda sink, fmt=fmt: export_bpm(collection, sink, fmt, usernames, workers=args.workers))
+                 for fmt in FORMATS]
+    for name, run in variants:
+        with tempfile.TemporaryFile() as sink:
+            start = time.perf_counter()
+            rows = run(sink)
+            elapsed = time.perf_counter() - start
+            size = sink.tell()
+        with tempfile.TemporaryFile() as sink:
+            tracemalloc.start()  # separate pass, it slows allocation down
+            run(sink)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        assert rows == total, (name, rows, total)
+        print(f"  {name:<22}{elapsed:>9.2f}{rows / elapsed:>13,.0f}{size / 1e6:>8.1f}{peak / 1e6:>14.1f}")
+
+    if args.uri:
+        client.drop_database("heartbot_bench")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Long-history trend view: server time, points sent and chart payload per span.
+# "before" loads every reading in the span and plots them all, as the
+# dashboard chart did. The other two are heartbot.history, LTTB down to
+# HISTORY_MAX_POINTS: "readings" reads every reading in the span (rollups
+# off, the default), "rollups" reads hour/day rollups for spans past
+# HISTORY_MINUTE_SECONDS (BPM_ROLLUPS_ENABLED=true).
+#   python -m benchmarks.bench_history [--days 60] [--rate 0.05]
+#   python -m benchmarks.bench_history --uri mongodb://localhost:27017/ --days 365 --rate 0.2
+# Without --uri the data is in mongomock, whose unindexed scans dominate the
+# query times of short spans and make each rollup upsert scan the whole
+# collection, so the rollups take a while to build there.
+import argparse
+from functools import partial
+import time
+from datetime import datetime
+
+import plotly.graph_objects as go
+
+from benchmarks.bench_export import populate
+from heartbot import db as heartbot_db
+from heartbot.config import HISTORY_MAX_POINTS
+from heartbot.history import history_series, rebuild
+from heartbot.storage import bpm_time_range, load_bpm_samples
+
+SPANS = [("1 hour", 3600), ("day", 86400), ("week", 7 * 86400), ("month", 30 * 86400), ("year", 365 * 86400)]
+
+
+def payload(t, bpm):
+    return len(go.Figure(go.Scatter(x=t, y=bpm, mode="lines")).to_json())
+
+def before(collection, username, lo, hi):
+    samples = load_bpm_samples(collection, username, start=datetime.fromtimestamp(lo), end=datetime.fromtimestamp(hi))
+    return [s[0] for s in samples], [s[1] for s in samples]
+
+def after(collection, username, lo, hi, rollups):
+    series = history_series(collection, username, lo, hi, rollups=rollups)
+    return series["t"].tolist(), series["bpm"].tolist()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=float, default=60)
+    parser.add_argument("--rate", type=float, default=0.05, help="readings per second")
+    parser.add_argument("--uri", help="local mongod to use instead of mongomock (database heartbot_bench)")
+    args = parser.parse_args()
+
+    if args.uri:
+        client = heartbot_db.create_client(args.uri)
+        client.drop_database("heartbot_bench")
+        db = client["heartbot_bench"]
+    else:
+        import mongomock
+        import mongomock.collection
+
+        # mongomock does not understand the UpdateOne objects of current pymongo
+        def bulk_write(self, requests, ordered=True):
+            for op in requests:
+                self.update_one(op._filter, op._doc, upsert=op._upsert)
+        mongomock.collection.Collection.bulk_write = bulk_write
+        db = mongomock.MongoClient()["heartbot_bench"]
+    heartbot_db.ensure_indexes(db)
+    collection = db[heartbot_db.BPM_BUCKETS]
+    (username,), total = populate(collection, 1, args.days, args.rate)
+    rebuild(collection, [username])  # whatever BPM_ROLLUPS_ENABLED says, for the "rollups" rows
+    hi = bpm_time_range(collection, username)[1].timestamp()
+    print(f"{total:,} readings over {args.days:g} days, at most {HISTORY_MAX_POINTS} points per render")
+
+    print(f"  {'span':<8}{'mode':<10}{'ms':>9}{'points':>10}{'payload KB':>12}")
+    for name, span in SPANS:
+        if span > args.days * 86400:
+            break
+        for mode, load in [("before", before), ("readings", partial(after, rollups=False)),
+                           ("rollups", partial(after, rollups=True))]:
+            start = time.perf_counter()
+            t, bpm = load(collection, username, hi - span, hi)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"  {name:<8}{mode:<10}{elapsed:>9.0f}{len(t):>10,}{payload(t, bpm) / 1e3:>12.0f}")
+
+    if args.uri:
+        client.drop_database("heartbot_bench")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# Server time per dashboard interaction, finished session, in-memory mongomock.
+# Each interaction drives the real widget through AppTest: a chat message is
+# typed into the sidebar input, "Load older messages" is clicked.
+#   before  the same app.py with st.fragment turned into a plain call, so every
+#           interaction reruns the whole script, as the dashboard did before
+#           it was split into fragments: callback + whole script
+#   after   app.py as shipped: callback + the fragment the widget lives in,
+#           which is all a fragment-scoped rerun executes
+# Both columns time the same code (the script or fragment body, not AppTest's
+# own bookkeeping). AppTest always does whole runs, so the fragment bodies are
+# timed inside them. The chatbot's answer lookup is the same either way and is
+# replaced by an instant stand-in.
+#   python -m benchmarks.bench_interaction [--runs 20] [--messages 1000]
+# Run from the repository root.
+import argparse
+import functools
+import statistics
+import threading
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from heartbot import chatbot
+from heartbot import db as heartbot_db
+from heartbot.config import CHAT_PAGE_SIZE, MAX_READINGS
+from heartbot.metrics import observe, stage
+from heartbot.storage import append_bpm_samples, append_chat_messages, new_session_id
+
+USERNAME = "bench"
+
+
+class InstantBot:
+    # Answers at once, so the timings are the dashboard's own work
+    error = None
+    is_ready = True
+    faq_index = None
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def preprocess(self, text):
+        return text.lower()
+
+    def best_match(self, processed, index):
+        return {"answer": "Resting heart rate is usually 60-100 BPM."}, 0.9
+
+    def learn(self, question, processed):
+        pass
+
+
+def use_mongomock(messages):
+    import mongomock
+    import mongomock.collection
+
+    # mongomock does not understand the UpdateOne objects of current pymongo
+    def bulk_write(self, requests, ordered=True):
+        for op in requests:
+            self.update_one(op._filter, op._doc, upsert=op._upsert)
+    mongomock.collection.Collection.bulk_write = bulk_write
+
+    client = mongomock.MongoClient()
+    heartbot_db.create_client = lambda uri=None: client
+    heartbot_db.get_db.cache_clear()
+    db = heartbot_db.get_db()
+    now = time.time()
+    append_bpm_samples(db[heartbot_db.BPM_BUCKETS], USERNAME, new_session_id(),
+                       [(now + i, 70.0 + i % 5) for i in range(MAX_READINGS)])
+    for i in range(messages // 2):
+        append_chat_messages(db[heartbot_db.CHAT_MESSAGES], USERNAME, [("You", f"question {i}"), ("HeartBot", f"answer {i}")])
+
+
+def timed_call(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe(name, time.perf_counter() - start)
+    return wrapper
+
+def instrument(fragments):
+    # Fragment bodies and widget callbacks are timed into heartbot.metrics stages
+    # (bench_<fragment>, bench_callback); fragments=False makes them plain calls.
+    real_fragment, real_text_input, real_button = st.fragment, st.text_input, st.button
+
+    def fragment(func=None, *, run_every=None):
+        def wrap(f):
+            body = timed_call(f"bench_{f.__name__}", f)
+            return real_fragment(body, run_every=run_every) if fragments else body
+        return wrap(func) if func is not None else wrap
+
+    def with_timed_callback(widget, kind):
+        @functools.wraps(widget)
+        def wrapper(*args, **kwargs):
+            if callable(kwargs.get(kind)):
+                kwargs[kind] = timed_call("bench_callback", kwargs[kind])
+            return widget(*args, **kwargs)
+        return wrapper
+
+    st.fragment = fragment
+    st.text_input = with_timed_callback(real_text_input, "on_change")
+    st.button = with_timed_callback(real_button, "on_click")
+
+def dashboard():
+    # AppTest entry point: app.py, with the whole script's run time recorded
+    import runpy
+    import time
+
+    from heartbot.metrics import observe
+
+    start = time.perf_counter()
+    try:
+        runpy.run_path("app.py", run_name="__main__")
+    finally:
+        observe("bench_script", time.perf_counter() - start)
+
+
+def last_ms(name, seen):
+    _, _, n, recent = stage(name).snapshot()
+    return recent[-1] * 1000 if n > seen.get(name, 0) else 0.0
+
+def counts():
+    return {name: stage(name).snapshot()[2] for name in ["bench_script", "bench_chat_panel", "bench_callback"]}
+
+def measure(fragments, runs):
+    instrument(fragments)
+    at = AppTest.from_function(dashboard, default_timeout=60)
+    at.session_state.logged_in = True
+    at.session_state.username = USERNAME
+    at.run()  # first run loads the session, chat page and assets
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+
+    body = "bench_chat_panel" if fragments else "bench_script"
+    results = {"chat message": [], "load older messages": []}
+    for i in range(runs):
+        seen = counts()
+        at.text_input(key="chat_input").input(f"is a resting rate of {60 + i} fine?").run()
+        results["chat message"].append(last_ms("bench_callback", seen) + last_ms(body, seen))
+    for _ in range(runs):
+        older = [b for b in at.button if b.label == "Load older messages"]
+        if not older:
+            break
+        seen = counts()
+        older[0].click().run()
+        results["load older messages"].append(last_ms("bench_callback", seen) + last_ms(body, seen))
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+    return {name: statistics.median(v) for name, v in results.items() if v}, len(results["load older messages"])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=1000)
+    args = parser.parse_args()
+
+    use_mongomock(args.messages)
+    chatbot._chatbot = InstantBot()
+    before, _ = measure(False, args.runs)
+    after, pages = measure(True, args.runs)
+
+    print(f"server time per interaction, median of {args.runs} "
+          f"({args.messages} chat messages in pages of {CHAT_PAGE_SIZE}, {MAX_READINGS} readings)")
+    print("  before: whole script without fragments · after: the widget's fragment")
+    print(f"  {'interaction':<22}{'before':>10}{'after':>10}")
+    for name in before:
+        print(f"  {name:<22}{before[name]:>8.1f} ms{after.get(name, float('nan')):>7.1f} ms")
+    if pages < args.runs:
+        print(f"  (only {pages} older pages to load; raise --messages for more)")
+    print("  download CSV: no rerun at all (on_click=\"ignore\")")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Cost of the always-on instrumentation and of the opt-in profiler.
+#   python -m benchmarks.bench_metrics [--max-overhead-us 5]
+# - timed(): one stage observation, enabled vs a bare block
+# - serial parse: StreamParser.feed on a realistic chunk of binary frames, with
+#   the stage timer and counters it now carries vs the same work without them
+# - scrape: rendering /metrics with every stage populated
+# - profiler: throughput of a CPU-bound thread while the sampler runs
+# Exits with status 1 if one observation costs more than --max-overhead-us.
+import argparse
+import sys
+import threading
+import time
+
+from heartbot import metrics
+from heartbot.profiler import SamplingProfiler
+from heartbot.protocol import encode_bpm
+from heartbot.serial_reader import StreamParser
+
+N = 200000
+
+
+def per_call_us(fn, n=N):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+def spin(seconds):
+    # Fixed CPU work in a thread; returns iterations per second
+    done = []
+    def work():
+        end, i = time.perf_counter() + seconds, 0
+        while time.perf_counter() < end:
+            sum(range(200))
+            i += 1
+        done.append(i / seconds)
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    return done[0]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-overhead-us", type=float, default=5.0)
+    args = parser.parse_args()
+
+    def bare():
+        with metrics._NO_TIMER:
+            pass
+    def timed():
+        with metrics.timed("bench"):
+            pass
+    baseline = per_call_us(bare)
+    overhead = per_call_us(timed) - baseline
+    print(f"timed() block           : {overhead:6.2f} µs per observation over a bare block")
+
+    chunk = b"".join(encode_bpm(i, i * 800, 60.0 + i % 40) for i in range(8))  # 8 BPM frames per read
+    instrumented = StreamParser("binary")
+    plain = StreamParser("binary")
+    t_inst = per_call_us(lambda: instrumented.feed(chunk), N // 4)
+    # The same decoding without the timer and counters
+    def uninstrumented():
+        plain._out = []
+        for frame in plain.decoder.feed(chunk):
+            plain.handle_frame(frame)
+    t_plain = per_call_us(uninstrumented, N // 4)
+    print(f"serial parse (8 frames) : {t_plain:6.2f} µs plain, {t_inst:6.2f} µs instrumented "
+          f"({(t_inst - t_plain) / t_plain:+.1%})")
+
+    for i in range(20):
+        metrics.observe(f"bench_stage_{i}", 0.001)
+    print(f"scrape /metrics         : {per_call_us(metrics.render, 200) / 1000:6.2f} ms with {len(metrics._stages)} stages")
+
+    idle = spin(2)
+    profiler = SamplingProfiler(3)
+    profiler.start()
+    busy = spin(2)
+    profiler.stop()
+    profiler.join()
+    print(f"profiler running        : CPU-bound thread at {busy / idle:.1%} of its speed, {profiler.samples} samples")
+    sys.exit(1 if overhead > args.max_overhead_us else 0)
+
+if __name__ == "__main__":
+    main()
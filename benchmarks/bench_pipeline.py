@@ -0,0 +1,152 @@
+# End-to-end ingestion benchmark on virtual sensors (no hardware, Linux / macOS):
+# simulator pty -> SerialReader thread -> ring buffer -> live_data()-style drain.
+#   python -m benchmarks.bench_pipeline [--seconds 10] [--max-p99-ms 250] [--min-rate 2000]
+# Exits with status 1 when a threshold is given and missed, so it can gate CI.
+# Streamlit rendering is not included: the drain loop stops at the metric values.
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from heartbot.config import SERIAL_BAUD, LIVE_CHART_FPS
+from heartbot.serial_reader import SerialReader
+from heartbot.simulator import RAW_BLOCK, VirtualDevice
+from heartbot.streaming_chart import FrameClock
+
+HEADER_MAX_RATE = 60000  # the frame header holds the rate as u16; faster is sent with VirtualDevice speed
+MAX_OFFERED_RATE = 64_000_000  # stop doubling here if the pipeline still keeps up
+
+def drain(readers, seconds):
+    """Consume like live_data(): one drain per frame, metrics on new readings."""
+    received = [[] for _ in readers]
+    cursors = [0] * len(readers)
+    readings = [[] for _ in readers]
+    clock = FrameClock(LIVE_CHART_FPS)
+    end = time.perf_counter() + seconds
+    cpu = time.thread_time()
+    while time.perf_counter() < end:
+        clock.tick()
+        now = time.perf_counter()
+        for i, reader in enumerate(readers):
+            items, cursors[i], _ = reader.buffer.read_from(cursors[i])
+            if items:
+                readings[i].extend(bpm for _, bpm in items)
+                np.mean(readings[i])
+                received[i].extend((now, t) for t, _ in items)
+    return received, time.thread_time() - cpu
+
+def thread_cpu(thread):
+    return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+
+def start(protocol, raw, rate=500, speed=1.0, seed=0):
+    device = VirtualDevice(protocol, raw, sample_rate=rate, readings=0, speed=speed, seed=seed)
+    reader = SerialReader(device.port, SERIAL_BAUD, protocol=protocol)
+    reader.start()
+    device.start()
+    return device, reader
+
+def stop(pairs):
+    for device, reader in pairs:
+        reader.stop()
+        device.stop()
+
+def latency(protocol, raw, seconds):
+    # BPM mode: reading i <-> frame i. Raw mode: a beat is timed from the write
+    # of the block holding its peak, so detection delay is included.
+    device, reader = start(protocol, raw, speed=1.0 if raw else 20.0)
+    received, _ = drain([reader], seconds)
+    stop([(device, reader)])
+    lat = []
+    for i, (recv, t) in enumerate(received[0]):
+        if raw:
+            block = int(round((t - reader.parser.raw_start) * device.signal.rate)) // RAW_BLOCK
+            if block < len(device.sent_at):
+                lat.append(recv - device.sent_at[block])
+        elif i < len(device.sent_at):
+            lat.append(recv - device.sent_at[i])
+    return np.array(lat) * 1000
+
+def keeps_up(rate, seconds):
+    header = min(rate, HEADER_MAX_RATE)
+    device, reader = start("binary", True, rate=header, speed=rate / header)
+    time.sleep(seconds)
+    decoder = reader.parser.decoder
+    sent, decoded, elapsed = device.sent_samples, decoder.frames * RAW_BLOCK, time.perf_counter() - device.started
+    time.sleep(0.2)
+    # The device could send every block on time (a backed-up reader blocks its
+    # writes), and within 0.2 s the reader decoded all of them, intact. Blocks
+    # go out whole, so allow one block of slack.
+    ok = (sent + RAW_BLOCK >= 0.98 * rate * elapsed and decoder.frames * RAW_BLOCK + RAW_BLOCK >= sent
+          and decoder.lost_frames == 0 and decoder.crc_errors == 0 and reader.is_running)
+    stop([(device, reader)])
+    print(f"  {rate:>11,} Hz offered: sent {sent / elapsed:>11,.0f}/s, decoded {decoded / elapsed:>11,.0f}/s  "
+          f"{'ok' if ok else 'falling behind'}")
+    return ok
+
+def sustainable(seconds, steps=3):
+    """Highest offered rate that keeps up: doubling until it falls behind, then
+    `steps` bisections. Returns (rate, True) or (MAX_OFFERED_RATE, False) if never reached."""
+    best, rate = 0, 500
+    while rate <= MAX_OFFERED_RATE:
+        if not keeps_up(rate, seconds):
+            break
+        best, rate = rate, rate * 2
+    else:
+        return best, False
+    failed = rate
+    for _ in range(steps):
+        mid = (best + failed) // 2
+        if keeps_up(mid, seconds):
+            best = mid
+        else:
+            failed = mid
+    return best, True
+
+def cpu_per_device(n, seconds):
+    pairs = [start("binary", True, seed=i) for i in range(n)]
+    before = sum(thread_cpu(r) for _, r in pairs)
+    _, drain_cpu = drain([r for _, r in pairs], seconds)
+    used = sum(thread_cpu(r) for _, r in pairs) - before + drain_cpu
+    stop(pairs)
+    return used / seconds / n
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-rate", type=float)
+    args = parser.parse_args()
+    failed = False
+
+    print(f"sample-to-metric latency (ms), drain at {LIVE_CHART_FPS:g} fps")
+    for protocol, raw in [("binary", False), ("text", False), ("binary", True), ("text", True)]:
+        lat = latency(protocol, raw, args.seconds)
+        name = f"{protocol} {'raw' if raw else 'bpm'}"
+        if not lat.size:
+            # Nothing to take a percentile of: a gate on p99 cannot pass
+            print(f"  {name:<11} n=0, no readings within {args.seconds:g} s (beats need a few seconds of signal)")
+            failed = failed or args.max_p99_ms is not None
+            continue
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        print(f"  {name:<11} n={lat.size:<5} p50 {p50:6.1f}  p95 {p95:6.1f}  p99 {p99:6.1f}  max {lat.max():6.1f}")
+        if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+            failed = True
+
+    print("max sustainable raw sample rate, binary frames, one device (a 115200 baud UART carries ~4,400/s)")
+    best, reached = sustainable(min(args.seconds, 3))
+    if reached:
+        print(f"  -> {best:,} samples/s, measured: the next rate fell behind")
+    else:
+        print(f"  -> still keeping up at {best:,} samples/s, the highest rate offered; no ceiling found")
+    if args.min_rate is not None and best < args.min_rate:
+        failed = True
+
+    print("CPU per device, raw binary at 500 Hz (reader thread + share of the drain loop)")
+    for n in [1, 4, 16]:
+        print(f"  {n:>2} devices: {cpu_per_device(n, min(args.seconds, 5)):.2%} of a core each")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Per-message CPU time of chat preprocessing, old per-call setup vs the
+# memoized TextPreprocessor, and a check that both give identical output.
+#   python -m benchmarks.bench_preprocess
+import sys
+import time
+
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+
+from heartbot.faq import faq
+from heartbot.text import TextPreprocessor, ensure_nltk_data
+
+def original_preprocess_input(text):
+    lemmatizer = WordNetLemmatizer()
+    stop_words = set(stopwords.words('english'))
+    tokens = word_tokenize(text.lower())
+    tokens = [lemmatizer.lemmatize(t) for t in tokens if t.isalnum() and t not in stop_words]
+    return ' '.join(tokens)
+
+def per_text_us(fn, texts):
+    start = time.process_time()
+    fn(texts)
+    return (time.process_time() - start) * 1e6 / len(texts)
+
+def main():
+    ensure_nltk_data()
+    questions = [item["question"] for item in faq] + [item["answer"] for item in faq]
+    # A replayed chat log: the same questions asked again and again
+    replay = questions * 50
+
+    pre = TextPreprocessor()
+    expected = [original_preprocess_input(t) for t in questions]
+    if pre.batch(questions) != expected:
+        print("MISMATCH between original and memoized preprocessing")
+        return 1
+
+    print(f"original        : {per_text_us(lambda ts: [original_preprocess_input(t) for t in ts], replay):8.1f} us/text")
+    print(f"lemma cache only: {per_text_us(TextPreprocessor(text_cache_size=0).batch, replay):8.1f} us/text")
+    print(f"preprocess_batch: {per_text_us(TextPreprocessor().batch, replay):8.1f} us/text")
+    print(f"outputs identical on {len(questions)} texts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
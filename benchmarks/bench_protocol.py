@@ -0,0 +1,47 @@
+# Wire size and host parse cost: text lines vs binary frames.
+#   python -m benchmarks.bench_protocol
+import re
+import time
+
+import numpy as np
+
+from heartbot.protocol import FrameDecoder, encode_bpm, encode_raw
+
+BPM_PATTERN = re.compile(r"BPM:\s*([\d.]+)")
+EVENTS = 20_000
+BLOCK = 25
+
+def parse_text_bpm(stream):
+    # What app.py used to do per line
+    out = []
+    for raw in stream.split(b"\n"):
+        match = BPM_PATTERN.search(raw.decode("utf-8", errors="ignore").strip())
+        if match:
+            out.append(float(match.group(1)))
+    return out
+
+def parse_text_raw(stream):
+    return [np.array(line[4:].split(b","), dtype=np.float64) for line in stream.split(b"\n") if line.startswith(b"RAW:")]
+
+def run(name, parse, stream, n):
+    start = time.perf_counter()
+    parse(stream)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(stream) / n:>7.1f} B/event {n / elapsed:>12,.0f} events/s")
+
+def main():
+    rng = np.random.default_rng(0)
+    bpms = rng.uniform(50, 120, EVENTS).round(1)
+    text = b"".join(f"Heartbeat #{i % 15 + 1} | BPM: {b:.1f}\r\n".encode() for i, b in enumerate(bpms))
+    binary = b"".join(encode_bpm(i, i * 800, b) for i, b in enumerate(bpms))
+    run("BPM text lines", parse_text_bpm, text, EVENTS)
+    run("BPM binary frames", lambda s: FrameDecoder().feed(s), binary, EVENTS)
+
+    blocks = rng.integers(300, 800, (EVENTS // 10, BLOCK))
+    text = b"".join(b"RAW:" + ",".join(map(str, blk)).encode() + b"\r\n" for blk in blocks)
+    binary = b"".join(encode_raw(i, 500, blk) for i, blk in enumerate(blocks))
+    run("RAW text lines", parse_text_raw, text, blocks.size)
+    run("RAW binary frames", lambda s: FrameDecoder().feed(s), binary, blocks.size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Query latency of the FAQ vector search at growing corpus sizes.
+#   python -m benchmarks.bench_retrieval
+import time
+
+import numpy as np
+
+from heartbot.retrieval import VectorIndex, IVFIndex
+
+DIM = 384  # all-MiniLM-L6-v2
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 200
+
+def per_query_ms(search, queries):
+    search(queries[0])  # warm-up
+    start = time.perf_counter()
+    for q in queries:
+        search(q)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall(exact, approx, queries, k=1):
+    hits = sum(exact.search(q, k)[0][0] == approx.search(q, k)[0][0] for q in queries)
+    return hits / len(queries)
+
+def main():
+    rng = np.random.default_rng(0)
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+    except ImportError:
+        cosine_similarity = None
+
+    print(f"{'entries':>8} | {'sklearn+argmax':>14} | {'exact top-5':>11} | {'IVF top-5':>9} | {'IVF recall@1':>12}")
+    for n in SIZES:
+        corpus = rng.standard_normal((n, DIM)).astype(np.float32)
+        # Queries near real entries, like paraphrased FAQ questions
+        queries = corpus[rng.choice(n, QUERIES)] + 0.3 * rng.standard_normal((QUERIES, DIM)).astype(np.float32)
+
+        exact = VectorIndex(corpus)
+        ivf = IVFIndex(corpus)
+        base = "n/a"
+        if cosine_similarity is not None:
+            base = f"{per_query_ms(lambda q: np.argmax(cosine_similarity(q[None, :], corpus)[0]), queries):.3f} ms"
+        print(f"{n:>8} | {base:>14} | "
+              f"{per_query_ms(lambda q: exact.search(q, 5), queries):>8.3f} ms | "
+              f"{per_query_ms(lambda q: ivf.search(q, 5), queries):>6.3f} ms | "
+              f"{recall(exact, ivf, queries):>12.2%}")
+
+if __name__ == "__main__":
+    main()
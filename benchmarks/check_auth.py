@@ -0,0 +1,80 @@
+# Session token checks: round trip, expiry, revocation on logout, tampering, malformed input and
+# gateway subscriptions.
+#   python -m benchmarks.check_auth
+# Users are in mongomock. Exits with status 1 if any check fails.
+import asyncio
+import sys
+from functools import partial
+
+import mongomock
+
+from heartbot import db as heartbot_db
+from heartbot.auth import issue_token, verify_token
+from heartbot.gateway import Gateway
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{'  ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+async def subscribe(gateway, line):
+    # What the gateway answers to one subscription line. An accepted subscriber's
+    # handler is still waiting for readings when the loop ends and is cancelled.
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda loop, context: None if isinstance(context.get("exception"), asyncio.CancelledError)
+                               else loop.default_exception_handler(context))
+    server = await asyncio.start_server(gateway.handle_subscriber, "127.0.0.1", 0)
+    async with server:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(line.encode() + b"\n")
+        answer = (await reader.readline()).strip().decode()
+        writer.close()
+        return answer
+
+def main():
+    db = mongomock.MongoClient()["heartbot_check"]
+    heartbot_db.ensure_indexes(db)
+    heartbot_db.create_user(db, "alice", b"hash")
+    heartbot_db.create_user(db, "bob", b"hash")
+    generation = partial(heartbot_db.token_generation, db)
+
+    print("tokens")
+    token = issue_token("alice", generation("alice"))
+    check("a fresh token signs its user in", verify_token(token, generation) == "alice")
+    check("an expired token is refused", verify_token(issue_token("alice", 0, ttl_hours=-1), generation) is None)
+    payload, signature = token.rsplit(".", 1)
+    check("a changed signature is refused", verify_token(f"{payload}.{signature[::-1]}", generation) is None)
+    check("a token for a deleted user is refused", verify_token(issue_token("carol", 0), generation) is None)
+
+    print("logout")
+    other = issue_token("bob", generation("bob"))
+    heartbot_db.revoke_tokens(db, "alice")
+    check("tokens issued before logout are refused", verify_token(token, generation) is None)
+    check("a token issued after logout works", verify_token(issue_token("alice", generation("alice")), generation) == "alice")
+    check("other users stay signed in", verify_token(other, generation) == "bob")
+
+    print("malformed tokens")
+    for bad in [None, "", "a", "a.é", "é.é", "a.b.c", "!!!.sig", f"{payload}é.{signature}", "\ud800.x", token + "é"]:
+        try:
+            result = verify_token(bad, generation)
+            check(f"{bad!r} is refused", result is None, f"returned {result!r}")
+        except Exception as e:
+            check(f"{bad!r} is refused", False, f"raised {type(e).__name__}: {e}")
+
+    print("gateway subscriptions")
+    gateway = Gateway(db["bpm_buckets"], None)
+    alice = issue_token("alice", generation("alice"), ttl_hours=1 / 60)
+    check("a user's token subscribes to that user", asyncio.run(subscribe(gateway, f"SUB alice {alice}")) == "OK")
+    check("no token is refused", asyncio.run(subscribe(gateway, "SUB alice")) == "ERR")
+    check("another user's token is refused", asyncio.run(subscribe(gateway, f"SUB bob {alice}")) == "ERR")
+    check("a revoked token is refused", heartbot_db.revoke_tokens(db, "alice")
+          or asyncio.run(subscribe(gateway, f"SUB alice {alice}")) == "ERR")
+
+    if failures:
+        sys.exit(f"{len(failures)} check(s) failed")
+
+
+if __name__ == "__main__":
+    main()
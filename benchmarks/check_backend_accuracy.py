@@ -0,0 +1,69 @@
+# Checks that an alternative encoder backend picks the same top-1 FAQ entry
+# as the PyTorch model, and compares encode latency and resident memory.
+#   python -m benchmarks.check_backend_accuracy --backend onnx-int8
+import argparse
+import gc
+import string
+import sys
+import time
+
+from heartbot.config import MODEL_NAME
+from heartbot.embeddings import BACKENDS, encode, load_sentence_model
+from heartbot.faq import faq
+from heartbot.retrieval import VectorIndex
+
+PARAPHRASES = [
+    "hello", "hey hi", "good morning", "normal heart rate", "what does bpm mean",
+    "bpm 120 bad", "low bpm", "heart beating fast", "calm heart rate", "coffee heart rate",
+    "scared heart racing", "heart rate too high what do", "70 bpm ok", "healthy adult heart rate",
+    "emotion change heart rate", "exercise bpm", "stairs heart fast", "dehydration heart rate",
+    "check pulse finger", "irregular heartbeat cause", "heart pounding", "improve heart health",
+    "heart attack", "heart attack sign", "exercise high heart rate", "chest pain",
+]
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * 4096 / 2**20
+    except OSError:
+        return float("nan")
+
+def queries():
+    questions = [item["question"] for item in faq]
+    plain = [q.lower().translate(str.maketrans("", "", string.punctuation)) for q in questions]
+    return questions + plain + PARAPHRASES
+
+def run_backend(backend, texts):
+    before = rss_mb()
+    model = load_sentence_model(MODEL_NAME, backend)
+    loaded = rss_mb()
+    index = VectorIndex(encode(model, [item["question"] for item in faq]))
+    encode(model, texts[:4])  # warm-up
+    start = time.perf_counter()
+    top1 = [index.search(q, 1)[0][0] for q in (encode(model, [t])[0] for t in texts)]
+    latency = (time.perf_counter() - start) * 1000 / len(texts)
+    del model
+    gc.collect()
+    return top1, latency, loaded - before
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], default="onnx-int8")
+    args = parser.parse_args()
+
+    texts = queries()
+    candidate, cand_ms, cand_mb = run_backend(args.backend, texts)
+    reference, ref_ms, ref_mb = run_backend("torch", texts)
+
+    mismatches = [(t, faq[r]["question"], faq[c]["question"])
+                  for t, r, c in zip(texts, reference, candidate) if r != c]
+    print(f"{'backend':>10} | {'encode/query':>12} | {'model RSS':>9}")
+    print(f"{'torch':>10} | {ref_ms:>9.2f} ms | {ref_mb:>6.0f} MB")
+    print(f"{args.backend:>10} | {cand_ms:>9.2f} ms | {cand_mb:>6.0f} MB")
+    print(f"top-1 agreement: {len(texts) - len(mismatches)}/{len(texts)}")
+    for text, ref, cand in mismatches:
+        print(f"  {text!r}: torch={ref!r} {args.backend}={cand!r}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Data-access checks: indexes, signup race, round trips per call, bucket sizes, legacy migration and latency.
+#   python -m benchmarks.check_db                  # in-memory mongomock
+#   python -m benchmarks.check_db --uri mongodb://localhost:27017/   # a local mongod (uses database heartbot_check)
+# Exits with status 1 if any check fails.
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from pymongo import monitoring
+
+from heartbot import db as heartbot_db
+from heartbot.config import BPM_BUCKET_SIZE, BPM_ROLLUPS_ENABLED
+from heartbot.crypto import encrypt_data, get_keyring
+from heartbot.storage import (
+    BPM_ROLLUPS, LEGACY_BPM_READINGS, append_bpm_batches, append_bpm_samples, append_chat_messages,
+    load_bpm_samples, load_chat_page, migrate_legacy_bpm, new_session_id,
+)
+
+READS = {"find", "aggregate", "count", "getMore"}
+WRITES = {"insert", "update", "delete"}
+ops = Counter()
+_local = threading.local()
+
+
+class CommandCounter(monitoring.CommandListener):
+    # Real server: count wire commands
+    def started(self, event):
+        if event.command_name in READS:
+            ops["reads"] += 1
+        elif event.command_name in WRITES:
+            ops["writes"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def count_mongomock_calls():
+    # mongomock has no command monitoring: count the outermost collection calls
+    import mongomock.collection
+
+    # mongomock does not understand the UpdateOne objects of current pymongo
+    def bulk_write(self, requests, ordered=True):
+        for op in requests:
+            self.update_one(op._filter, op._doc, upsert=op._upsert)
+    mongomock.collection.Collection.bulk_write = bulk_write
+
+    def wrap(name, kind):
+        method = getattr(mongomock.collection.Collection, name)
+        def counted(self, *args, **kwargs):
+            depth = getattr(_local, "depth", 0)
+            if depth == 0:
+                ops[kind] += 1
+            _local.depth = depth + 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _local.depth = depth
+        setattr(mongomock.collection.Collection, name, counted)
+
+    for name in ["find", "find_one", "aggregate", "count_documents"]:
+        wrap(name, "reads")
+    for name in ["insert_one", "insert_many", "update_one", "bulk_write"]:
+        wrap(name, "writes")
+
+
+@contextmanager
+def measure():
+    before = ops.copy()
+    result = {}
+    yield result
+    result["reads"] = ops["reads"] - before["reads"]
+    result["writes"] = ops["writes"] - before["writes"]
+
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{'  ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def latency(fn, repeat=50):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.percentile(samples, 95)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", help="local mongod to test against instead of mongomock")
+    parser.add_argument("--max-p95-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if args.uri:
+        monitoring.register(CommandCounter())
+        client = heartbot_db.create_client(args.uri)
+        client.drop_database("heartbot_check")
+        db = client["heartbot_check"]
+    else:
+        import mongomock
+        count_mongomock_calls()
+        db = mongomock.MongoClient()["heartbot_check"]
+    heartbot_db.ensure_indexes(db)
+
+    print("indexes")
+    users_index = db[heartbot_db.USERS].index_information()
+    check("users.username is unique", any(i.get("unique") and i["key"] == [("username", 1)] for i in users_index.values()))
+    check("chat_messages (username, _id)", any(i["key"] == [("username", 1), ("_id", -1)]
+                                              for i in db[heartbot_db.CHAT_MESSAGES].index_information().values()))
+    check("bpm_buckets (username, session, start)", any(i["key"][:2] == [("username", 1), ("session", 1)]
+                                                      for i in db[heartbot_db.BPM_BUCKETS].index_information().values()))
+
+    print("users")
+    with ThreadPoolExecutor(16) as pool:
+        created = list(pool.map(lambda _: heartbot_db.create_user(db, "racer", b"hash"), range(32)))
+    check("32 concurrent signups for one name create exactly one user", created.count(True) == 1,
+          f"{created.count(True)} created")
+    with measure() as m:
+        user = heartbot_db.find_user(db, "racer")
+    check("find_user: one read, password only", m["reads"] == 1 and set(user) == {"password"}, f"{m['reads']} reads, {sorted(user)}")
+    with measure() as m:
+        heartbot_db.create_user(db, "alice", b"hash")
+    check("create_user: one write, no read", m["reads"] == 0 and m["writes"] == 1, f"{m['reads']} reads, {m['writes']} writes")
+
+    if not args.uri:
+        legacy = mongomock.MongoClient()["heartbot_check"]
+        legacy[heartbot_db.USERS].insert_many([{"username": "twin", "password": b"first"},
+                                              {"username": "twin", "password": b"second"}])
+        heartbot_db.ensure_indexes(legacy)
+        check("duplicate usernames from older versions do not break startup",
+              heartbot_db.find_user(legacy, "twin") is not None)
+        moved = heartbot_db.dedupe_users(legacy)
+        check("dedupe keeps the oldest account and adds the unique index",
+              moved == 1 and heartbot_db.find_user(legacy, "twin")["password"] == b"first"
+              and any(i.get("unique") for i in legacy[heartbot_db.USERS].index_information().values()))
+
+    print("chat")
+    append_chat_messages(db[heartbot_db.CHAT_MESSAGES], "alice", [("You", "warm up"), ("HeartBot", "key")])
+    with measure() as m:
+        append_chat_messages(db[heartbot_db.CHAT_MESSAGES], "alice", [("You", "hi"), ("HeartBot", "hello")])
+    check("message pair: one write", m["writes"] == 1 and m["reads"] == 0, f"{m['reads']} reads, {m['writes']} writes")
+    for i in range(100):
+        append_chat_messages(db[heartbot_db.CHAT_MESSAGES], "alice", [("You", f"q{i}"), ("HeartBot", f"a{i}")])
+    with measure() as m:
+        page, cursor = load_chat_page(db[heartbot_db.CHAT_MESSAGES], "alice")
+    check("chat page: one read", m["reads"] == 1, f"{m['reads']} reads, {len(page)} messages")
+
+    print("readings")
+    bpm = db[heartbot_db.BPM_BUCKETS]
+    users = [f"patient{i}" for i in range(10)]
+    sessions = {u: new_session_id() for u in users}
+    append_bpm_batches(bpm, {(u, sessions[u]): [(time.time(), 70.0)] for u in users})
+    with measure() as m:
+        append_bpm_batches(bpm, {(u, sessions[u]): [(time.time() + i, 70.0 + i) for i in range(15)] for u in users})
+    # The second bulk write updates the history rollups
+    expected = 2 if BPM_ROLLUPS_ENABLED else 1
+    check(f"10 users' readings: {expected} bulk writes", m["writes"] == expected and m["reads"] == 0,
+          f"{m['reads']} reads, {m['writes']} writes")
+    with measure() as m:
+        samples = load_bpm_samples(bpm, "patient3", session=sessions["patient3"])
+    check("session load: one read", m["reads"] == 1 and len(samples) == 16, f"{m['reads']} reads, {len(samples)} samples")
+
+    print("buckets")
+    now = time.time()
+    backfilled = [(now + i, 60.0 + i % 40) for i in range(500)]
+    backfilled[450:] = backfilled[450:][::-1]  # out of order, as batch backfills arrive
+    append_bpm_samples(bpm, "flush", "gateway", [(now - 1, 70.0)])  # an open bucket with one reading
+    append_bpm_batches(bpm, {("flush", "gateway"): backfilled})  # one GATEWAY_BATCH_SIZE flush
+    keyring = get_keyring(db)
+    docs = list(bpm.find({"username": "flush"}))
+    counts = [d["count"] for d in docs]
+    check(f"500 readings in one flush: no bucket over {BPM_BUCKET_SIZE}", max(counts) <= BPM_BUCKET_SIZE
+          and sum(counts) == 501, f"counts {sorted(counts)}")
+    def spans(doc):
+        times = [t for chunk in doc["chunks"] for t, _ in keyring.decrypt("flush", chunk)]
+        return abs((doc["start"] - datetime.fromtimestamp(min(times))).total_seconds()) < 0.002 \
+            and abs((doc["end"] - datetime.fromtimestamp(max(times))).total_seconds()) < 0.002
+    check("bucket start / end are its first and last reading", all(spans(d) for d in docs))
+
+    print("legacy migration")
+    legacy = db[LEGACY_BPM_READINGS]
+    legacy.insert_one({"username": "legacy", "timestamp": datetime(2024, 5, 1, 12), "readings": encrypt_data(list(range(60, 75)))})
+    migrate_legacy_bpm(legacy, bpm)
+    legacy.update_many({}, {"$unset": {"migrated_at": ""}})  # as if interrupted before the document was marked
+    migrate_legacy_bpm(legacy, bpm)
+    stored = len(load_bpm_samples(bpm, "legacy"))
+    check("a re-run does not duplicate readings", stored == 15, f"{stored} readings")
+    if BPM_ROLLUPS_ENABLED:
+        rolled = [d["count"] for d in db[BPM_ROLLUPS].find({"username": "legacy", "res": "day"})]
+        check("a re-run does not count readings twice in the rollups", rolled == [15], f"day rollups {rolled}")
+
+    print(f"latency (p95 budget {args.max_p95_ms:g} ms)")
+    for name, fn in [
+        ("find_user", lambda: heartbot_db.find_user(db, "alice")),
+        ("load_chat_page", lambda: load_chat_page(db[heartbot_db.CHAT_MESSAGES], "alice")),
+        ("load_bpm_samples", lambda: load_bpm_samples(bpm, "patient3", session=sessions["patient3"])),
+    ]:
+        p95 = latency(fn)
+        check(name, p95 <= args.max_p95_ms, f"p95 {p95:.2f} ms")
+
+    if args.uri:
+        client.drop_database("heartbot_check")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Learned FAQ checks: merging, encryption at rest and key rotation, eviction at the cap, in-memory / Mongo consistency.
+#   python -m benchmarks.check_learned_faq
+# Runs on mongomock with a stand-in encoder (one random direction per text).
+# Exits with status 1 if any check fails.
+import sys
+import zlib
+from datetime import datetime
+
+import mongomock
+import numpy as np
+from cryptography.fernet import Fernet, MultiFernet
+
+from heartbot import crypto
+from heartbot.learned_faq import LearnedFaq, ensure_learned_indexes, top_open
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{'  ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def encode(texts):
+    return np.array([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(64) for t in texts],
+                    dtype=np.float32)
+
+def new_store(max_entries):
+    collection = mongomock.MongoClient().db.learned_faq
+    ensure_learned_indexes(collection)
+    return LearnedFaq(collection, "check", max_entries=max_entries), collection
+
+def ask(store, text, times=1):
+    return [store.record(text, text, encode) for _ in range(times)][-1]
+
+def consistent(store):
+    rows = all(store._ids[e["row"]] == i for i, e in store._entries.items())
+    return rows and len(store._index) == len(store._ids) == len(store._entries)
+
+def main():
+    print("merging")
+    store, collection = new_store(10)
+    first = ask(store, "does coffee raise my heart rate", 3)
+    check("the same question is one entry", collection.count_documents({}) == 1
+          and collection.find_one({"_id": first})["count"] == 3)
+
+    doc = collection.find_one({"_id": first})
+    check("questions and phrasings are encrypted at rest", b"coffee" not in doc["question"]
+          and not any(b"coffee" in e for e in doc["examples"]))
+    check("the curator list decrypts them", top_open(collection)[0]["examples"][0] == "does coffee raise my heart rate")
+
+    print("key rotation")
+    store, collection = new_store(10)
+    ask(store, "is 50 bpm too low at night", 2)
+    legacy = "can stress cause palpitations"  # sealed with the master key by an older version
+    collection.insert_one({"processed": legacy, "question": crypto.encrypt_data(legacy),
+                           "examples": [crypto.encrypt_data(legacy)], "count": 1, "first_seen": datetime.now(),
+                           "last_seen": datetime.now(), "status": "open", "answer": None, "model": "check",
+                           "vector": encode([legacy])[0].tobytes()})
+    LearnedFaq(collection, "check", max_entries=10).load(encode)  # the first start after upgrading
+    old_key, old_suite = crypto.ENCRYPTION_KEY, crypto.cipher_suite
+    new_key = Fernet.generate_key().decode()
+    crypto.ENCRYPTION_KEY = new_key
+    crypto.cipher_suite = MultiFernet([Fernet(new_key), Fernet(old_key)])
+    crypto.get_keyring(collection.database).rotate()
+    crypto.cipher_suite = MultiFernet([Fernet(new_key)])  # old master key retired
+    crypto._keyrings.clear()  # as after a restart: no data keys cached
+    try:
+        reloaded = LearnedFaq(collection, "check", max_entries=10)
+        loaded = reloaded.load(encode)
+        questions = {e["question"] for e in reloaded._entries.values()}
+        check("the FAQ loads after the old master key is dropped", loaded == 2
+              and questions == {"is 50 bpm too low at night", legacy})
+        check("the curator list still decrypts", {d["examples"][-1] for d in top_open(collection)} == questions)
+    except crypto.DecryptionError as e:
+        check("the FAQ loads after the old master key is dropped", False, str(e))
+    finally:
+        crypto.ENCRYPTION_KEY, crypto.cipher_suite = old_key, old_suite
+        crypto._keyrings.clear()
+
+    print("eviction")
+    store, collection = new_store(2)
+    ask(store, "aaa", 2)
+    ask(store, "bbb", 2)
+    new_id = ask(store, "new", 3)
+    stored = collection.find_one({"processed": "new"})
+    check("a new question is kept when every older one is asked more", stored is not None and stored["_id"] == new_id,
+          f"count {stored and stored['count']}")
+    check("the cap holds", collection.count_documents({}) == len(store) == 2, f"{collection.count_documents({})} stored")
+    check("least asked, least recent older entry evicted", collection.find_one({"processed": "aaa"}) is None)
+
+    store, collection = new_store(50)
+    for i in range(500):
+        ask(store, f"question {i % 120}")
+    check("mixed load stays at the cap", collection.count_documents({}) == len(store) == 50)
+    check("index rows match entries", consistent(store))
+
+    reloaded = LearnedFaq(collection, "check", max_entries=50)
+    reloaded.load(encode)
+    check("reload sees the same entries", len(reloaded) == 50 and consistent(reloaded))
+
+    print("answers")
+    store, collection = new_store(2)
+    gone = ask(store, "gone")
+    ask(store, "kept", 2)
+    ask(store, "newer", 2)
+    check("answering an evicted question returns None", store.answer(gone, "...", "curator") is None)
+    answered = ask(store, "answered")
+    item, embedding = store.answer(answered, "yes", "curator")
+    ask(store, "later", 5)
+    ask(store, "latest", 5)
+    check("answered entries are not evicted", collection.find_one({"_id": answered}) is not None
+          and item == {"question": "answered", "answer": "yes"} and embedding.shape == (64,))
+    check("index rows match entries", consistent(store))
+
+    if failures:
+        sys.exit(f"{len(failures)} check(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+from heartbot.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+
+# ====================== ANSWER CACHE ======================
+# Shared by all sessions. Entries are keyed by (FaqIndex.version, normalized
+# query), so any change to the FAQ or dynamic FAQ makes its old entries
+# unreachable; invalidate() drops them eagerly when the old index is retired.
+
+
+class AnswerCache:
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # (version, query) -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, version, query):
+        key = (version, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, version, query, value):
+        key = (version, query)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version=None):
+        with self._lock:
+            if version is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key in self._entries if key[0] == version]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
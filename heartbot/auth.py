@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from threading import BoundedSemaphore, Lock
+
+import bcrypt
+
+from heartbot.config import (
+    BCRYPT_ROUNDS, AUTH_WORKERS, AUTH_QUEUE_SIZE, AUTH_WAIT_SECONDS, SESSION_SECRET, SESSION_TTL_HOURS,
+)
+from heartbot.crypto import ENCRYPTION_KEY
+
+# ====================== PASSWORD HASHING ======================
+# bcrypt runs in a small pool of low-priority worker processes, never on a
+# Streamlit script thread. At most AUTH_WORKERS hashes run at once and
+# AUTH_QUEUE_SIZE more may wait; past that a login is turned away with
+# AuthBusy right away, so a burst of logins cannot take every core from the
+# reruns of sessions that are already signed in.
+
+
+class AuthBusy(RuntimeError):
+    pass
+
+
+_pool = None
+_pool_lock = Lock()
+_slots = BoundedSemaphore(AUTH_WORKERS + AUTH_QUEUE_SIZE)
+
+def _lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking the multi-threaded Streamlit server is unsafe
+            _pool = ProcessPoolExecutor(AUTH_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_lower_priority)
+        return _pool
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy("too many logins in progress")
+    try:
+        future = _get_pool().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    # The slot is held until the hash is done, even if the caller gave up
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=AUTH_WAIT_SECONDS)
+    except TimeoutError as e:
+        future.cancel()
+        raise AuthBusy(f"no hashing worker free within {AUTH_WAIT_SECONDS:g} s") from e
+
+def hash_password(password):
+    return _run(_hash, password.encode("utf-8"), BCRYPT_ROUNDS)
+
+def check_password(password, hashed):
+    return _run(_check, password.encode("utf-8"), bytes(hashed))
+
+
+# ====================== SESSION TOKENS ======================
+# "<payload>.<signature>", both base64url: payload is "expiry:generation:username"
+# and the signature an HMAC-SHA256 of it. The dashboard keeps the token in its
+# URL, so a reload signs the user straight back in without bcrypt until it
+# expires. generation is the user's token generation in `users`; logging out
+# bumps it, so every token issued before stops working, wherever it was left
+# (browser history on a shared ward machine included).
+
+_secret = SESSION_SECRET.encode() or hmac.new(ENCRYPTION_KEY.encode(), b"heartbot session tokens", hashlib.sha256).digest()
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _sign(payload):
+    return _b64(hmac.new(_secret, payload.encode(), hashlib.sha256).digest())
+
+def issue_token(username, generation, ttl_hours=SESSION_TTL_HOURS):
+    payload = _b64(f"{int(time.time() + ttl_hours * 3600)}:{generation}:{username}".encode())
+    return f"{payload}.{_sign(payload)}"
+
+def verify_token(token, current_generation):
+    """Return the username for a valid, unexpired, unrevoked token, else None.
+    current_generation(username) gives the user's token generation, None if there is no such user."""
+    # Anything can arrive in the URL: malformed base64, non-ASCII, a missing part
+    try:
+        payload, signature = token.rsplit(".", 1)
+        if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+            return None
+        expires, generation, username = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)).decode().split(":", 2)
+        if int(expires) <= time.time():
+            return None
+        return username if current_generation(username) == int(generation) else None
+    except (AttributeError, ValueError):  # UnicodeError and binascii.Error are ValueErrors
+        return None
@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+
+# ====================== RAW PPG BEAT DETECTION ======================
+# Host-side replacement for the sketch's detector, fed with blocks of raw
+# analogRead samples. Per-sample work (baseline, threshold, hysteresis state)
+# is vectorized over the whole block; only detected beats are handled in
+# Python, and there are at most a few per block.
+
+
+class HRVStats:
+    # Running HRV over beat-to-beat (RR) intervals in ms, O(1) per beat
+    def __init__(self):
+        self.count = 0
+        self.mean_rr = 0.0
+        self._m2 = 0.0
+        self._last_rr = None
+        self._diff_count = 0
+        self._diff_sq_sum = 0.0
+        self._nn50 = 0
+
+    def add(self, rr):
+        self.count += 1
+        delta = rr - self.mean_rr
+        self.mean_rr += delta / self.count
+        self._m2 += delta * (rr - self.mean_rr)
+        if self._last_rr is not None:
+            diff = rr - self._last_rr
+            self._diff_count += 1
+            self._diff_sq_sum += diff * diff
+            self._nn50 += int(abs(diff) > 50)
+        self._last_rr = rr
+
+    @property
+    def sdnn(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else None
+
+    @property
+    def rmssd(self):
+        return math.sqrt(self._diff_sq_sum / self._diff_count) if self._diff_count else None
+
+    @property
+    def pnn50(self):
+        return 100.0 * self._nn50 / self._diff_count if self._diff_count else None
+
+    def snapshot(self):
+        return {"beats": self.count, "mean_rr": self.mean_rr, "sdnn": self.sdnn,
+                "rmssd": self.rmssd, "pnn50": self.pnn50}
+
+
+class MovingAverage:
+    # Trailing mean over `window` samples, carried across blocks via cumsum
+    def __init__(self, window):
+        self.window = max(1, int(window))
+        self._tail = np.empty(0)
+
+    def __call__(self, block):
+        ext = np.concatenate([self._tail, block])
+        csum = np.concatenate([[0.0], np.cumsum(ext)])
+        end = np.arange(len(self._tail), len(ext)) + 1
+        start = np.maximum(end - self.window, 0)
+        self._tail = ext[-(self.window - 1):] if self.window > 1 else ext[:0]
+        return (csum[end] - csum[start]) / (end - start)
+
+
+class BeatDetector:
+    def __init__(self, sample_rate=500, baseline_seconds=0.75, smooth_seconds=0.02, threshold=0.5, release=0.2,
+                 envelope_half_life=2.0, refractory=0.3, min_rr=300, max_rr=2000, smoothing=4):
+        self.sample_rate = sample_rate
+        self.threshold = threshold      # a beat rises above threshold * peak envelope ...
+        self.release = release          # ... and ends when it falls below release * envelope
+        self._decay = 0.5 ** (1.0 / (envelope_half_life * sample_rate))
+        self.refractory = int(refractory * sample_rate)
+        self.min_rr, self.max_rr = min_rr, max_rr
+        self.smoothing = smoothing
+        self.hrv = HRVStats()
+        self._baseline = MovingAverage(baseline_seconds * sample_rate)
+        self._smooth = MovingAverage(smooth_seconds * sample_rate)
+        self._envelope = 0.0
+        self._high = False
+        self._peak_idx = None
+        self._peak_val = -np.inf
+        self._last_beat = None
+        self._recent_rr = []
+        self.samples_seen = 0
+
+    def process(self, block):
+        """Feed raw samples; return [(sample_index, rr_ms, bpm), ...] for each accepted beat."""
+        block = np.asarray(block, dtype=np.float64)
+        if block.size == 0:
+            return []
+        base = self.samples_seen
+        self.samples_seen += block.size
+        detrended = self._smooth(block - self._baseline(block))
+
+        # Peak envelope decays with a fixed half-life and jumps to any higher peak
+        self._envelope = max(self._envelope * self._decay ** block.size, float(detrended.max()))
+        hi = self.threshold * max(self._envelope, 1e-9)
+        lo = self.release * max(self._envelope, 1e-9)
+
+        # Hysteresis without a per-sample loop: +1 where we cross above `hi`,
+        # -1 where we drop below `lo`, then carry the latest event forward.
+        events = np.where(detrended > hi, 1, np.where(detrended < lo, -1, 0))
+        last = np.where(events != 0, np.arange(events.size), -1)
+        np.maximum.accumulate(last, out=last)
+        high = np.where(last >= 0, events[np.maximum(last, 0)] > 0, self._high)
+
+        prev = np.concatenate([[self._high], high[:-1]])
+        rises = np.flatnonzero(high & ~prev)
+        falls = np.flatnonzero(~high & prev)
+        self._high = bool(high[-1])
+
+        beats = []
+        # Close a peak region left open by the previous block
+        if self._peak_idx is not None:
+            end = falls[0] if falls.size else block.size
+            if end > 0:
+                i = int(np.argmax(detrended[:end]))
+                if detrended[i] > self._peak_val:
+                    self._peak_idx, self._peak_val = base + i, detrended[i]
+            if falls.size:
+                beats += self._accept(self._peak_idx)
+                self._peak_idx = None
+                falls = falls[1:]
+
+        for start in rises:
+            later = falls[falls > start]
+            end = later[0] if later.size else block.size
+            i = start + int(np.argmax(detrended[start:end]))
+            if later.size:
+                beats += self._accept(base + i)
+            else:
+                self._peak_idx, self._peak_val = base + i, detrended[i]
+        return beats
+
+    def _accept(self, idx):
+        idx = int(idx)
+        # Baseline and envelope are still settling during the first window
+        if idx < self._baseline.window:
+            return []
+        if self._last_beat is not None and idx - self._last_beat < self.refractory:
+            return []
+        prev, self._last_beat = self._last_beat, idx
+        if prev is None:
+            return []
+        rr = (idx - prev) * 1000.0 / self.sample_rate
+        if not self.min_rr < rr < self.max_rr:
+            return []
+        self.hrv.add(rr)
+        self._recent_rr = (self._recent_rr + [rr])[-self.smoothing:]
+        return [(idx, rr, 60000.0 / (sum(self._recent_rr) / len(self._recent_rr)))]
@@ -0,0 +1,160 @@
+import math
+from collections import deque
+
+from heartbot.config import (
+    STATS_WINDOW_SECONDS, EWMA_FAST_SECONDS, EWMA_SLOW_SECONDS,
+    BRADY_BPM, TACHY_BPM, EPISODE_MIN_SECONDS, ABRUPT_CHANGE_BPM,
+)
+
+# ====================== STREAMING BPM STATISTICS ======================
+# Everything here is updated once per reading in O(1) (amortized for the
+# windowed min/max), so a long session costs the same per beat as a short one.
+
+
+class RunningStats:
+    # Welford mean/variance over the whole session
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else None
+
+
+class WindowStats:
+    # Mean, min and max over the readings of the last `seconds`. A running sum
+    # gives the mean; monotonic deques give min and max.
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._items = deque()
+        self._sum = 0.0
+        self._min = deque()
+        self._max = deque()
+
+    def add(self, t, x):
+        self._items.append((t, x))
+        self._sum += x
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((t, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((t, x))
+
+        cutoff = t - self.seconds
+        while self._items[0][0] < cutoff:
+            _, old = self._items.popleft()
+            self._sum -= old
+        while self._min[0][0] < cutoff:
+            self._min.popleft()
+        while self._max[0][0] < cutoff:
+            self._max.popleft()
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    @property
+    def mean(self):
+        return self._sum / len(self._items) if self._items else None
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+
+class Ewma:
+    # Exponentially weighted mean with a time constant in seconds, so irregular
+    # beat spacing is weighted by elapsed time rather than by sample count
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.value = None
+        self._t = None
+
+    def add(self, t, x):
+        if self.value is None:
+            self.value = x
+        else:
+            alpha = 1.0 - math.exp(-max(t - self._t, 0.0) / self.seconds)
+            self.value += alpha * (x - self.value)
+        self._t = t
+
+
+class BpmMonitor:
+    # Session statistics plus episode detection on the fast EWMA:
+    #   bradycardia / tachycardia - below BRADY_BPM / above TACHY_BPM for at
+    #       least EPISODE_MIN_SECONDS (a 3 bpm margin is needed to end it)
+    #   abrupt change - fast and slow EWMA more than ABRUPT_CHANGE_BPM apart
+    # Episodes are dicts {kind, start, end, extreme}; end is None while active.
+    def __init__(self):
+        self.overall = RunningStats()
+        self.window = WindowStats(STATS_WINDOW_SECONDS)
+        self.fast = Ewma(EWMA_FAST_SECONDS)
+        self.slow = Ewma(EWMA_SLOW_SECONDS)
+        self.episodes = []
+        self.last_bpm = None
+        self._t = None
+        self._pending = {}  # kind -> time the condition started, until it is sustained
+        self._active = {}  # kind -> episode
+
+    def add(self, t, bpm):
+        # Backfilled readings can arrive late; the windows only move forward
+        t = t if self._t is None else max(t, self._t)
+        self._t = t
+        self.last_bpm = bpm
+        self.overall.add(bpm)
+        self.window.add(t, bpm)
+        self.fast.add(t, bpm)
+        self.slow.add(t, bpm)
+
+        level = self.fast.value
+        self._track("bradycardia", t, bpm, level < BRADY_BPM, level >= BRADY_BPM + 3, EPISODE_MIN_SECONDS, min)
+        self._track("tachycardia", t, bpm, level > TACHY_BPM, level <= TACHY_BPM - 3, EPISODE_MIN_SECONDS, max)
+        gap = abs(level - self.slow.value)
+        self._track("abrupt change", t, bpm, gap > ABRUPT_CHANGE_BPM, gap <= ABRUPT_CHANGE_BPM / 2, 0.0,
+                    lambda a, b: a if abs(a - self.slow.value) >= abs(b - self.slow.value) else b)
+
+    def _track(self, kind, t, bpm, start_cond, end_cond, min_seconds, pick):
+        episode = self._active.get(kind)
+        if episode is not None:
+            episode["extreme"] = pick(episode["extreme"], bpm)
+            if end_cond:
+                episode["end"] = t
+                del self._active[kind]
+            return
+        if not start_cond:
+            self._pending.pop(kind, None)
+            return
+        since = self._pending.setdefault(kind, t)
+        if t - since >= min_seconds:
+            episode = {"kind": kind, "start": since, "end": None, "extreme": bpm}
+            self.episodes.append(episode)
+            self._active[kind] = episode
+            del self._pending[kind]
+
+    @property
+    def active(self):
+        return list(self._active.values())
+
+    @property
+    def status(self):
+        level = self.fast.value
+        if level is None:
+            return None
+        return "low" if level < BRADY_BPM else "high" if level > TACHY_BPM else "normal"
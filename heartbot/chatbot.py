@@ -0,0 +1,132 @@
+import threading
+import time
+
+from heartbot.answer_cache import AnswerCache
+from heartbot.config import MODEL_NAME, EMBEDDING_BACKEND, CHATBOT_RETRY_SECONDS, CHATBOT_RETRY_MAX_SECONDS
+from heartbot.faq import faq
+from heartbot.metrics import register_collector, timed
+
+# ====================== BACKGROUND WARM-UP ======================
+# NLTK, sentence-transformers and the FAQ index are imported and built on a
+# separate thread, so the dashboard can paint while they load. Nothing heavy
+# is imported at module level here. A failed load (model download, database)
+# is retried by get_chatbot() after CHATBOT_RETRY_SECONDS, doubling up to
+# CHATBOT_RETRY_MAX_SECONDS, instead of disabling chat until a restart.
+#
+# With a learned_collection, questions it cannot answer are recorded in the
+# shared learned FAQ (heartbot.learned_faq) and curator answers are served
+# from faq_index, which is swapped for a new version on every publish.
+
+
+class Chatbot:
+    def __init__(self, learned_collection=None):
+        self.ready = threading.Event()
+        self.error = None
+        self.failed_at = None
+        self.load_seconds = None
+        self.encoder = None
+        self.faq_index = None
+        self.preprocess = None
+        self.learned_collection = learned_collection
+        self.learned = None
+        self._publish_lock = threading.Lock()
+        self.answer_cache = AnswerCache()
+        self._thread = threading.Thread(target=self._load, name="chatbot-warmup", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def is_ready(self):
+        return self.ready.is_set() and self.error is None
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            from heartbot import text
+            from heartbot.embeddings import FaqIndex, load_sentence_model, model_id
+            from heartbot.embedding_service import BatchingEncoder
+
+            text.ensure_nltk_data()
+            model = load_sentence_model(MODEL_NAME, EMBEDDING_BACKEND)
+            self.faq_index = FaqIndex.build(model, model_id(MODEL_NAME, EMBEDDING_BACKEND), faq)
+            self.encoder = BatchingEncoder(model)
+            if self.learned_collection is not None:
+                from heartbot.learned_faq import LearnedFaq
+
+                self.learned = LearnedFaq(self.learned_collection, model_id(MODEL_NAME, EMBEDDING_BACKEND))
+                self.learned.load(self.encoder.encode)
+                self.faq_index = self.faq_index.add(self.encoder, *self.learned.answered())
+            # First calls load WordNet and allocate the model's buffers
+            self.encoder.encode([text.preprocess_input("warming up heart rates")])
+            self.preprocess = text.preprocess_input
+            register_collector(self.queue_depths)
+            register_collector(self.cache_counts, kind="counter")
+        except Exception as e:
+            self.error = e
+            self.failed_at = time.monotonic()
+        finally:
+            self.load_seconds = time.perf_counter() - started
+            self.ready.set()
+
+    def best_match(self, processed, index):
+        """Return (item, score) for already preprocessed text, using the answer cache."""
+        match = self.answer_cache.get(index.version, processed)
+        if match is None:
+            embedding = self.encoder.encode([processed])[0]
+            with timed("search"):
+                match = index.search(embedding, k=1)[0]
+            self.answer_cache.put(index.version, processed, match)
+        return match
+
+    def learn(self, question, processed):
+        """Record a question the FAQ could not answer, shared with every other session."""
+        if self.learned is not None:
+            self.learned.record(question, processed, self.encoder.encode)
+
+    def publish(self, entry_id, answer, curator):
+        """Serve a curator's answer to a learned question; False if the question no longer exists."""
+        # Copy-on-write: sessions searching the old index finish with it, its cached answers are dropped
+        answered = self.learned.answer(entry_id, answer, curator)
+        if answered is None:
+            return False
+        item, embedding = answered
+        with self._publish_lock:
+            old = self.faq_index
+            self.faq_index = old.add(self.encoder, [item], embedding[None, :])
+        self.answer_cache.invalidate(old.version)
+        return True
+
+    def queue_depths(self):
+        return {"embedding_queue_depth": self.encoder.stats()["queue_depth"],
+                "answer_cache_size": self.answer_cache.stats()["size"]}
+
+    def cache_counts(self):
+        stats = self.answer_cache.stats()
+        return {"answer_cache_hits": stats["hits"], "answer_cache_misses": stats["misses"]}
+
+
+_chatbot = None
+_chatbot_lock = threading.Lock()
+_failures = 0  # failed loads in a row
+
+def retry_delay(failures):
+    return min(CHATBOT_RETRY_SECONDS * 2 ** failures, CHATBOT_RETRY_MAX_SECONDS)
+
+def get_chatbot():
+    """The process-wide Chatbot, shared by every session and page; starts loading on first use,
+    and again once the retry delay has passed after a failed load."""
+    global _chatbot, _failures
+    with _chatbot_lock:
+        if _chatbot is not None and _chatbot.error is not None:
+            if time.monotonic() - _chatbot.failed_at >= retry_delay(_failures):
+                _chatbot = None
+                _failures += 1
+        elif _chatbot is not None and _chatbot.is_ready:
+            _failures = 0
+        if _chatbot is None:
+            from heartbot.db import LEARNED_FAQ, get_db
+
+            _chatbot = Chatbot(get_db()[LEARNED_FAQ]).start()
+        return _chatbot
@@ -0,0 +1,96 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ====================== SERIAL / LIVE STREAM ======================
+SERIAL_PORT = os.getenv("SERIAL_PORT", "COM7")
+SERIAL_BAUD = int(os.getenv("SERIAL_BAUD", "115200"))
+SERIAL_PROTOCOL = os.getenv("SERIAL_PROTOCOL", "binary")  # binary frames | text ("BPM: x" lines, older sketches)
+RAW_SAMPLE_RATE = int(os.getenv("RAW_SAMPLE_RATE", "500"))  # used until the sketch announces RATE:
+SERIAL_BUFFER_SIZE = int(os.getenv("SERIAL_BUFFER_SIZE", "4096"))
+LIVE_REFRESH_SECONDS = float(os.getenv("LIVE_REFRESH_SECONDS", "0.25"))  # status tick while idle
+LIVE_CHART_MODE = os.getenv("LIVE_CHART_MODE", "window")  # window (Vega line chart) | plotly; both redraw the window per frame
+LIVE_CHART_FPS = float(os.getenv("LIVE_CHART_FPS", "20"))
+LIVE_CHART_WINDOW = int(os.getenv("LIVE_CHART_WINDOW", "50"))
+LIVE_WAVEFORM_SECONDS = float(os.getenv("LIVE_WAVEFORM_SECONDS", "5"))  # raw signal shown when the sketch streams samples
+LIVE_WAVEFORM_POINTS = int(os.getenv("LIVE_WAVEFORM_POINTS", "1000"))  # sent per redraw at most (min / max per bin)
+LIVE_SLICE_SECONDS = float(os.getenv("LIVE_SLICE_SECONDS", "0.5"))  # longest a chat message waits while live
+MAX_READINGS = 15
+
+# ====================== BPM STATISTICS / EPISODES ======================
+STATS_WINDOW_SECONDS = float(os.getenv("STATS_WINDOW_SECONDS", "30"))  # windowed mean / min / max
+EWMA_FAST_SECONDS = float(os.getenv("EWMA_FAST_SECONDS", "5"))
+EWMA_SLOW_SECONDS = float(os.getenv("EWMA_SLOW_SECONDS", "60"))
+BRADY_BPM = float(os.getenv("BRADY_BPM", "60"))
+TACHY_BPM = float(os.getenv("TACHY_BPM", "100"))
+EPISODE_MIN_SECONDS = float(os.getenv("EPISODE_MIN_SECONDS", "10"))  # how long brady/tachycardia must last
+ABRUPT_CHANGE_BPM = float(os.getenv("ABRUPT_CHANGE_BPM", "20"))  # fast vs slow EWMA gap
+
+# ====================== INGESTION GATEWAY ======================
+BPM_SOURCE = os.getenv("BPM_SOURCE", "serial")  # serial (this session opens SERIAL_PORT) | gateway (python -m heartbot.gateway)
+GATEWAY_HOST = os.getenv("GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "8765"))
+GATEWAY_DEVICES = os.getenv("GATEWAY_DEVICES", "devices.json")  # {"port or USB serial number": "username"}
+GATEWAY_SCAN_SECONDS = float(os.getenv("GATEWAY_SCAN_SECONDS", "5"))
+GATEWAY_FLUSH_SECONDS = float(os.getenv("GATEWAY_FLUSH_SECONDS", "2"))
+GATEWAY_BATCH_SIZE = int(os.getenv("GATEWAY_BATCH_SIZE", "500"))  # flush early once this many readings are pending
+GATEWAY_BACKOFF_MAX = float(os.getenv("GATEWAY_BACKOFF_MAX", "30"))  # seconds between reconnect attempts, at most
+
+# ====================== STORAGE ======================
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/heartbot")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "heartbot_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))  # kept warm so the first query skips the handshake
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))  # server selection / connect, fail fast instead of 30 s
+BPM_BUCKET_SIZE = int(os.getenv("BPM_BUCKET_SIZE", "60"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))  # messages, keep it even (You/HeartBot pairs)
+BPM_ROLLUPS_ENABLED = os.getenv("BPM_ROLLUPS_ENABLED", "false").lower() == "true"  # per-hour/day count, mean, min, max, NOT encrypted
+EXPORT_SLICE_HOURS = float(os.getenv("EXPORT_SLICE_HOURS", "24"))  # export unit: one record batch per user per slice
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(os.cpu_count() or 1)))  # python -m heartbot.export; 0 = in process
+
+# ====================== HISTORY VIEW ======================
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))  # points sent per render, whatever the span
+HISTORY_RAW_SECONDS = float(os.getenv("HISTORY_RAW_SECONDS", "10800"))  # spans up to this plot raw readings
+HISTORY_MINUTE_SECONDS = float(os.getenv("HISTORY_MINUTE_SECONDS", "86400"))  # up to this, raw readings grouped per minute
+HISTORY_MAX_PERIODS = int(os.getenv("HISTORY_MAX_PERIODS", "10000"))  # rollup documents read per render, at most
+
+# ====================== AUTHENTICATION ======================
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))  # processes hashing at once
+AUTH_QUEUE_SIZE = int(os.getenv("AUTH_QUEUE_SIZE", "32"))  # logins waiting for a worker before new ones are turned away
+AUTH_WAIT_SECONDS = float(os.getenv("AUTH_WAIT_SECONDS", "10"))  # longest a login waits for its hash
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")  # signs session tokens; derived from ENCRYPTION_KEY when empty
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "2"))  # a reload past this asks for the password again
+
+# ====================== METRICS / PROFILING ======================
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # stage timings, about 1 µs each
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))  # recent timings per stage behind the admin percentiles
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # Prometheus /metrics of the dashboard process; 0 = off
+GATEWAY_METRICS_PORT = int(os.getenv("GATEWAY_METRICS_PORT", "9465"))  # same for python -m heartbot.gateway
+ADMIN_USERS = [u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()]  # may open the admin panel
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# ====================== CHATBOT ======================
+MODEL_NAME = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
+CHATBOT_RETRY_SECONDS = float(os.getenv("CHATBOT_RETRY_SECONDS", "10"))  # after a failed load; doubles per failure
+CHATBOT_RETRY_MAX_SECONDS = float(os.getenv("CHATBOT_RETRY_MAX_SECONDS", "300"))
+ONNX_INT8_FILE = os.getenv("ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(".cache", "embeddings"))
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "3"))
+APPROX_INDEX_THRESHOLD = int(os.getenv("APPROX_INDEX_THRESHOLD", "20000"))  # switch to IVF above this many entries
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "50000"))
+PREPROCESS_CACHE_SIZE = int(os.getenv("PREPROCESS_CACHE_SIZE", "4096"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "10000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+LEARNED_FAQ_MAX_ENTRIES = int(os.getenv("LEARNED_FAQ_MAX_ENTRIES", "5000"))  # unanswered questions kept, shared by all users
+LEARNED_FAQ_MERGE_SIMILARITY = float(os.getenv("LEARNED_FAQ_MERGE_SIMILARITY", "0.9"))  # cosine; closer questions count as one
+LEARNED_FAQ_EXAMPLES = int(os.getenv("LEARNED_FAQ_EXAMPLES", "5"))  # latest phrasings kept per learned question
+LEARNED_FAQ_REVIEW_SIZE = int(os.getenv("LEARNED_FAQ_REVIEW_SIZE", "25"))  # questions per curator page
+CURATOR_USERS = [u.strip() for u in os.getenv("CURATOR_USERS", "").split(",") if u.strip()]  # answer learned questions; admins can too
@@ -0,0 +1,180 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+from heartbot.metrics import count, timed
+
+# ====================== LOAD ENV & ENCRYPTION ======================
+load_dotenv()
+
+# A key is generated only on a first run: no ENCRYPTION_KEY and no .env yet.
+# A missing or malformed key anywhere else stops the app instead, and an
+# existing .env is never rewritten; it may hold OLD_ENCRYPTION_KEYS, without
+# which every data key wrapped by an old master key is lost.
+KEY_GENERATED = False
+ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "").strip()
+if "ENCRYPTION_KEY" not in os.environ and not os.path.exists(".env"):
+    ENCRYPTION_KEY = Fernet.generate_key().decode()
+    with open(".env", "x") as f:
+        f.write(f"ENCRYPTION_KEY={ENCRYPTION_KEY}\n")
+        f.write("MONGODB_URI=mongodb://localhost:27017/heartbot\n")
+    os.environ["ENCRYPTION_KEY"] = ENCRYPTION_KEY
+    KEY_GENERATED = True
+elif not ENCRYPTION_KEY:
+    raise RuntimeError("ENCRYPTION_KEY is not set: add it to the environment or .env "
+                       "(a new key cannot read data encrypted with the old one)")
+
+# Previous master keys, comma separated, still accepted for decryption
+OLD_ENCRYPTION_KEYS = [k.strip() for k in os.getenv("OLD_ENCRYPTION_KEYS", "").split(",") if k.strip()]
+KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", "1024"))
+
+def _fernet(name, key):
+    try:
+        return Fernet(key.encode())
+    except ValueError as e:
+        raise RuntimeError(f"{name} is not a valid Fernet key (44 url-safe base64 characters); "
+                           "fix it in the environment or .env (a new key cannot read data encrypted with the old one)") from e
+
+cipher_suite = MultiFernet([_fernet("ENCRYPTION_KEY", ENCRYPTION_KEY)]
+                           + [_fernet("OLD_ENCRYPTION_KEYS", k) for k in OLD_ENCRYPTION_KEYS])
+
+
+class DecryptionError(ValueError):
+    pass
+
+
+def encrypt_data(data):
+    if isinstance(data, list):
+        data_str = json.dumps(data)
+        return cipher_suite.encrypt(data_str.encode()).decode()
+    return cipher_suite.encrypt(str(data).encode()).decode()
+
+def decrypt_data(encrypted_data):
+    try:
+        decrypted = cipher_suite.decrypt(encrypted_data.encode()).decode()
+    except (InvalidToken, AttributeError) as e:
+        raise DecryptionError("cannot decrypt with ENCRYPTION_KEY or OLD_ENCRYPTION_KEYS") from e
+    return json.loads(decrypted) if decrypted.startswith('[') else decrypted
+
+
+# ====================== ENVELOPE ENCRYPTION ======================
+# Every user has a random 256-bit data key, stored in `data_keys` wrapped
+# (Fernet-encrypted) by the master ENCRYPTION_KEY. Each stored chunk is
+# AES-GCM encrypted with the owner's data key on its own:
+#   chunk = nonce (12 bytes) | ciphertext + tag,  associated data = username
+# so any chunk decrypts without touching the rest of the history, and a chunk
+# copied into another user's documents fails authentication. Rotating the
+# master key only rewraps the data keys (python -m heartbot.crypto rotate).
+# Chunks written before this scheme are Fernet strings and still decrypt.
+
+class KeyRing:
+    def __init__(self, collection, cache_size=KEY_CACHE_SIZE):
+        self.collection = collection
+        self.cache_size = cache_size
+        self._ciphers = OrderedDict()  # username -> AESGCM, most recent last
+        self._lock = Lock()
+        self.unwraps = 0
+
+    def ensure_indexes(self):
+        self.collection.create_index("username", unique=True)
+
+    def cipher(self, username):
+        with self._lock:
+            aead = self._ciphers.get(username)
+            if aead is not None:
+                self._ciphers.move_to_end(username)
+                return aead
+        aead = AESGCM(self._data_key(username))
+        with self._lock:
+            self._ciphers[username] = aead
+            if len(self._ciphers) > self.cache_size:
+                self._ciphers.popitem(last=False)
+        return aead
+
+    def _data_key(self, username):
+        doc = self.collection.find_one({"username": username}, {"key": 1})
+        if doc is None:
+            try:
+                wrapped = cipher_suite.encrypt(AESGCM.generate_key(bit_length=256))
+                self.collection.insert_one({"username": username, "key": wrapped, "created": datetime.now()})
+                doc = {"key": wrapped}
+            except DuplicateKeyError:
+                # Another process created it first
+                doc = self.collection.find_one({"username": username}, {"key": 1})
+        self.unwraps += 1
+        count("data_key_unwraps")
+        try:
+            return cipher_suite.decrypt(doc["key"])
+        except InvalidToken as e:
+            raise DecryptionError(f"data key of {username!r} was wrapped with an unknown master key") from e
+
+    def encrypt(self, username, data):
+        aead = self.cipher(username)  # a first use may fetch the data key: timed as Mongo, not here
+        with timed("encrypt"):
+            nonce = os.urandom(12)
+            plain = json.dumps(data, separators=(",", ":")).encode()
+            return nonce + aead.encrypt(nonce, plain, username.encode())
+
+    def decrypt(self, username, chunk):
+        if isinstance(chunk, str):
+            with timed("decrypt"):
+                return decrypt_data(chunk)
+        aead = self.cipher(username)
+        with timed("decrypt"):
+            chunk = bytes(chunk)
+            try:
+                plain = aead.decrypt(chunk[:12], chunk[12:], username.encode())
+            except InvalidTag as e:
+                raise DecryptionError(f"chunk does not belong to {username!r} or is corrupted") from e
+            return json.loads(plain)
+
+    def rotate(self):
+        """Rewrap every data key with the current ENCRYPTION_KEY; stored chunks are untouched."""
+        current = Fernet(ENCRYPTION_KEY.encode())
+        rotated = 0
+        for doc in self.collection.find({}, {"key": 1}):
+            try:
+                current.decrypt(doc["key"])
+                continue  # already wrapped with the current key
+            except InvalidToken:
+                pass
+            key = cipher_suite.rotate(doc["key"])
+            self.collection.update_one({"_id": doc["_id"]}, {"$set": {"key": key, "rotated": datetime.now()}})
+            rotated += 1
+        return rotated
+
+
+_keyrings = {}
+_keyrings_lock = Lock()
+
+def get_keyring(database):
+    # One keyring (and unwrap cache) per database for the whole process
+    with _keyrings_lock:
+        key = (id(database.client), database.name)
+        keyring = _keyrings.get(key)
+        if keyring is None:
+            keyring = _keyrings[key] = KeyRing(database["data_keys"])
+            keyring.ensure_indexes()
+        return keyring
+
+
+def main():
+    # python -m heartbot.crypto rotate
+    # after setting a new ENCRYPTION_KEY and moving the old one to OLD_ENCRYPTION_KEYS
+    if sys.argv[1:] != ["rotate"]:
+        sys.exit("usage: python -m heartbot.crypto rotate")
+    from heartbot.db import get_db
+    print(f"rewrapped {get_keyring(get_db()).rotate()} data keys")
+
+
+if __name__ == "__main__":
+    main()
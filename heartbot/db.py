@@ -0,0 +1,111 @@
+import logging
+import time
+from functools import lru_cache
+
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+from heartbot.config import (
+    MONGODB_URI, MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_MS, MONGO_TIMEOUT_MS,
+)
+from heartbot.crypto import get_keyring
+from heartbot.learned_faq import ensure_learned_indexes
+from heartbot.metrics import MongoCommandTimer
+from heartbot.storage import BPM_ROLLUPS, ensure_bpm_indexes, ensure_chat_indexes, ensure_rollup_indexes
+
+log = logging.getLogger(__name__)
+
+# ====================== SHARED MONGO ACCESS ======================
+# One pooled client per process for every page (app.py, login, signup) and
+# for the gateway. Indexes are created once, the first time get_db() runs.
+
+USERS = "users"
+CHAT_MESSAGES = "chat_messages"
+BPM_BUCKETS = "bpm_buckets"
+LEARNED_FAQ = "learned_faq"
+USERS_DUPLICATES = "users_duplicates"
+
+
+def create_client(uri=MONGODB_URI):
+    return MongoClient(
+        uri,
+        appname="heartbot",
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        retryWrites=True,
+        event_listeners=[MongoCommandTimer()],  # per-command timings for heartbot.metrics
+    )
+
+def duplicate_usernames(db):
+    """{username: [_id, ...]} for every name with more than one account, oldest first."""
+    groups = db[USERS].aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ])
+    return {g["_id"]: g["ids"] for g in groups}
+
+def ensure_user_index(db):
+    try:
+        db[USERS].create_index("username", unique=True)
+        return True
+    except DuplicateKeyError:
+        # Older versions could sign the same name up twice. Keep serving pages
+        # without the unique index until the duplicates are cleaned up.
+        log.error("users: the unique username index was not created because these names have more than one "
+                  "account: %s. Until it exists, concurrent signups can create more duplicates. Run "
+                  "`python -m heartbot.storage migrate` to keep the oldest account of each name and move the "
+                  "others to %s.", ", ".join(sorted(duplicate_usernames(db))), USERS_DUPLICATES)
+        return False
+
+def dedupe_users(db):
+    """Keep the oldest account of each duplicated username, move the rest to users_duplicates
+    and create the unique index. Returns the number of accounts moved."""
+    moved = 0
+    for ids in duplicate_usernames(db).values():
+        for doc in db[USERS].find({"_id": {"$in": ids[1:]}}):
+            db[USERS_DUPLICATES].replace_one({"_id": doc["_id"]}, doc, upsert=True)
+            db[USERS].delete_one({"_id": doc["_id"]})
+            moved += 1
+    ensure_user_index(db)
+    return moved
+
+def ensure_indexes(db):
+    ensure_user_index(db)
+    ensure_chat_indexes(db[CHAT_MESSAGES])
+    ensure_bpm_indexes(db[BPM_BUCKETS])
+    ensure_rollup_indexes(db[BPM_ROLLUPS])
+    ensure_learned_indexes(db[LEARNED_FAQ])
+    get_keyring(db)  # unique index on data_keys
+
+@lru_cache(maxsize=None)
+def get_db():
+    db = create_client()[MONGO_DB_NAME]
+    ensure_indexes(db)
+    return db
+
+# ====================== USERS ======================
+def find_user(db, username):
+    """Return {"password": hash} for `username`, or None."""
+    return db[USERS].find_one({"username": username}, {"_id": 0, "password": 1})
+
+def token_generation(db, username):
+    """The user's session token generation (0 until the first logout), or None if there is no such user."""
+    user = db[USERS].find_one({"username": username}, {"_id": 0, "token_generation": 1})
+    return None if user is None else user.get("token_generation", 0)
+
+def revoke_tokens(db, username):
+    # Every session token issued to the user so far, on any device, stops working
+    db[USERS].update_one({"username": username}, {"$inc": {"token_generation": 1}})
+
+def create_user(db, username, password_hash):
+    # A single insert against the unique index: concurrent signups for the
+    # same name cannot both succeed, unlike find-then-insert.
+    try:
+        db[USERS].insert_one({"username": username, "password": password_hash, "created_at": time.time()})
+        return True
+    except DuplicateKeyError:
+        return False
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from heartbot.config import EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS
+from heartbot.metrics import observe, timed
+
+# ====================== MICRO-BATCHING ENCODER ======================
+# One worker thread owns the model. Callers from any Streamlit session queue
+# their texts and block on a Future; the worker waits up to `max_wait_ms`
+# after the first request for others to arrive and encodes them as one batch.
+
+_STOP = object()
+
+
+class BatchingEncoder:
+    def __init__(self, model, max_batch_size=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS, history=1000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._waits = deque(maxlen=history)
+        self._requests = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts):
+        future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future.result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch, count = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while count < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            texts = [t for item in batch for t in item[0]]
+            for _, _, queued in batch:
+                observe("encode_wait", started - queued)
+            try:
+                with timed("encode"):
+                    embeddings = np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future, _ in batch:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batch_sizes[len(texts)] += 1
+                self._waits.extend((started - queued) * 1000 for _, _, queued in batch)
+
+    def stats(self):
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": sum(k * v for k, v in self._batch_sizes.items()) / batches if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_wait_ms_p50": float(np.percentile(waits, 50)),
+                "queue_wait_ms_p95": float(np.percentile(waits, 95)),
+                "queue_wait_ms_max": float(waits.max()),
+                "queue_depth": self._queue.qsize(),
+            }
@@ -0,0 +1,88 @@
+import hashlib
+import os
+
+import numpy as np
+
+from heartbot.config import EMBEDDING_CACHE_DIR, SEARCH_TOP_K, MODEL_NAME, EMBEDDING_BACKEND, ONNX_INT8_FILE
+from heartbot.retrieval import build_index
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# ====================== MODEL BACKENDS ======================
+# "onnx" runs the exported fp32 graph on onnxruntime, "onnx-int8" the
+# dynamically quantized graph published with the model. Both need
+# `pip install sentence-transformers[onnx]`.
+
+def load_sentence_model(model_name=MODEL_NAME, backend=EMBEDDING_BACKEND):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                   model_kwargs={"file_name": ONNX_INT8_FILE})
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {BACKENDS}")
+
+def model_id(model_name=MODEL_NAME, backend=EMBEDDING_BACKEND):
+    # Backends produce slightly different vectors, so they get separate cache files
+    return model_name if backend == "torch" else f"{model_name}:{backend}"
+
+# ====================== ON-DISK EMBEDDING CACHE ======================
+# Embeddings are stored as float32 .npy files named after a hash of the model
+# name and the exact question list, and opened memory-mapped. Changing either
+# the model or any question produces a new key, so stale files are never used.
+
+def cache_key(model_name, questions):
+    h = hashlib.sha256(model_name.encode("utf-8"))
+    for q in questions:
+        h.update(b"\0")
+        h.update(q.encode("utf-8"))
+    return h.hexdigest()[:24]
+
+def encode(model, texts):
+    return np.asarray(model.encode(texts), dtype=np.float32)
+
+def load_or_encode(model, model_name, questions, cache_dir=EMBEDDING_CACHE_DIR):
+    path = os.path.join(cache_dir, f"{cache_key(model_name, questions)}.npy")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, encode(model, questions))
+        os.replace(tmp, path)
+    return np.load(path, mmap_mode="r")
+
+
+class FaqIndex:
+    # Question/answer items plus a search index over their embeddings. The
+    # built-in part comes from the disk cache; add() encodes only new questions.
+    # `version` changes whenever the contents change, so results cached against
+    # one version are never served for another.
+    def __init__(self, items, vectors, version):
+        self.items = list(items)
+        self.vectors = vectors
+        self.version = version
+
+    @classmethod
+    def build(cls, model, model_name, items):
+        questions = [item['question'] for item in items]
+        return cls(items, build_index(load_or_encode(model, model_name, questions)), cache_key(model_name, questions))
+
+    def add(self, model, new_items, embeddings=None):
+        # embeddings: already computed for new_items (e.g. stored with learned questions), skips the model
+        if not new_items:
+            return self
+        questions = [item['question'] for item in new_items]
+        vectors = self.vectors.copy()
+        vectors.add(encode(model, questions) if embeddings is None else embeddings)
+        return FaqIndex(self.items + list(new_items), vectors, cache_key(self.version, questions))
+
+    def search(self, query_embedding, k=SEARCH_TOP_K):
+        """Return [(item, score), ...] best first."""
+        ids, scores = self.vectors.search(query_embedding, k)
+        return [(self.items[i], float(s)) for i, s in zip(ids, scores)]
+
+    def __len__(self):
+        return len(self.items)
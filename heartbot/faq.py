@@ -0,0 +1,31 @@
+# ====================== BUILT-IN FAQ ======================
+faq = [
+    {"question": "Hello!", "answer": "Hey there! Welcome to HeartBot, your AI heart health buddy. How can I help you today?"},
+    {"question": "Hi!", "answer": "Hi! Glad you're here with HeartBot. What's on your mind about your heart?"},
+    {"question": "Good morning!", "answer": "Good morning! Nice to see you. How can HeartBot assist you with your heart health today?"},
+    {"question": "Good afternoon!", "answer": "Good afternoon! I'm HeartBot, here to help. What would you like to know about your heart?"},
+    {"question": "Good evening!", "answer": "Good evening! Welcome to HeartBot. How can I support your heart health tonight?"},
+    {"question": "What is normal BPM?", "answer": "A normal heart rate is between 60 and 100 BPM when you're resting."},
+    {"question": "What is bpm?", "answer": "BPM means 'beats per minute' — how many times your heart beats in one minute."},
+    {"question": "My heart rate is 120, is that bad?", "answer": "120 BPM is a bit high if you're resting. Try sitting calmly and taking deep breaths. If it stays high, you should talk to a doctor."},
+    {"question": "What happens if my bpm is too low?", "answer": "If your BPM is below 60 and you feel dizzy or tired, you should get it checked. But some fit people naturally have low BPM."},
+    {"question": "Why does my heart beat fast sometimes?", "answer": "It can happen due to stress, fear, exercise, or caffeine. Usually it's normal if it slows down after some rest."},
+    {"question": "How can I calm my heart rate?", "answer": "Sit down, relax, take slow deep breaths, and drink some water. Avoid stress or caffeine."},
+    {"question": "Does coffee increase bpm?", "answer": "Yes! Coffee has caffeine, which can make your heart beat faster for a while."},
+    {"question": "Why does my heart race when I'm scared?", "answer": "That's normal! Your body releases adrenaline when you're scared, making your heart beat faster."},
+    {"question": "What should I do if my heart rate is too high?", "answer": "Sit quietly, breathe slowly, and relax. If it doesn't come down or you feel unwell, contact a doctor."},
+    {"question": "Is 70 bpm good?", "answer": "Yes! 70 BPM is perfectly normal for most people."},
+    {"question": "What is a healthy heart rate for adults?", "answer": "Most adults have a healthy resting heart rate between 60 and 100 BPM."},
+    {"question": "Can emotions change heart rate?", "answer": "Yes! Happiness, anger, or fear can make your heart beat faster or slower."},
+    {"question": "Does exercise increase bpm?", "answer": "Yes. When you exercise, your heart beats faster to send oxygen to your muscles."},
+    {"question": "Why does my heart beat fast after climbing stairs?", "answer": "That's normal! Your body needs more oxygen, so your heart beats faster to keep up."},
+    {"question": "Can dehydration cause fast heart rate?", "answer": "Yes, if you're dehydrated your heart works harder to pump blood, so BPM can go up."},
+    {"question": "Can I check my bpm with my finger?", "answer": "Yes, you can feel your pulse on your wrist or neck and count beats for 60 seconds."},
+    {"question": "What causes irregular heartbeats?", "answer": "Irregular heartbeats can be caused by stress, lack of sleep, alcohol, or medical conditions like arrhythmia. Consult a doctor if it persists."},
+    {"question": "Is it normal to feel my heart pounding?", "answer": "Yes, if you're active or excited, but if it happens at rest or with dizziness, see a doctor."},
+    {"question": "How can I improve my heart health?", "answer": "Eat a balanced diet, exercise regularly, avoid smoking, and manage stress for better heart health."},
+    {"question": "What is a heart attack?", "answer": "A heart attack occurs when blood flow to the heart is blocked. Symptoms include chest pain, shortness of breath—seek emergency help immediately."},
+    {"question": "What are signs of a heart attack?", "answer": "Look for chest pain, shortness of breath, arm or jaw discomfort, or nausea—call emergency services (e.g., 108 in India) right away if you notice these."},
+    {"question": "Should I exercise if my heart rate is high?", "answer": "No, rest and hydrate. If it doesn't normalize, contact a doctor or emergency services."},
+    {"question": "What to do if I feel chest pain?", "answer": "Stop what you're doing, sit down, and call emergency services (e.g., 108 in India) if the pain lasts more than a few minutes or worsens."}
+]
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from collections import defaultdict
+
+import serial
+from pymongo.errors import PyMongoError
+from serial.tools import list_ports
+
+from heartbot.config import (
+    SERIAL_BAUD, SERIAL_PROTOCOL, GATEWAY_HOST, GATEWAY_PORT, GATEWAY_DEVICES,
+    GATEWAY_SCAN_SECONDS, GATEWAY_FLUSH_SECONDS, GATEWAY_BATCH_SIZE, GATEWAY_BACKOFF_MAX,
+    METRICS_HOST, GATEWAY_METRICS_PORT,
+)
+from heartbot import metrics
+from heartbot.serial_reader import StreamParser
+from heartbot.auth import verify_token
+from heartbot.db import get_db, token_generation, BPM_BUCKETS
+from heartbot.storage import new_session_id, append_bpm_batches
+
+# ====================== INGESTION GATEWAY ======================
+# One process, one event loop, any number of sensors:
+#   python -m heartbot.gateway
+#
+# - Every GATEWAY_SCAN_SECONDS the serial ports are listed and each port found
+#   in the device map (GATEWAY_DEVICES) gets its own reader task.
+# - A reader task opens its port non-blocking and wakes only when bytes are
+#   readable, so idle devices cost nothing. Failures reconnect with
+#   exponential backoff and jitter; every connection starts a new session.
+# - Readings are buffered per (username, session) and written with one
+#   bulk_write every GATEWAY_FLUSH_SECONDS or GATEWAY_BATCH_SIZE readings.
+# - Dashboards subscribe over TCP with "SUB <username> <token>\n", token being
+#   a heartbot.auth session token signed for that username (the dashboard
+#   issues a short-lived one), and receive
+#   one JSON line per reading: {"t", "bpm", "device", "session", "hrv"}, and
+#   one per raw sample block: {"t0", "rate", "raw"}. Raw blocks are best
+#   effort: a subscriber whose queue is half full gets readings only.
+# - Prometheus metrics on GATEWAY_METRICS_PORT (see heartbot.metrics).
+
+log = logging.getLogger("heartbot.gateway")
+
+POLL_SECONDS = 0.02  # only for ports without a selectable fd (Windows)
+SUBSCRIBER_QUEUE = 256  # messages buffered per slow subscriber before the oldest are dropped
+
+
+class DeviceMap:
+    # {"COM7": "alice", "/dev/ttyACM0": "bob", "<USB serial number>": "carol"}
+    # Reloaded whenever the file changes, so sensors can be reassigned live.
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self.devices = {}
+
+    def reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self.devices
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as f:
+                    self.devices = json.load(f)
+                self._mtime = mtime
+                log.info("loaded %d device mappings from %s", len(self.devices), self.path)
+            except (OSError, ValueError) as e:
+                log.error("cannot read %s: %s", self.path, e)
+        return self.devices
+
+    def lookup(self, port_info):
+        return self.devices.get(port_info.device) or (
+            port_info.serial_number and self.devices.get(port_info.serial_number)
+        )
+
+
+class Gateway:
+    def __init__(self, collection, device_map, baudrate=SERIAL_BAUD, protocol=SERIAL_PROTOCOL):
+        self.collection = collection
+        self.device_map = device_map
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.tasks = {}  # port -> reader task
+        self.present = set()  # ports seen by the last scan
+        self.subscribers = defaultdict(set)  # username -> {asyncio.Queue}
+        self.pending = defaultdict(list)  # (username, session) -> [(t, bpm), ...]
+        self.pending_count = 0
+        self.stats = defaultdict(int)
+        self._flush_now = None
+        metrics.register_collector(self.queue_depths)
+        metrics.register_collector(lambda: {f"gateway_{k}": v for k, v in dict(self.stats).items()}, kind="counter")
+
+    async def run(self, host=GATEWAY_HOST, port=GATEWAY_PORT):
+        self._flush_now = asyncio.Event()
+        server = await asyncio.start_server(self.handle_subscriber, host, port)
+        log.info("subscribers on %s:%d", host, port)
+        try:
+            async with server:
+                await asyncio.gather(self.discover(), self.writer())
+        finally:
+            for task in list(self.tasks.values()):
+                task.cancel()
+            await self.flush()
+
+    # ---------------------- devices ----------------------
+    async def discover(self):
+        while True:
+            devices = self.device_map.reload()
+            ports = await asyncio.to_thread(list_ports.comports)
+            found = {info.device: self.device_map.lookup(info) for info in ports}
+            # Mapped paths that enumeration does not list (udev symlinks, ptys)
+            found.update({k: v for k, v in devices.items() if k not in found and os.path.exists(k)})
+            self.present = set(found)
+            for port, username in found.items():
+                if username and port not in self.tasks:
+                    self.tasks[port] = asyncio.create_task(self.device_loop(port, username))
+            await asyncio.sleep(GATEWAY_SCAN_SECONDS)
+
+    async def device_loop(self, port, username):
+        backoff = 0.5
+        try:
+            while port in self.present:
+                try:
+                    ser = await asyncio.to_thread(serial.Serial, port, self.baudrate, timeout=0)
+                except (serial.SerialException, OSError) as e:
+                    log.warning("%s: open failed (%s), retrying in %.1fs", port, e, backoff)
+                else:
+                    session = new_session_id()
+                    log.info("%s: streaming for %s, session %s", port, username, session)
+                    backoff = 0.5
+                    try:
+                        await self.pump(ser, StreamParser(self.protocol), username, session, port)
+                    except (serial.SerialException, OSError) as e:
+                        log.warning("%s: link lost (%s)", port, e)
+                    finally:
+                        ser.close()
+                    self.stats["reconnects"] += 1
+                await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+                backoff = min(backoff * 2, GATEWAY_BACKOFF_MAX)
+        finally:
+            # Picked up again by the next scan if the port comes back
+            self.tasks.pop(port, None)
+
+    async def pump(self, ser, parser, username, session, port):
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        try:
+            fd = ser.fileno()
+            loop.add_reader(fd, readable.set)
+        except (AttributeError, NotImplementedError):
+            fd = None
+        try:
+            while True:
+                if fd is not None:
+                    await readable.wait()
+                    readable.clear()
+                else:
+                    await asyncio.sleep(POLL_SECONDS)
+                # timeout=0: returns what is queued and never blocks the loop
+                chunk = ser.read(ser.in_waiting or 1)
+                if chunk:
+                    readings = parser.feed(chunk)
+                    if readings:
+                        self.publish(username, session, port, readings, parser.hrv_snapshot())
+                    if parser.raw_blocks and username in self.subscribers:
+                        self.publish_raw(username, parser.raw_blocks)
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+
+    def publish(self, username, session, port, readings, hrv):
+        self.stats["readings"] += len(readings)
+        self.pending[(username, session)].extend(readings)
+        self.pending_count += len(readings)
+        if self.pending_count >= GATEWAY_BATCH_SIZE:
+            self._flush_now.set()
+
+        queues = self.subscribers.get(username)
+        if queues:
+            message = b"".join(
+                json.dumps({"t": t, "bpm": bpm, "device": port, "session": session, "hrv": hrv}).encode() + b"\n"
+                for t, bpm in readings
+            )
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                    self.stats["dropped_live"] += 1
+                queue.put_nowait(message)
+
+    def publish_raw(self, username, blocks):
+        message = b"".join(
+            json.dumps({"t0": t0, "rate": rate, "raw": samples.tolist()}).encode() + b"\n"
+            for t0, rate, samples in blocks
+        )
+        for queue in self.subscribers.get(username, ()):
+            if queue.qsize() < SUBSCRIBER_QUEUE // 2:
+                queue.put_nowait(message)
+            else:
+                self.stats["dropped_raw"] += 1
+
+    def queue_depths(self):
+        # Called from the metrics server thread: copy what the event loop mutates
+        queues = [q for qs in list(self.subscribers.values()) for q in list(qs)]
+        return {
+            "gateway_devices": len(self.tasks),
+            "gateway_subscribers": len(queues),
+            "gateway_pending_readings": self.pending_count,
+            "gateway_subscriber_queue_max": max((q.qsize() for q in queues), default=0),
+        }
+
+    # ---------------------- storage ----------------------
+    async def writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), GATEWAY_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batches, count = self.pending, self.pending_count
+        self.pending, self.pending_count = defaultdict(list), 0
+        try:
+            with metrics.timed("gateway_flush"):
+                await asyncio.to_thread(append_bpm_batches, self.collection, batches)
+            self.stats["flushes"] += 1
+        except PyMongoError as e:
+            # Keep the readings and retry on the next flush, in order
+            log.error("storage write failed (%s), %d readings kept for retry", e, count)
+            self.stats["write_errors"] += 1
+            for key, samples in batches.items():
+                self.pending[key][:0] = samples
+            self.pending_count += count
+
+    # ---------------------- subscribers ----------------------
+    def token_user(self, token):
+        # Looks up the user's token generation, so it runs off the event loop
+        return verify_token(token, lambda username: token_generation(self.collection.database, username))
+
+    async def handle_subscriber(self, reader, writer):
+        queue = None
+        username = None
+        try:
+            parts = (await asyncio.wait_for(reader.readline(), 5)).decode(errors="ignore").split()
+            if len(parts) != 3 or parts[0] != "SUB" or await asyncio.to_thread(self.token_user, parts[2]) != parts[1]:
+                self.stats["refused_subscribers"] += 1
+                writer.write(b"ERR\n")
+                return
+            username = parts[1]
+            queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+            self.subscribers[username].add(queue)
+            writer.write(b"OK\n")
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            if queue is not None:
+                self.subscribers[username].discard(queue)
+                if not self.subscribers[username]:
+                    del self.subscribers[username]
+            writer.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    collection = get_db()[BPM_BUCKETS]
+    if GATEWAY_METRICS_PORT:
+        metrics.start_http_server(METRICS_HOST, GATEWAY_METRICS_PORT)
+    try:
+        asyncio.run(Gateway(collection, DeviceMap(GATEWAY_DEVICES)).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from heartbot.config import (
+    BPM_ROLLUPS_ENABLED, HISTORY_MAX_POINTS, HISTORY_RAW_SECONDS, HISTORY_MINUTE_SECONDS, HISTORY_MAX_PERIODS,
+)
+from heartbot.storage import (
+    BPM_ROLLUPS, ROLLUP_SECONDS, aggregate_periods, load_bpm_samples, load_rollups, rollup_updates,
+)
+
+# ====================== LONG-HISTORY TREND ======================
+# Whatever the span, a render reads a bounded amount and sends at most
+# HISTORY_MAX_POINTS points: spans up to HISTORY_RAW_SECONDS use the raw
+# readings, spans up to HISTORY_MINUTE_SECONDS the raw readings grouped per
+# minute here (minutes are never stored in clear, see heartbot.storage), and
+# longer ones the finest rollup with no more than HISTORY_MAX_PERIODS periods
+# in the span. The series is then reduced with LTTB, which keeps the visual
+# shape (peaks, dips) that plain striding loses. Without rollups (the
+# default, see BPM_ROLLUPS_ENABLED) every span reads the raw readings.
+
+
+def lttb(x, y, n):
+    """Largest-Triangle-Three-Buckets: indices of n points that best keep the
+    shape of (x, y), and the start index of the group each one stands for."""
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size), np.arange(size)
+    # First and last point are kept; the rest is split into n - 2 buckets
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    picked = np.empty(n, dtype=np.int64)
+    picked[0], picked[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < n - 1 else (size - 1, size)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # Twice the triangle area between the previous pick, each candidate and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked, np.concatenate([[0], edges])
+
+def _grouped_series(t, mean, lows, highs, max_points, source):
+    picked, groups = lttb(t, mean, max_points)
+    if len(t):
+        low, high = np.minimum.reduceat(lows, groups), np.maximum.reduceat(highs, groups)
+    else:
+        low = high = np.empty(0)
+    return {"t": t[picked], "bpm": mean[picked], "low": low, "high": high, "source": source}
+
+def history_series(collection, username, lo, hi, max_points=HISTORY_MAX_POINTS, rollups=BPM_ROLLUPS_ENABLED):
+    """Trend of `username` between unix times lo and hi, at most max_points points.
+
+    Returns {"t", "bpm", "low", "high", "source"}: low/high bound every point's
+    group (None for raw readings), source is "readings", "minute" or the rollup resolution."""
+    if hi - lo <= HISTORY_MINUTE_SECONDS or not rollups:
+        samples = load_bpm_samples(collection, username, start=datetime.fromtimestamp(lo), end=datetime.fromtimestamp(hi))
+        t = np.array([s[0] for s in samples], dtype=np.float64)
+        bpm = np.array([s[1] for s in samples], dtype=np.float64)
+        if hi - lo <= HISTORY_RAW_SECONDS or not rollups:
+            picked, _ = lttb(t, bpm, max_points)
+            return {"t": t[picked], "bpm": bpm[picked], "low": None, "high": None, "source": "readings"}
+        keys, counts, sums, lows, highs = aggregate_periods(t, bpm, 60)
+        return _grouped_series(keys.astype(np.float64), sums / np.maximum(counts, 1), lows, highs, max_points, "minute")
+
+    res = next((r for r, seconds in ROLLUP_SECONDS.items() if (hi - lo) / seconds <= HISTORY_MAX_PERIODS), "day")
+    rollups = load_rollups(collection.database, username, res, lo, hi)
+    return _grouped_series(rollups["t"], rollups["mean"], rollups["min"], rollups["max"], max_points, res)
+
+
+def rebuild(collection, usernames=None):
+    """Recompute every rollup from the stored readings, dropping resolutions no
+    longer kept (per-minute). Stop the gateway first: readings saved during the
+    rebuild would be counted twice."""
+    from heartbot.export import iter_bpm_batches
+
+    database = collection.database
+    if usernames is None:
+        usernames = sorted(collection.distinct("username"))
+    for username in usernames:
+        database[BPM_ROLLUPS].delete_many({"username": username})
+        rows = 0
+        for batch in iter_bpm_batches(collection, [username]):
+            times = batch.column("timestamp").cast("int64").to_numpy() / 1000
+            ops = rollup_updates(username, times, batch.column("bpm").to_numpy())
+            database[BPM_ROLLUPS].bulk_write(ops, ordered=False)
+            rows += batch.num_rows
+        print(f"{username}: {rows:,} readings rolled up")
+
+
+def main():
+    # python -m heartbot.history rebuild [--users alice bob]
+    parser = argparse.ArgumentParser(description="Maintain the BPM rollups behind the history view.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--users", nargs="+", help="default: every user with readings")
+    args = parser.parse_args()
+
+    from heartbot.db import BPM_BUCKETS, get_db
+
+    rebuild(get_db()[BPM_BUCKETS], args.users)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from heartbot.config import (
+    LEARNED_FAQ_MAX_ENTRIES, LEARNED_FAQ_MERGE_SIMILARITY, LEARNED_FAQ_EXAMPLES, LEARNED_FAQ_REVIEW_SIZE,
+)
+from heartbot.crypto import get_keyring
+from heartbot.metrics import count, register_collector
+from heartbot.retrieval import VectorIndex
+
+log = logging.getLogger(__name__)
+
+# ====================== LEARNED FAQ ======================
+# Questions HeartBot could not answer, shared by every user in `learned_faq`:
+#   {processed, question, examples: [latest phrasings], count, first_seen,
+#    last_seen, model, vector (float32 bytes), status, answer}
+# status is open, answered (by a curator) or dismissed. No usernames are kept.
+# question and examples are what users typed, health details included, so
+# they are AES-GCM encrypted with the keyring data key of KEY_OWNER, which
+# `python -m heartbot.crypto rotate` rewraps like every user's; processed
+# stays readable for the unique index that merges repeats across processes.
+#
+# A question with the same preprocessed text as an entry, or an embedding at
+# least LEARNED_FAQ_MERGE_SIMILARITY similar to one, raises that entry's
+# count instead of adding a new one. The embeddings of every entry stay in an
+# in-memory index that is added to and removed from in place, never rebuilt.
+# Past LEARNED_FAQ_MAX_ENTRIES the least asked entry that is not answered is
+# evicted, the least recently asked first among equals (LFU, then LRU). The
+# question being recorded is never the one evicted, so a full store keeps
+# learning. Evictable entries sit in one LRU-ordered bucket per count, so
+# picking a victim looks at the lowest counts only, not every entry.
+# Answered entries join the chatbot's FAQ index (Chatbot.publish) with their
+# stored embedding, so neither learning nor publishing re-encodes the FAQ.
+
+_PROJECTION = {"processed": 1, "question": 1, "count": 1, "last_seen": 1, "status": 1, "answer": 1,
+               "model": 1, "vector": 1}
+
+
+KEY_OWNER = "#learned_faq"  # data key name in `data_keys`, not a user
+
+
+def _seal(keyring, text):
+    return keyring.encrypt(KEY_OWNER, text)
+
+def _unseal(keyring, chunk):
+    # Entries written before the keyring was used are Fernet strings; KeyRing.decrypt reads those too
+    return keyring.decrypt(KEY_OWNER, chunk)
+
+def ensure_learned_indexes(collection):
+    collection.create_index("processed", unique=True)
+    # Curator review: most asked open questions first
+    collection.create_index([("status", ASCENDING), ("count", DESCENDING), ("last_seen", DESCENDING)])
+
+def top_open(collection, limit=LEARNED_FAQ_REVIEW_SIZE):
+    """The most asked unanswered questions, decrypted, one indexed read; vectors left out."""
+    keyring = get_keyring(collection.database)
+    docs = list(collection.find({"status": "open"}, {"vector": 0, "model": 0})
+                .sort([("count", DESCENDING), ("last_seen", DESCENDING)]).limit(limit))
+    for doc in docs:
+        doc["question"] = _unseal(keyring, doc["question"])
+        doc["examples"] = [_unseal(keyring, e) for e in doc.get("examples", [])]
+    return docs
+
+
+class LearnedFaq:
+    def __init__(self, collection, model_name, max_entries=LEARNED_FAQ_MAX_ENTRIES,
+                 merge_similarity=LEARNED_FAQ_MERGE_SIMILARITY):
+        self.collection = collection
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.merge_similarity = merge_similarity
+        self.keyring = get_keyring(collection.database)
+        self._lock = threading.Lock()
+        self._index = VectorIndex()
+        self._ids = []  # index row -> entry _id
+        self._entries = {}  # _id -> {"row", "processed", "question", "count", "last_seen", "status", "answer"}
+        self._by_processed = {}  # processed text -> _id
+        self._buckets = {}  # count -> OrderedDict of evictable _ids, least recently asked first
+        register_collector(lambda: {"learned_faq_entries": len(self._entries)})
+
+    def load(self, encode):
+        """Read every entry; entries embedded by another model are re-encoded and saved once."""
+        docs = list(self.collection.find({}, _PROJECTION))
+        stale = [d for d in docs if d.get("model") != self.model_name]
+        if stale:
+            vectors = np.asarray(encode([d["processed"] for d in stale]), dtype=np.float32)
+            for doc, vector in zip(stale, vectors):
+                doc["vector"] = vector.tobytes()
+                self.collection.update_one({"_id": doc["_id"]}, {"$set": {"vector": doc["vector"], "model": self.model_name}})
+        for doc in docs:
+            if isinstance(doc["question"], str):
+                # Sealed with the master key by an older version: move it under the data key, which rotation covers
+                examples = self.collection.find_one({"_id": doc["_id"]}, {"examples": 1}).get("examples", [])
+                doc["question"] = _seal(self.keyring, _unseal(self.keyring, doc["question"]))
+                self.collection.update_one({"_id": doc["_id"]}, {"$set": {
+                    "question": doc["question"],
+                    "examples": [_seal(self.keyring, _unseal(self.keyring, e)) for e in examples],
+                }})
+        docs.sort(key=lambda d: d["last_seen"])  # buckets fill least recently asked first
+        with self._lock:
+            for doc in docs:
+                self._insert(doc, np.frombuffer(doc["vector"], dtype=np.float32))
+        return len(docs)
+
+    def _insert(self, doc, vector):
+        self._index.add(vector)
+        self._ids.append(doc["_id"])
+        self._entries[doc["_id"]] = {
+            "row": len(self._ids) - 1, "processed": doc["processed"], "question": _unseal(self.keyring, doc["question"]),
+            "count": doc["count"], "last_seen": doc["last_seen"], "status": doc["status"], "answer": doc.get("answer"),
+        }
+        self._by_processed[doc["processed"]] = doc["_id"]
+        self._bucket(doc["_id"])
+
+    def _bucket(self, entry_id):
+        entry = self._entries[entry_id]
+        if entry["status"] != "answered":
+            self._buckets.setdefault(entry["count"], OrderedDict())[entry_id] = None
+
+    def _unbucket(self, entry_id):
+        n = self._entries[entry_id]["count"]
+        bucket = self._buckets.get(n)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._buckets[n]
+
+    def _remove(self, entry_id):
+        self._unbucket(entry_id)
+        entry = self._entries.pop(entry_id)
+        del self._by_processed[entry["processed"]]
+        moved = self._index.remove(entry["row"])
+        last_id = self._ids.pop()
+        if moved is not None:
+            self._ids[entry["row"]] = last_id
+            self._entries[last_id]["row"] = entry["row"]
+
+    def _nearest(self, vector):
+        if not len(self._index):
+            return None
+        rows, scores = self._index.search(vector, 1)
+        return self._ids[rows[0]] if scores[0] >= self.merge_similarity else None
+
+    def answered(self):
+        """(items, embeddings) of every answered entry, for the FAQ index."""
+        with self._lock:
+            entries = [(i, e) for i, e in self._entries.items() if e["status"] == "answered"]
+            items = [{"question": e["question"], "answer": e["answer"]} for _, e in entries]
+            vectors = np.array([self._index.matrix[e["row"]] for _, e in entries], dtype=np.float32)
+        return items, vectors
+
+    def record(self, question, processed, encode):
+        """Count one unanswered question; returns its entry id, or None if it could not be stored."""
+        now = datetime.now()
+        with self._lock:
+            entry_id = self._by_processed.get(processed)
+        vector = None
+        if entry_id is None:
+            vector = np.asarray(encode([processed])[0], dtype=np.float32)
+            with self._lock:
+                entry_id = self._nearest(vector)
+        sealed = _seal(self.keyring, question)
+        push = {"examples": {"$each": [sealed], "$slice": -LEARNED_FAQ_EXAMPLES}}
+        try:
+            if entry_id is not None:
+                self.collection.update_one({"_id": entry_id}, {"$inc": {"count": 1}, "$set": {"last_seen": now}, "$push": push})
+                count("learned_faq_merged")
+                with self._lock:
+                    entry = self._entries.get(entry_id)
+                    if entry is not None:
+                        self._unbucket(entry_id)
+                        entry["count"] += 1
+                        entry["last_seen"] = now
+                        self._bucket(entry_id)
+                return entry_id
+            # Upsert on the unique processed text: two processes learning the same question make one entry
+            doc = self.collection.find_one_and_update(
+                {"processed": processed},
+                {"$setOnInsert": {"question": sealed, "first_seen": now, "status": "open", "answer": None,
+                                  "model": self.model_name, "vector": vector.tobytes()},
+                 "$inc": {"count": 1}, "$set": {"last_seen": now}, "$push": push},
+                projection=_PROJECTION, upsert=True, return_document=ReturnDocument.AFTER,
+            )
+            count("learned_faq_new")
+            with self._lock:
+                if doc["_id"] not in self._entries:
+                    self._insert(doc, vector)
+                victims = self._pick_victims(keep=doc["_id"])
+            if victims:
+                self.collection.delete_many({"_id": {"$in": victims}, "status": {"$ne": "answered"}})
+                count("learned_faq_evicted", len(victims))
+            return doc["_id"]
+        except PyMongoError as e:
+            # Learning is best effort: the user still gets the fallback answer
+            log.error("could not store learned question (%s)", e)
+            count("learned_faq_errors")
+            return None
+
+    def _pick_victims(self, keep):
+        # Drops the victims from memory; the caller deletes them from Mongo outside the lock
+        victims = []
+        while len(self._entries) > self.max_entries:
+            victim = next((i for n in sorted(self._buckets) for i in self._buckets[n] if i != keep), None)
+            if victim is None:
+                break
+            self._remove(victim)
+            victims.append(victim)
+        return victims
+
+    def answer(self, entry_id, answer, curator):
+        """Mark an entry answered; returns (item, embedding) for the FAQ index, or None if it was evicted."""
+        doc = self.collection.find_one_and_update({"_id": entry_id}, {"$set": {
+            "status": "answered", "answer": answer, "answered_by": curator, "answered_at": datetime.now(),
+        }}, projection=_PROJECTION, return_document=ReturnDocument.AFTER)
+        with self._lock:
+            if doc is None:  # evicted since the curator page listed it
+                if entry_id in self._entries:
+                    self._remove(entry_id)
+                return None
+            if entry_id not in self._entries:  # learned by another process since load()
+                self._insert(doc, np.frombuffer(doc["vector"], dtype=np.float32))
+            self._unbucket(entry_id)
+            entry = self._entries[entry_id]
+            entry["status"], entry["answer"] = "answered", answer
+            return {"question": entry["question"], "answer": answer}, self._index.matrix[entry["row"]].copy()
+
+    def dismiss(self, entry_id, curator):
+        # Kept (and still merged into) so the same question does not come back for review
+        self.collection.update_one({"_id": entry_id}, {"$set": {"status": "dismissed", "answered_by": curator}})
+        with self._lock:
+            if entry_id in self._entries:
+                self._entries[entry_id]["status"] = "dismissed"
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def main():
+    # python -m heartbot.learned_faq top [-n 50]
+    parser = argparse.ArgumentParser(description="Review the questions HeartBot could not answer.")
+    parser.add_argument("command", choices=["top"])
+    parser.add_argument("-n", type=int, default=LEARNED_FAQ_REVIEW_SIZE)
+    args = parser.parse_args()
+
+    from heartbot.db import LEARNED_FAQ, get_db
+
+    for doc in top_open(get_db()[LEARNED_FAQ], args.n):
+        print(f"{doc['count']:>6}  {doc['last_seen']:%Y-%m-%d %H:%M}  {doc['question']}")
+
+
+if __name__ == "__main__":
+    main()
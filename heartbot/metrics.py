@@ -0,0 +1,205 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from pymongo import monitoring
+
+from heartbot.config import METRICS_ENABLED, METRICS_WINDOW
+
+log = logging.getLogger(__name__)
+
+# ====================== HOT-PATH METRICS ======================
+# Process-wide, in memory, always on (METRICS_ENABLED=false makes timed() a
+# no-op). Every stage feeds one histogram of heartbot_stage_seconds{stage=...}:
+# fixed Prometheus buckets for scraping, plus the last METRICS_WINDOW
+# durations for the admin panel's live percentiles. An observation is two
+# perf_counter() calls, a bisect and a deque append under a lock, about a
+# microsecond; see benchmarks/bench_metrics.py.
+#
+# Stages: serial_parse, preprocess, encode (plus encode_wait, time queued
+# for a batch), search, encrypt, decrypt, figure and gateway_flush; Mongo
+# commands are timed by MongoCommandTimer as mongo_<command>.
+
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, window=METRICS_WINDOW):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+            self.recent.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count, np.array(self.recent)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+_stages = {}
+_counters = {}
+_gauges = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+def stage(name):
+    histogram = _stages.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _stages.setdefault(name, Histogram())
+    return histogram
+
+def timed(name):
+    """with timed("encode"): ... records the block's duration under that stage."""
+    return _Timer(stage(name)) if METRICS_ENABLED else _NO_TIMER
+
+def observe(name, seconds):
+    if METRICS_ENABLED:
+        stage(name).observe(seconds)
+
+def count(name, n=1):
+    # Read-modify-write of an int under the GIL; a rare lost increment is acceptable for a counter
+    _counters[name] = _counters.get(name, 0) + n
+
+def set_gauge(name, value):
+    _gauges[name] = value
+
+def register_collector(fn, kind="gauge"):
+    """fn() -> {metric name: value}, called at scrape time, for values other objects
+    own: queue depths (kind="gauge") or their own running totals (kind="counter")."""
+    with _registry_lock:
+        _collectors.append((fn, kind))
+
+def stage_percentiles(percentiles=(50, 95, 99)):
+    """{stage: {"count", "mean_ms", "p50_ms", ...}} over each stage's recent window, for the admin panel."""
+    table = {}
+    for name, histogram in sorted(_stages.items()):
+        _, total, n, recent = histogram.snapshot()
+        row = {"count": n, "mean_ms": total / n * 1000 if n else 0.0}
+        values = np.percentile(recent, percentiles) * 1000 if recent.size else [float("nan")] * len(percentiles)
+        row.update({f"p{p}_ms": float(v) for p, v in zip(percentiles, values)})
+        table[name] = row
+    return table
+
+def _collect(values, kind):
+    for fn, fn_kind in list(_collectors):
+        if fn_kind == kind:
+            try:
+                values.update(fn())
+            except Exception as e:  # a broken collector must not break the scrape
+                log.warning("metrics collector %r failed: %s", fn, e)
+    return values
+
+def gauges():
+    return _collect(dict(_gauges), "gauge")
+
+def counters():
+    return _collect(dict(_counters), "counter")
+
+
+# ====================== PROMETHEUS EXPOSITION ======================
+# Text format 0.0.4. Counters get the _total suffix, every name the
+# heartbot_ prefix.
+
+def render():
+    lines = [
+        "# HELP heartbot_stage_seconds Time spent per hot-path stage.",
+        "# TYPE heartbot_stage_seconds histogram",
+    ]
+    for name, histogram in sorted(_stages.items()):
+        counts, total, n, _ = histogram.snapshot()
+        cumulative = 0
+        for bound, c in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'heartbot_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'heartbot_stage_seconds_sum{{stage="{name}"}} {total!r}')
+        lines.append(f'heartbot_stage_seconds_count{{stage="{name}"}} {n}')
+    for name, value in sorted(counters().items()):
+        lines += [f"# TYPE heartbot_{name}_total counter", f"heartbot_{name}_total {value}"]
+    for name, value in sorted(gauges().items()):
+        if value is None:
+            continue
+        lines += [f"# TYPE heartbot_{name} gauge", f"heartbot_{name} {float(value)!r}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+def start_http_server(host, port):
+    """Serve /metrics on a daemon thread; returns the server, or None if the port is taken."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        log.warning("metrics endpoint not started on %s:%d (%s)", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("metrics on http://%s:%d/metrics", host, port)
+    return server
+
+
+# ====================== MONGO COMMANDS ======================
+# Every command the driver sends (find, insert, update, aggregate, ...) is
+# timed from the driver's own events, so no call site needs wrapping.
+
+class MongoCommandTimer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe(f"mongo_{event.command_name}", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        observe(f"mongo_{event.command_name}", event.duration_micros / 1e6)
+        count("mongo_errors")
@@ -0,0 +1,90 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+from heartbot.config import PROFILE_INTERVAL_MS
+
+# ====================== SAMPLING PROFILER ======================
+# Opt-in, one at a time: a daemon thread wakes every PROFILE_INTERVAL_MS,
+# reads the current frame of each selected thread from sys._current_frames()
+# and counts the stack. Nothing is hooked into the profiled code, so it costs
+# the threads it watches only the GIL hand-offs of the sampler itself.
+# Samples are wall-clock: a thread blocked on I/O or a lock is counted where
+# it waits. The dump is in "folded" format (root;...;leaf count per line),
+# which speedscope, flamegraph.pl and inferno read as is.
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, seconds, select=None, interval_ms=PROFILE_INTERVAL_MS):
+        # select(thread) -> bool picks the threads to sample; None samples all but this one
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.seconds = seconds
+        self.select = select
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self.started_at = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.started_at = time.time()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline and not self._stop_event.is_set():
+            frames = sys._current_frames()
+            for thread in threading.enumerate():
+                if thread is self or (self.select is not None and not self.select(thread)):
+                    continue
+                frame = frames.get(thread.ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    with self._lock:
+                        self.stacks[f"{thread.name};" + ";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def progress(self):
+        return min(1.0, (time.time() - self.started_at) / self.seconds) if self.started_at else 0.0
+
+    def _snapshot(self):
+        with self._lock:
+            return Counter(self.stacks)
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self._snapshot().most_common())
+
+    def top_functions(self, limit=20):
+        """[(function, self samples, total samples)], most self time first."""
+        own, total = Counter(), Counter()
+        for stack, n in self._snapshot().items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += n
+            for label in set(frames):
+                total[label] += n
+        return [(label, n, total[label]) for label, n in own.most_common(limit)]
+
+
+_active = None
+_active_lock = threading.Lock()
+
+def start_profile(seconds, select=None):
+    """Start a SamplingProfiler, or return None while another one is still running."""
+    global _active
+    with _active_lock:
+        if _active is not None and _active.is_alive():
+            return None
+        _active = SamplingProfiler(seconds, select)
+        _active.start()
+        return _active
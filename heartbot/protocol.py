@@ -0,0 +1,126 @@
+import struct
+from binascii import crc_hqx
+
+import numpy as np
+
+# ====================== BINARY SERIAL PROTOCOL ======================
+# Frame layout (little endian), mirrored in iot_code/iot_code.ino:
+#
+#   A5 5A | version u8 | type u8 | seq u16 | length u16 | payload | crc u16
+#
+# crc is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over version..payload.
+# Payloads:
+#   FRAME_BPM  u32 device_ms, u16 bpm * 10
+#   FRAME_RAW  u16 sample_rate, u16 count, count * u16 samples
+#   FRAME_BATCH  u16 count, count * u16 bpm * 10 (end-of-measurement summary,
+#                sent right after the measurement's last FRAME_BPM)
+
+MAGIC = b"\xa5\x5a"
+VERSION = 1
+FRAME_BPM = 0x01
+FRAME_RAW = 0x02
+FRAME_BATCH = 0x03
+
+HEADER = struct.Struct("<2sBBHH")
+CRC = struct.Struct("<H")
+BPM_PAYLOAD = struct.Struct("<IH")
+RAW_HEADER = struct.Struct("<HH")
+BATCH_HEADER = struct.Struct("<H")
+HEADER_SIZE, CRC_SIZE, BPM_PAYLOAD_SIZE = HEADER.size, CRC.size, BPM_PAYLOAD.size
+MAX_PAYLOAD = 1024
+unpack_bpm = BPM_PAYLOAD.unpack_from
+
+
+def encode_frame(frame_type, seq, payload):
+    header = HEADER.pack(MAGIC, VERSION, frame_type, seq & 0xFFFF, len(payload))
+    return header + payload + CRC.pack(crc_hqx(header[2:] + payload, 0xFFFF))
+
+def encode_bpm(seq, device_ms, bpm):
+    return encode_frame(FRAME_BPM, seq, BPM_PAYLOAD.pack(device_ms & 0xFFFFFFFF, int(round(bpm * 10))))
+
+def encode_raw(seq, sample_rate, samples):
+    samples = np.asarray(samples, dtype="<u2")
+    return encode_frame(FRAME_RAW, seq, RAW_HEADER.pack(sample_rate, len(samples)) + samples.tobytes())
+
+def encode_batch(seq, bpms):
+    values = np.round(np.asarray(bpms, dtype=np.float64) * 10).astype("<u2")
+    return encode_frame(FRAME_BATCH, seq, BATCH_HEADER.pack(len(values)) + values.tobytes())
+
+
+class FrameDecoder:
+    # Incremental decoder: feed() any chunk of bytes and get back every complete
+    # frame in it. Bytes between frames (debug text, line noise) are skipped,
+    # frames with a bad CRC are dropped and counted, and sequence gaps are
+    # counted as lost frames.
+    def __init__(self):
+        self._buf = bytearray()
+        self._next_seq = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost_frames = 0
+        self.skipped_bytes = 0
+        self.bad_versions = 0
+
+    def feed(self, data):
+        """Return [(type, seq, value), ...]; value is bpm for FRAME_BPM, (rate, samples) for
+        FRAME_RAW and a list of bpm for FRAME_BATCH."""
+        buf = self._buf
+        buf += data
+        view = memoryview(buf)
+        out = []
+        append = out.append
+        unpack_header = HEADER.unpack_from
+        unpack_crc = CRC.unpack_from
+        pos, end = 0, len(buf)
+        next_seq = self._next_seq
+        try:
+            while end - pos >= HEADER_SIZE:
+                if not buf.startswith(MAGIC, pos):
+                    start = buf.find(MAGIC, pos)
+                    if start < 0:
+                        # Keep a trailing A5 in case the next chunk starts with 5A
+                        start = end - 1 if buf[end - 1] == MAGIC[0] else end
+                    self.skipped_bytes += start - pos
+                    pos = start
+                    continue
+                _, version, frame_type, seq, length = unpack_header(buf, pos)
+                if version != VERSION or length > MAX_PAYLOAD:
+                    self.bad_versions += version != VERSION
+                    self.skipped_bytes += 1
+                    pos += 1
+                    continue
+                payload_end = pos + HEADER_SIZE + length
+                if payload_end + CRC_SIZE > end:
+                    break
+                if crc_hqx(view[pos + 2:payload_end], 0xFFFF) != unpack_crc(buf, payload_end)[0]:
+                    self.crc_errors += 1
+                    self.skipped_bytes += 1
+                    pos += 1
+                    continue
+
+                if next_seq is not None and seq != next_seq:
+                    self.lost_frames += (seq - next_seq) & 0xFFFF
+                next_seq = (seq + 1) & 0xFFFF
+                self.frames += 1
+                if frame_type == FRAME_BPM and length == BPM_PAYLOAD_SIZE:
+                    append((FRAME_BPM, seq, unpack_bpm(buf, pos + HEADER_SIZE)[1] / 10))
+                elif frame_type == FRAME_RAW and length >= RAW_HEADER.size:
+                    rate, count = RAW_HEADER.unpack_from(buf, pos + HEADER_SIZE)
+                    if RAW_HEADER.size + 2 * count <= length:
+                        offset = pos + HEADER_SIZE + RAW_HEADER.size
+                        append((FRAME_RAW, seq, (rate, np.frombuffer(view[offset:offset + 2 * count], dtype="<u2").astype(np.float64))))
+                elif frame_type == FRAME_BATCH and length >= BATCH_HEADER.size:
+                    count = BATCH_HEADER.unpack_from(buf, pos + HEADER_SIZE)[0]
+                    if BATCH_HEADER.size + 2 * count <= length:
+                        offset = pos + HEADER_SIZE + BATCH_HEADER.size
+                        append((FRAME_BATCH, seq, [v / 10 for v in struct.unpack_from(f"<{count}H", buf, offset)]))
+                pos = payload_end + CRC_SIZE
+        finally:
+            view.release()
+        self._next_seq = next_seq
+        del buf[:pos]
+        return out
+
+    def stats(self):
+        return {"frames": self.frames, "crc_errors": self.crc_errors, "lost_frames": self.lost_frames,
+                "skipped_bytes": self.skipped_bytes, "bad_versions": self.bad_versions}
@@ -0,0 +1,137 @@
+import numpy as np
+
+from heartbot.config import APPROX_INDEX_THRESHOLD
+
+# ====================== VECTOR SEARCH ======================
+# Rows are L2-normalized once on insert and kept in one C-contiguous float32
+# matrix, so cosine similarity is a single mat-vec product per query.
+
+def normalize(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def top_k(scores, k):
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < scores.shape[-1]:
+        part = np.argpartition(scores, -k)[-k:]
+    else:
+        part = np.arange(scores.shape[-1])
+    order = part[np.argsort(scores[part])[::-1]]
+    return order, scores[order]
+
+
+class VectorIndex:
+    # Exact search. Capacity doubles on growth so add() is amortized O(rows added).
+    def __init__(self, vectors=None, dim=None):
+        if vectors is not None:
+            self._data = normalize(vectors)
+            self.size = len(self._data)
+        else:
+            self._data = np.empty((0, dim or 0), dtype=np.float32)
+            self.size = 0
+
+    @property
+    def matrix(self):
+        return self._data[:self.size]
+
+    def add(self, vectors):
+        vectors = normalize(vectors)
+        needed = self.size + len(vectors)
+        if needed > len(self._data) or self._data.shape[1] != vectors.shape[1]:
+            grown = np.empty((max(needed, 2 * len(self._data)), vectors.shape[1]), dtype=np.float32)
+            if self.size:
+                grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:needed] = vectors
+        self.size = needed
+
+    def remove(self, row):
+        """Drop `row` by moving the last row into its place; returns the old position of the moved row, or None."""
+        last = self.size - 1
+        self.size = last
+        if row == last:
+            return None
+        self._data[row] = self._data[last]
+        return last
+
+    def copy(self):
+        clone = VectorIndex(dim=self._data.shape[1])
+        clone._data = self.matrix.copy()
+        clone.size = self.size
+        return clone
+
+    def search(self, query, k=1):
+        """Return (ids, scores) of the k most similar rows, best first."""
+        return top_k(self.matrix @ normalize(query)[0], k)
+
+    def __len__(self):
+        return self.size
+
+
+class IVFIndex:
+    # Approximate search for large corpora: rows are bucketed under spherical
+    # k-means centroids and a query only scans the `n_probe` closest buckets.
+    def __init__(self, vectors, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        vectors = normalize(vectors)
+        self.n_probe = n_probe
+        self.size = 0
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        self.centroids = self._train(vectors, n_lists, n_iter, seed)
+        self._lists = [VectorIndex(dim=vectors.shape[1]) for _ in range(len(self.centroids))]
+        self._ids = [[] for _ in range(len(self.centroids))]
+        self.add(vectors)
+
+    @staticmethod
+    def _train(vectors, n_lists, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = normalize(centroids)
+        return centroids
+
+    def add(self, vectors):
+        vectors = normalize(vectors)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        for c in np.unique(assign):
+            rows = np.nonzero(assign == c)[0]
+            self._lists[c].add(vectors[rows])
+            self._ids[c].extend((rows + self.size).tolist())
+        self.size += len(vectors)
+
+    def copy(self):
+        clone = object.__new__(IVFIndex)
+        clone.n_probe = self.n_probe
+        clone.size = self.size
+        clone.centroids = self.centroids
+        clone._lists = [lst.copy() for lst in self._lists]
+        clone._ids = [list(ids) for ids in self._ids]
+        return clone
+
+    def search(self, query, k=1):
+        q = normalize(query)[0]
+        probe, _ = top_k(self.centroids @ q, self.n_probe)
+        ids = np.concatenate([np.asarray(self._ids[c], dtype=np.int64) for c in probe])
+        scores = np.concatenate([self._lists[c].matrix @ q for c in probe])
+        order, best = top_k(scores, k)
+        return ids[order], best
+
+    def __len__(self):
+        return self.size
+
+
+def build_index(vectors, approximate_threshold=APPROX_INDEX_THRESHOLD):
+    if len(vectors) >= approximate_threshold:
+        return IVFIndex(vectors)
+    return VectorIndex(vectors)
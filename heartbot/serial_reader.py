@@ -0,0 +1,302 @@
+import json
+import re
+import socket
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import serial
+
+from heartbot.beat_detection import BeatDetector
+from heartbot.config import RAW_SAMPLE_RATE
+from heartbot.metrics import count, timed
+from heartbot.protocol import FRAME_BATCH, FRAME_BPM, FRAME_RAW, FrameDecoder
+
+BPM_PATTERN = re.compile(rb"BPM:\s*([\d.]+)")
+READING_PATTERN = re.compile(rb"Heartbeat #(\d+)")
+
+
+def reconcile_batch(streamed, values, arrived):
+    """Return [(timestamp, bpm), ...] for the readings of a batch that never arrived on their own.
+
+    streamed: {reading number (1-based): (timestamp, bpm)} received live for
+    this measurement; values: the batch, in reading order; arrived: when the
+    batch came in. Missing timestamps are interpolated between the nearest
+    received readings on a clock of 60/bpm seconds per beat; with nothing
+    received, the last reading is anchored at `arrived`.
+    """
+    n = len(values)
+    # Each reading's bpm covers the interval that ends with it
+    beat_clock = np.cumsum([60.0 / max(v, 1.0) for v in values])
+    known = sorted((i - 1, t) for i, (t, _) in streamed.items() if 1 <= i <= n)
+    if not known:
+        known = [(n - 1, arrived)]
+        missing = range(n)
+    else:
+        missing = [i for i in range(n) if i + 1 not in streamed]
+
+    out = []
+    for i in missing:
+        before = [(j, t) for j, t in known if j <= i]
+        after = [(j, t) for j, t in known if j > i]
+        if before and after:
+            (j0, t0), (j1, t1) = before[-1], after[0]
+            t = t0 + (beat_clock[i] - beat_clock[j0]) * (t1 - t0) / (beat_clock[j1] - beat_clock[j0])
+        else:
+            j, t_ref = before[-1] if before else after[0]
+            t = t_ref + beat_clock[i] - beat_clock[j]
+        out.append((float(t), values[i]))
+    return out
+
+
+class RingBuffer:
+    # Single producer / single consumer. The writer fills a slot before it
+    # advances `head`, and every reader keeps its own cursor, so neither side
+    # needs a lock: under the GIL a reader only ever sees fully written slots.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self.head = 0  # total number of items ever pushed
+
+    def push(self, item):
+        self._slots[self.head % self.capacity] = item
+        self.head = self.head + 1
+
+    def read_from(self, cursor):
+        """Return (items, new_cursor, dropped) for everything pushed since `cursor`."""
+        head = self.head
+        start = max(cursor, head - self.capacity)
+        items = [self._slots[i % self.capacity] for i in range(start, head)]
+        # The writer may have lapped us while we were copying
+        overwritten = self.head - self.capacity - start
+        if overwritten > 0:
+            items = items[overwritten:]
+            start += overwritten
+        return items, head, start - cursor
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+
+class StreamParser:
+    # Turns the byte stream of one device into (timestamp, bpm) readings.
+    # protocol="binary" decodes heartbot.protocol frames, "text" parses lines.
+    # With raw sample blocks beats are detected here and `detector.hrv` holds HRV;
+    # the blocks of the last feed() are kept in `raw_blocks` for live waveforms.
+    # The sketch's end-of-measurement batch ({"readings": [...]} or FRAME_BATCH)
+    # is reconciled with what was streamed: readings lost on the way are
+    # emitted from the batch with estimated timestamps.
+    def __init__(self, protocol="binary"):
+        self.decoder = FrameDecoder() if protocol == "binary" else None
+        self.detector = None
+        self.bad_lines = 0
+        self.batches = 0
+        self.backfilled = 0
+        self.mismatched = 0
+        self._streamed = {}  # text: reading number -> (t, bpm) in the current measurement
+        self._recent = deque(maxlen=64)  # binary: (seq, t, bpm) of the latest BPM frames
+        self._pending = b""
+        self.raw_start = None
+        self.raw_blocks = []  # (t0, sample_rate, samples) completed by the last feed()
+        self._raw_samples = 0
+        self._out = []
+
+    def feed(self, chunk):
+        """Return the readings completed by `chunk` as [(timestamp, bpm), ...]."""
+        with timed("serial_parse"):
+            self._out = []
+            self.raw_blocks = []
+            if self.decoder is not None:
+                for frame in self.decoder.feed(chunk):
+                    self.handle_frame(frame)
+            else:
+                self._pending += chunk
+                *lines, self._pending = self._pending.split(b"\n")
+                for line in lines:
+                    self.handle_line(line)
+        count("serial_bytes", len(chunk))
+        count("readings", len(self._out))
+        return self._out
+
+    def handle_line(self, line):
+        try:
+            if line.startswith(b"RAW:"):
+                self.handle_raw(np.array(line[4:].split(b","), dtype=np.float64))
+            elif line.startswith(b"RATE:"):
+                self.start_raw(int(line[5:]))
+            elif line.startswith(b"{"):
+                values = json.loads(line).get("readings")
+                if isinstance(values, list):
+                    self.handle_batch(self._streamed, [float(v) for v in values])
+                    self._streamed = {}
+            elif b"Restarted" in line:
+                self._streamed = {}
+            else:
+                match = BPM_PATTERN.search(line)
+                if match:
+                    reading = (time.time(), float(match.group(1)))
+                    self._out.append(reading)
+                    number = READING_PATTERN.search(line)
+                    if number:
+                        self._streamed[int(number.group(1))] = reading
+        except (ValueError, TypeError, AttributeError):  # TypeError: e.g. {"readings": [70, null]}
+            self.bad_lines += 1
+
+    def handle_frame(self, frame):
+        frame_type, seq, value = frame
+        if frame_type == FRAME_BPM:
+            reading = (time.time(), value)
+            self._out.append(reading)
+            self._recent.append((seq, *reading))
+        elif frame_type == FRAME_BATCH:
+            # The measurement's BPM frames are the len(value) frames right before the batch
+            n = len(value)
+            streamed = {}
+            for s, t, bpm in self._recent:
+                back = (seq - s) & 0xFFFF
+                if 1 <= back <= n:
+                    streamed[n - back + 1] = (t, bpm)
+            self.handle_batch(streamed, value)
+            self._recent.clear()
+        elif frame_type == FRAME_RAW:
+            rate, samples = value
+            if self.detector is None or self.detector.sample_rate != rate:
+                self.start_raw(rate)
+            self.handle_raw(samples)
+
+    def handle_batch(self, streamed, values):
+        self.batches += 1
+        self.mismatched += sum(abs(values[i - 1] - bpm) > 0.1 for i, (_, bpm) in streamed.items() if 1 <= i <= len(values))
+        missing = reconcile_batch(streamed, values, time.time())
+        self.backfilled += len(missing)
+        self._out.extend(missing)
+
+    def start_raw(self, sample_rate=RAW_SAMPLE_RATE):
+        self.detector = BeatDetector(sample_rate)
+        self.raw_start = time.time()
+        self._raw_samples = 0
+
+    def handle_raw(self, block):
+        if self.detector is None:
+            self.start_raw()
+        rate = self.detector.sample_rate
+        self.raw_blocks.append((self.raw_start + self._raw_samples / rate, rate, block))
+        self._raw_samples += len(block)
+        for idx, _, bpm in self.detector.process(block):
+            self._out.append((self.raw_start + idx / rate, bpm))
+
+    def hrv_snapshot(self):
+        return self.detector.hrv.snapshot() if self.detector is not None else None
+
+
+class SerialReader(threading.Thread):
+    # Owns the serial handle: opens it, reads it as bytes arrive and closes it.
+    # Parsed readings are pushed as (timestamp, bpm) into `buffer`, raw sample
+    # blocks as (t0, sample_rate, samples) into `waveform`.
+    def __init__(self, port, baudrate, capacity=4096, timeout=0.05, protocol="binary"):
+        super().__init__(name=f"serial-reader-{port}", daemon=True)
+        self.buffer = RingBuffer(capacity)
+        self.waveform = RingBuffer(capacity)
+        self.parser = StreamParser(protocol)
+        self.error = None
+        self._stop_event = threading.Event()
+        self._ser = serial.Serial(port, baudrate, timeout=timeout)
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                # Block for the first byte (up to `timeout`), then take whatever else is queued
+                chunk = self._ser.read(self._ser.in_waiting or 1)
+                if chunk:
+                    for reading in self.parser.feed(chunk):
+                        self.buffer.push(reading)
+                    for block in self.parser.raw_blocks:
+                        self.waveform.push(block)
+        except (serial.SerialException, OSError) as e:
+            self.error = e
+        finally:
+            self._ser.close()
+
+    def hrv_snapshot(self):
+        return self.parser.hrv_snapshot()
+
+    @property
+    def is_running(self):
+        return self.is_alive() and not self._stop_event.is_set()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.ident is None:
+            self._ser.close()
+        elif self.is_alive():
+            self.join(timeout)
+
+
+class GatewaySubscriber(threading.Thread):
+    # Same interface as SerialReader, but fed by the ingestion gateway
+    # (python -m heartbot.gateway) instead of a port opened by this session.
+    # token is a heartbot.auth session token of `username`.
+    def __init__(self, host, port, username, token, capacity=4096, timeout=0.5):
+        super().__init__(name=f"gateway-subscriber-{username}", daemon=True)
+        self.buffer = RingBuffer(capacity)
+        self.waveform = RingBuffer(capacity)
+        self.error = None
+        self._hrv = None
+        self._pending = b""
+        self._stop_event = threading.Event()
+        self._sock = socket.create_connection((host, port), timeout=5)
+        try:
+            self._sock.sendall(f"SUB {username} {token}\n".encode())
+            if self._read_line() != b"OK":
+                raise ConnectionError("gateway refused the subscription")
+        except Exception:
+            self._sock.close()
+            raise
+        self._sock.settimeout(timeout)
+
+    def _read_line(self):
+        while b"\n" not in self._pending:
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("gateway closed the connection")
+            self._pending += chunk
+        line, self._pending = self._pending.split(b"\n", 1)
+        return line.strip()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    chunk = self._sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    raise ConnectionError("gateway closed the connection")
+                self._pending += chunk
+                *lines, self._pending = self._pending.split(b"\n")
+                for line in lines:
+                    msg = json.loads(line)
+                    if "raw" in msg:
+                        self.waveform.push((msg["t0"], msg["rate"], np.asarray(msg["raw"], dtype=np.float64)))
+                        continue
+                    self.buffer.push((msg["t"], msg["bpm"]))
+                    self._hrv = msg.get("hrv")
+        except (OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self._sock.close()
+
+    def hrv_snapshot(self):
+        return self._hrv
+
+    @property
+    def is_running(self):
+        return self.is_alive() and not self._stop_event.is_set()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.ident is None:
+            self._sock.close()
+        elif self.is_alive():
+            self.join(timeout)
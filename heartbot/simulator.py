@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import threading
+import time
+import tty
+
+import numpy as np
+
+from heartbot.protocol import encode_batch, encode_bpm, encode_raw
+
+# ====================== VIRTUAL SENSOR ======================
+# A pseudo-terminal that talks exactly like iot_code/iot_code.ino, so the
+# dashboard and the gateway can run without hardware (Linux / macOS):
+#   python -m heartbot.simulator --bpm 72 --noise 5
+# then point SERIAL_PORT (or devices.json) at the printed /dev/pts/N path.
+
+RAW_BLOCK = 25  # samples per RAW frame / "RAW:" line, as in the sketch
+
+
+class PpgSignal:
+    # Endless synthetic PPG: a systolic peak plus a smaller dicrotic wave per
+    # beat, breathing wander and white noise, generated block by block.
+    def __init__(self, bpm=72, noise=5.0, rate=500, variability=0.05, seed=None):
+        self.bpm = bpm
+        self.noise = noise
+        self.rate = rate
+        self.variability = variability
+        self._rng = np.random.default_rng(seed)
+        self._n = 0
+        self._beats = [0.5]
+
+    def next_rr(self):
+        """Next beat-to-beat interval in seconds."""
+        return 60 / self.bpm * (1 + self.variability * self._rng.standard_normal())
+
+    def block(self, size):
+        t = (self._n + np.arange(size)) / self.rate
+        self._n += size
+        while self._beats[-1] < t[-1] + 0.5:
+            self._beats.append(self._beats[-1] + self.next_rr())
+        self._beats = [b for b in self._beats if b > t[0] - 0.5]
+        x = 512 + 30 * np.sin(2 * np.pi * 0.2 * t)
+        for tb in self._beats:
+            x += 120 * np.exp(-((t - tb) / 0.03) ** 2) + 40 * np.exp(-((t - tb - 0.25) / 0.06) ** 2)
+        x += self.noise * self._rng.standard_normal(size)
+        return np.clip(x, 0, 1023).astype(np.uint16)
+
+
+class VirtualDevice(threading.Thread):
+    # Mirrors the sketch: banner, BPM readings (running average as in loop())
+    # or raw sample blocks, and the batch summary (FRAME_BATCH / JSON line)
+    # after `readings` readings; readings=0 streams forever. `dropout` is the
+    # chance that a reading or block is lost (its sequence number is still
+    # used), `speed` compresses time: BPM readings come `speed` times faster,
+    # raw blocks go out at `speed` times sample_rate. `sent_at` holds the
+    # perf_counter() time each reading or raw block was written, for latency
+    # measurements.
+    def __init__(self, protocol="binary", raw=False, bpm=72, noise=5.0, sample_rate=500,
+                 dropout=0.0, readings=15, speed=1.0, debug_text=False, seed=None):
+        super().__init__(name="virtual-device", daemon=True)
+        self.protocol = protocol
+        self.raw = raw
+        self.signal = PpgSignal(bpm, noise, sample_rate, seed=seed)
+        self.dropout = dropout
+        self.readings = readings
+        self.speed = speed
+        self.text_output = protocol == "text" or debug_text
+        self.sent_at = []
+        self.sent_samples = 0
+        self.started = None
+        self._rng = np.random.default_rng(seed)
+        self._seq = 0
+        self._stop_event = threading.Event()
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no newline translation, binary frames pass unchanged
+        self.port = os.ttyname(self._slave)
+
+    def write(self, data):
+        os.write(self._master, data)
+
+    def log(self, msg):
+        if self.text_output:
+            self.write(msg.encode() + b"\r\n")
+
+    def lost(self):
+        return self.dropout and self._rng.random() < self.dropout
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            self.log("💓 System Ready! Press the button to start measuring...")
+            self.log("🔁 Restarted Heartbeat Measurement!")
+            if self.raw and self.protocol == "text":
+                self.write(f"RATE:{self.signal.rate}\r\n".encode())
+            self.log("🫀 Button Pressed → Starting 15 Heartbeat Readings!")
+            self.stream_raw() if self.raw else self.stream_bpm()
+        except OSError:
+            pass  # pty closed by stop()
+
+    def stream_raw(self):
+        rate = self.signal.rate
+        start = time.perf_counter()
+        blocks = 0
+        while not self._stop_event.is_set():
+            # Send every block that is due; a slow reader shows up as a lower achieved rate
+            due = int((time.perf_counter() - start) * rate * self.speed / RAW_BLOCK)
+            while blocks < due and not self._stop_event.is_set():
+                samples = self.signal.block(RAW_BLOCK)
+                if not self.lost():
+                    if self.protocol == "binary":
+                        self.write(encode_raw(self._seq, rate, samples))
+                    else:
+                        self.write(b"RAW:" + ",".join(map(str, samples)).encode() + b"\r\n")
+                self._seq += 1
+                self.sent_at.append(time.perf_counter())
+                self.sent_samples += RAW_BLOCK
+                blocks += 1
+            time.sleep(RAW_BLOCK / (rate * self.speed) / 2)
+
+    def stream_bpm(self):
+        bpm_avg, bpm_count, sent = 0.0, 0, []
+        beat = 0.5
+        start = time.perf_counter()
+        while not self._stop_event.is_set() and (not self.readings or len(sent) < self.readings):
+            rr = self.signal.next_rr()
+            beat += rr
+            delay = start + beat / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            bpm_avg = (bpm_avg * bpm_count + 60.0 / rr) / (bpm_count + 1)
+            bpm_count = min(bpm_count + 1, 4)
+            sent.append(bpm_avg)
+            if not self.lost():
+                if self.protocol == "binary":
+                    self.write(encode_bpm(self._seq, int(beat * 1000), bpm_avg))
+                if self.text_output:
+                    self.write(f"Heartbeat #{len(sent)} | BPM: {bpm_avg:.1f}\r\n".encode())
+            self._seq += 1
+            self.sent_at.append(time.perf_counter())
+        if self.readings and len(sent) >= self.readings:
+            self.log("✅ 15 Heartbeats Recorded! Sending JSON...")
+            if self.protocol == "binary":
+                self.write(encode_batch(self._seq, sent))
+                self._seq += 1
+            if self.text_output:
+                self.log("📤 Sending Data to Streamlit...")
+                self.log(json.dumps({"readings": [round(v, 2) for v in sent]}))
+                self.log("✅ JSON Sent Successfully!")
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(1.0)
+        os.close(self._master)
+        os.close(self._slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual heart-rate sensor on a pseudo-terminal")
+    parser.add_argument("--protocol", choices=["binary", "text"], default="binary")
+    parser.add_argument("--raw", action="store_true", help="stream raw samples (RAW_MODE 1)")
+    parser.add_argument("--bpm", type=float, default=72)
+    parser.add_argument("--noise", type=float, default=5.0)
+    parser.add_argument("--rate", type=int, default=500, help="raw sample rate in Hz")
+    parser.add_argument("--dropout", type=float, default=0.0, help="chance a reading or block is lost")
+    parser.add_argument("--readings", type=int, default=0, help="stop after this many readings, 0 = forever")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression: BPM readings, or raw blocks sent faster than --rate")
+    parser.add_argument("--debug-text", action="store_true", help="also print the sketch's text messages")
+    parser.add_argument("--devices", type=int, default=1)
+    args = parser.parse_args()
+
+    devices = [
+        VirtualDevice(args.protocol, args.raw, args.bpm, args.noise, args.rate, args.dropout,
+                      args.readings, args.speed, args.debug_text, seed=i)
+        for i in range(args.devices)
+    ]
+    for device in devices:
+        device.start()
+        print(device.port, flush=True)
+    try:
+        while any(d.is_alive() for d in devices):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            device.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import argparse
+import logging
+import os
+import struct
+import uuid
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from heartbot.config import BPM_BUCKET_SIZE, BPM_ROLLUPS_ENABLED, CHAT_PAGE_SIZE
+from heartbot.crypto import DecryptionError, get_keyring
+
+log = logging.getLogger(__name__)
+
+# ====================== BPM TIME SERIES ======================
+# One document per (username, session) bucket of up to BPM_BUCKET_SIZE samples:
+#   {username, session, start, end, count, chunks: [encrypted [[ts, bpm], ...], ...]}
+# Chunks are encrypted one by one with the user's data key (heartbot.crypto).
+# Every save pushes encrypted chunks holding only the new samples, so the
+# cost of a save does not depend on how much history the user already has.
+# A save is cut into chunks of BPM_BUCKET_SIZE; a chunk joins the session's
+# open bucket only if it fits there (count <= BPM_BUCKET_SIZE - len(chunk)),
+# otherwise it starts a bucket of its own, so no bucket outgrows the size.
+
+def ensure_bpm_indexes(collection):
+    collection.create_index([("username", ASCENDING), ("session", ASCENDING), ("start", ASCENDING)])
+    collection.create_index([("username", ASCENDING), ("start", DESCENDING)])
+
+def new_session_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+def bpm_bucket_updates(keyring, username, session, samples):
+    # samples need not be sorted: backfilled readings arrive late
+    ops = []
+    for i in range(0, len(samples), BPM_BUCKET_SIZE):
+        chunk = samples[i:i + BPM_BUCKET_SIZE]
+        times = [t for t, _ in chunk]
+        ops.append(UpdateOne(
+            {"username": username, "session": session, "count": {"$lte": BPM_BUCKET_SIZE - len(chunk)}},
+            {
+                "$push": {"chunks": keyring.encrypt(username, [[t, bpm] for t, bpm in chunk])},
+                "$inc": {"count": len(chunk)},
+                "$min": {"start": datetime.fromtimestamp(min(times))},
+                "$max": {"end": datetime.fromtimestamp(max(times))},
+            },
+            upsert=True,
+        ))
+    return ops
+
+def append_bpm_samples(collection, username, session, samples):
+    # samples: [(unix_ts, bpm), ...] that have not been stored yet
+    if not samples:
+        return
+    keyring = get_keyring(collection.database)
+    collection.bulk_write(bpm_bucket_updates(keyring, username, session, samples), ordered=False)
+    update_rollups(collection.database, {username: samples})
+
+def append_bpm_batches(collection, batches):
+    # batches: {(username, session): [(unix_ts, bpm), ...]} written in one round trip
+    keyring = get_keyring(collection.database)
+    ops = [op for (username, session), samples in batches.items()
+           for op in bpm_bucket_updates(keyring, username, session, samples)]
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+        per_user = {}
+        for (username, _), samples in batches.items():
+            per_user.setdefault(username, []).extend(samples)
+        update_rollups(collection.database, per_user)
+
+def load_bpm_samples(collection, username, session=None, start=None, end=None):
+    query = {"username": username}
+    if session is not None:
+        query["session"] = session
+    if start is not None:
+        query["end"] = {"$gte": start}
+    if end is not None:
+        query["start"] = {"$lte": end}
+
+    keyring = get_keyring(collection.database)
+    samples = []
+    cursor = collection.find(query, {"chunks": 1}).sort([("session", ASCENDING), ("start", ASCENDING)])
+    for doc in cursor:
+        for chunk in doc.get("chunks", []):
+            samples.extend(keyring.decrypt(username, chunk))
+    # Backfilled readings can land in a later chunk than their neighbours
+    samples.sort(key=lambda s: s[0])
+    if start is not None or end is not None:
+        lo = start.timestamp() if start is not None else float("-inf")
+        hi = end.timestamp() if end is not None else float("inf")
+        samples = [s for s in samples if lo <= s[0] <= hi]
+    return [(t, bpm) for t, bpm in samples]
+
+def bpm_time_range(collection, username):
+    """(first start, last end) of the user's buckets as datetimes, or None."""
+    first = collection.find_one({"username": username}, {"start": 1}, sort=[("start", ASCENDING)])
+    if first is None:
+        return None
+    last = collection.find_one({"username": username}, {"end": 1}, sort=[("start", DESCENDING)])
+    return first["start"], last["end"]
+
+def latest_bpm_session(collection, username):
+    doc = collection.find_one({"username": username}, {"session": 1}, sort=[("start", DESCENDING)])
+    return doc["session"] if doc else None
+
+def list_bpm_sessions(collection, username):
+    pipeline = [
+        {"$match": {"username": username}},
+        {"$group": {"_id": "$session", "start": {"$min": "$start"}, "end": {"$max": "$end"}, "count": {"$sum": "$count"}}},
+        {"$sort": {"start": DESCENDING}},
+    ]
+    return [
+        {"session": d["_id"], "start": d["start"], "end": d["end"], "count": d["count"]}
+        for d in collection.aggregate(pipeline)
+    ]
+
+# ====================== BPM ROLLUPS ======================
+# {username, res, t, count, sum, min, max} per hour and UTC day, t being the
+# period start in unix seconds. Every save adds its readings with one
+# $inc/$min/$max upsert per touched period, all in one bulk write, so the
+# history view never has to scan raw readings for long spans. Rollups are not
+# encrypted, or they could not be updated in place, so they stop at an hour:
+# a minute holds about as many readings as it would aggregate, and would give
+# the encrypted series away. Per-minute views are grouped from the readings
+# when read (heartbot.history). Being health data in clear, rollups are off
+# unless BPM_ROLLUPS_ENABLED=true.
+
+BPM_ROLLUPS = "bpm_rollups"
+ROLLUP_SECONDS = {"hour": 3600, "day": 86400}
+
+def ensure_rollup_indexes(collection):
+    collection.create_index([("username", ASCENDING), ("res", ASCENDING), ("t", ASCENDING)], unique=True)
+
+def aggregate_periods(times, bpms, seconds):
+    """Group readings by period of `seconds`: period starts, count, sum, min, max."""
+    times, bpms = np.asarray(times, dtype=np.float64), np.asarray(bpms, dtype=np.float64)
+    periods = (times // seconds).astype(np.int64) * seconds
+    order = np.argsort(periods, kind="stable")
+    keys, starts = np.unique(periods[order], return_index=True)
+    values = bpms[order]
+    if not len(values):
+        empty = np.empty(0)
+        return keys, empty, empty, empty, empty
+    counts = np.diff(np.append(starts, len(values)))
+    return (keys, counts, np.add.reduceat(values, starts), np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts))
+
+def rollup_updates(username, times, bpms):
+    ops = []
+    for res, seconds in ROLLUP_SECONDS.items():
+        keys, counts, sums, lows, highs = aggregate_periods(times, bpms, seconds)
+        ops.extend(
+            UpdateOne({"username": username, "res": res, "t": int(t)},
+                      {"$inc": {"count": int(c), "sum": float(total)}, "$min": {"min": float(lo)}, "$max": {"max": float(hi)}},
+                      upsert=True)
+            for t, c, total, lo, hi in zip(keys, counts, sums, lows, highs)
+        )
+    return ops
+
+def update_rollups(database, per_user):
+    # per_user: {username: [(unix_ts, bpm), ...]}
+    if not BPM_ROLLUPS_ENABLED:
+        return
+    ops = []
+    for username, samples in per_user.items():
+        if samples:
+            times, bpms = zip(*samples)
+            ops.extend(rollup_updates(username, times, bpms))
+    if not ops:
+        return
+    try:
+        database[BPM_ROLLUPS].bulk_write(ops, ordered=False)
+    except PyMongoError as e:
+        # The readings are already stored; failing here would make callers
+        # retry and store them twice. python -m heartbot.history rebuild repairs.
+        log.error("rollup update failed (%s), rollups are behind the readings", e)
+
+def load_rollups(database, username, res, lo, hi):
+    """Rollups of one resolution with lo <= t < hi: arrays t, count, mean, min, max."""
+    docs = list(database[BPM_ROLLUPS].find(
+        {"username": username, "res": res, "t": {"$gte": int(lo // ROLLUP_SECONDS[res] * ROLLUP_SECONDS[res]), "$lt": hi}},
+        {"_id": 0, "t": 1, "count": 1, "sum": 1, "min": 1, "max": 1},
+    ).sort("t", ASCENDING))
+    count = np.array([d["count"] for d in docs], dtype=np.float64)
+    return {
+        "t": np.array([d["t"] for d in docs], dtype=np.float64),
+        "count": count,
+        "mean": np.array([d["sum"] for d in docs], dtype=np.float64) / np.maximum(count, 1),
+        "min": np.array([d["min"] for d in docs], dtype=np.float64),
+        "max": np.array([d["max"] for d in docs], dtype=np.float64),
+    }
+
+# ====================== CHAT MESSAGES ======================
+# One small document per message: {username, timestamp, msg: encrypted [role, text]}.
+# Pages are read newest-first using _id as the cursor, so opening the chat
+# never touches more than one page regardless of history length.
+
+def ensure_chat_indexes(collection):
+    collection.create_index([("username", ASCENDING), ("_id", DESCENDING)])
+
+def append_chat_messages(collection, username, messages):
+    # messages: [(role, text), ...] written with a single insert
+    keyring = get_keyring(collection.database)
+    now = datetime.now()
+    collection.insert_many([
+        {"username": username, "timestamp": now, "msg": keyring.encrypt(username, [role, text])}
+        for role, text in messages
+    ])
+
+def load_chat_page(collection, username, before=None, limit=CHAT_PAGE_SIZE):
+    """Return (messages oldest-first, cursor for the next older page or None)."""
+    query = {"username": username}
+    if before is not None:
+        query["_id"] = {"$lt": before}
+    docs = list(collection.find(query, {"msg": 1}).sort("_id", DESCENDING).limit(limit))
+    docs.reverse()
+    keyring = get_keyring(collection.database)
+    messages = [tuple(keyring.decrypt(username, d["msg"])) for d in docs]
+    cursor = docs[0]["_id"] if len(docs) == limit else None
+    return messages, cursor
+
+# ====================== LEGACY MIGRATION ======================
+# Older versions kept one document per user holding the whole history as a
+# single Fernet blob, rewritten on every save:
+#   bpm_readings {username, timestamp (last save), readings: Fernet(json [bpm, ...])}
+#   chat_history {username, timestamp (last save), chat: Fernet(json [[role, text], ...])}
+# python -m heartbot.storage migrate turns each readings blob into one session
+# of buckets, the readings dated one second apart and ending at the last save
+# (the old format has no timestamps), and each chat blob into one document per
+# message. Migrated documents are marked, not deleted, so the command can be
+# run again. A run interrupted halfway is redone from the legacy document, and
+# the user's rollups are rebuilt from the buckets so nothing is counted twice.
+
+LEGACY_BPM_READINGS = "bpm_readings"
+LEGACY_CHAT_HISTORY = "chat_history"
+
+def migrate_legacy_bpm(legacy, buckets):
+    """Copy every unmigrated legacy BPM document into `buckets`; returns the number migrated."""
+    keyring = get_keyring(buckets.database)
+    migrated = 0
+    for doc in legacy.find({"migrated_at": {"$exists": False}}):
+        username = doc["username"]
+        try:
+            bpms = keyring.decrypt(username, doc["readings"]) if doc.get("readings") else []
+        except DecryptionError as e:
+            log.error("bpm_readings of %r not migrated: %s", username, e)
+            continue
+        saved = doc.get("timestamp") or doc["_id"].generation_time
+        session = f"legacy-{saved:%Y%m%d-%H%M%S}"
+        if bpms:
+            end = saved.timestamp()
+            samples = [(end - (len(bpms) - 1 - i), float(bpm)) for i, bpm in enumerate(bpms)]
+            # A run interrupted after this point left a partial session: start it over
+            partial = buckets.delete_many({"username": username, "session": session}).deleted_count
+            append_bpm_samples(buckets, username, session, samples)
+            if partial and BPM_ROLLUPS_ENABLED:
+                # Its readings are in the rollups twice now
+                from heartbot.history import rebuild
+
+                rebuild(buckets, [username])
+        legacy.update_one({"_id": doc["_id"]}, {"$set": {"migrated_at": datetime.now(), "session": session}})
+        migrated += 1
+    return migrated
+
+def _legacy_ids(saved, n):
+    # ObjectIds dated at the legacy save and increasing, so the messages page
+    # in in their old order and before anything written since the upgrade
+    prefix = struct.pack(">I", int(saved.timestamp())) + os.urandom(5)
+    return [ObjectId(prefix + i.to_bytes(3, "big")) for i in range(n)]
+
+def migrate_legacy_chat(legacy, messages):
+    """Copy every unmigrated legacy chat document into `messages`; returns the number migrated."""
+    keyring = get_keyring(messages.database)
+    migrated = 0
+    for doc in legacy.find({"migrated_at": {"$exists": False}}):
+        username = doc["username"]
+        try:
+            chat = keyring.decrypt(username, doc["chat"]) if doc.get("chat") else []
+        except DecryptionError as e:
+            log.error("chat_history of %r not migrated: %s", username, e)
+            continue
+        saved = doc.get("timestamp") or doc["_id"].generation_time
+        # A run interrupted after this point left some of the messages: start over
+        messages.delete_many({"legacy": doc["_id"]})
+        if chat:
+            messages.insert_many([
+                {"_id": _id, "username": username, "timestamp": saved, "msg": keyring.encrypt(username, [role, text]),
+                 "legacy": doc["_id"]}
+                for _id, (role, text) in zip(_legacy_ids(saved, len(chat)), chat)
+            ])
+        legacy.update_one({"_id": doc["_id"]}, {"$set": {"migrated_at": datetime.now()}})
+        migrated += 1
+    return migrated
+
+
+def main():
+    # python -m heartbot.storage migrate
+    parser = argparse.ArgumentParser(description="Move data saved by older versions into the current collections.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.parse_args()
+
+    from heartbot.db import BPM_BUCKETS, CHAT_MESSAGES, USERS, dedupe_users, get_db
+
+    db = get_db()
+    print(f"{USERS}: {dedupe_users(db)} duplicate accounts moved aside")
+    print(f"{LEGACY_BPM_READINGS}: {migrate_legacy_bpm(db[LEGACY_BPM_READINGS], db[BPM_BUCKETS])} users migrated")
+    print(f"{LEGACY_CHAT_HISTORY}: {migrate_legacy_chat(db[LEGACY_CHAT_HISTORY], db[CHAT_MESSAGES])} users migrated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ====================== LIVE CHARTS ======================
+# Points are buffered with append() and only pushed to the browser by
+# flush(), which the caller runs at most once per frame (see FrameClock), so
+# bursts of points between frames go out as a single redraw. Every redraw
+# sends the whole window: Streamlit has no incremental chart update
+# (add_rows() is gone), so the window is what bounds the cost per frame.
+# LineStream and PlotlyStream plot BPM readings, one per beat. WaveformStream
+# plots the raw sensor samples (hundreds per second) of the last few seconds,
+# thinned to the min and max of equal bins so a redraw never sends more than a
+# fixed number of points and no peak is lost. Both line charts reuse one
+# fixed Vega-Lite spec: st.line_chart rebuilds an Altair chart on every call,
+# about 70 ms per redraw, against 1-2 ms for st.vega_lite_chart.
+
+
+class FrameClock:
+    def __init__(self, fps):
+        self.interval = 1.0 / fps
+        self._next = time.monotonic()
+
+    def tick(self):
+        """Sleep until the next frame is due."""
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic())
+
+
+def line_spec(x_title, y_title, color, height):
+    return {
+        "mark": {"type": "line", "color": color},
+        "encoding": {
+            "x": {"field": "x", "type": "quantitative", "title": x_title},
+            "y": {"field": "y", "type": "quantitative", "title": y_title, "scale": {"zero": False}},
+        },
+        "height": height,
+    }
+
+
+class LineStream:
+    # Vega-Lite line of the last `window` points, a few KB of data per redraw
+    def __init__(self, x, y, window, label="BPM"):
+        self.label = label
+        self._spec = line_spec("Beat #", label, "#f72585", 400)
+        self._window = deque(zip(x, y), maxlen=window)
+        self._pending = []
+        self._stale = False
+        self._placeholder = st.empty()
+        self._redraw()
+
+    def _redraw(self):
+        frame = pd.DataFrame(list(self._window), columns=["x", "y"])
+        self._placeholder.vega_lite_chart(frame, self._spec, width="stretch")
+
+    def append(self, x, y):
+        self._pending.append((x, y))
+
+    def reset(self, x, y):
+        # Replaces the window, pending points included; drawn by the next flush()
+        self._window = deque(zip(x, y), maxlen=self._window.maxlen)
+        self._pending = []
+        self._stale = True
+
+    def flush(self):
+        if self._pending or self._stale:
+            self._window.extend(self._pending)
+            self._pending = []
+            self._stale = False
+            self._redraw()
+
+
+class PlotlyStream:
+    # Plotly figure of the window: heavier than LineStream, with markers and hover
+    def __init__(self, x, y, window, label="BPM"):
+        self.label = label
+        self._window = deque(zip(x, y), maxlen=window)
+        self._pending = []
+        self._stale = False
+        self._placeholder = st.empty()
+        self._redraw()
+
+    def _redraw(self):
+        import plotly.graph_objects as go
+
+        fig = go.Figure().update_layout(
+            xaxis_title="Beat #", yaxis_title=self.label, template="plotly_dark",
+            height=400, margin=dict(l=20, r=20, t=30, b=20)
+        )
+        fig.add_trace(go.Scatter(
+            x=[x for x, _ in self._window],
+            y=[y for _, y in self._window],
+            mode='lines+markers',
+            name='Heart Rate',
+            line=dict(color='#f72585')
+        ))
+        self._placeholder.plotly_chart(fig, width="stretch")
+
+    def append(self, x, y):
+        self._pending.append((x, y))
+
+    def reset(self, x, y):
+        # Replaces the window, pending points included; drawn by the next flush()
+        self._window = deque(zip(x, y), maxlen=self._window.maxlen)
+        self._pending = []
+        self._stale = True
+
+    def flush(self):
+        if self._pending or self._stale:
+            self._window.extend(self._pending)
+            self._pending = []
+            self._stale = False
+            self._redraw()
+
+
+def min_max(y, n):
+    """Indices of the min and max of each of n // 2 equal bins of y, in order."""
+    size, bins = len(y), n // 2
+    if size <= n or bins < 1:
+        return np.arange(size)
+    width = -(-size // bins)
+    binned = np.pad(y, (0, width * bins - size), mode="edge").reshape(bins, width)
+    offsets = np.arange(bins) * width
+    picked = np.concatenate([offsets + binned.argmin(axis=1), offsets + binned.argmax(axis=1)])
+    return np.unique(np.minimum(picked, size - 1))
+
+
+class WaveformStream:
+    # Raw samples over the last `seconds`, x in seconds before the newest one.
+    # `blocks` is a deque of (t0, sample_rate, samples) owned by the caller, so
+    # the window survives fragment reruns; it is trimmed here as blocks arrive.
+    def __init__(self, blocks, seconds, max_points, label="Signal"):
+        self.seconds = seconds
+        self.max_points = max_points
+        self._spec = line_spec("Seconds", label, "#00b4d8", 200)
+        self._blocks = blocks
+        self._pending = []
+        self._placeholder = st.empty()
+        if blocks:
+            self._redraw()
+
+    def _redraw(self):
+        t = np.concatenate([t0 + np.arange(len(samples)) / rate for t0, rate, samples in self._blocks])
+        y = np.concatenate([samples for _, _, samples in self._blocks])
+        picked = min_max(y, self.max_points)
+        frame = pd.DataFrame({"x": np.round(t[picked] - t[-1], 3), "y": y[picked]})
+        with self._placeholder.container():
+            st.caption("Raw sensor signal")
+            st.vega_lite_chart(frame, self._spec, width="stretch")
+
+    def append(self, t0, rate, samples):
+        self._pending.append((t0, rate, samples))
+
+    def flush(self):
+        if self._pending:
+            self._blocks.extend(self._pending)
+            self._pending = []
+            _, rate, samples = self._blocks[-1]
+            cutoff = self._blocks[-1][0] + len(samples) / rate - self.seconds
+            while self._blocks[0][0] + len(self._blocks[0][2]) / self._blocks[0][1] < cutoff:
+                self._blocks.popleft()
+            self._redraw()
+
+
+def make_stream(mode, x, y, window, label="BPM"):
+    # "stream" is the old name of "window"
+    if mode == "plotly":
+        return PlotlyStream(x, y, window, label)
+    return LineStream(x, y, window, label)
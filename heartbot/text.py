@@ -0,0 +1,68 @@
+import threading
+from functools import lru_cache
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+
+from heartbot.config import LEMMA_CACHE_SIZE, PREPROCESS_CACHE_SIZE
+from heartbot.metrics import timed
+
+# ====================== NLTK DATA ======================
+def ensure_nltk_data():
+    try:
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('corpora/stopwords')
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+        nltk.download('stopwords', quiet=True)
+        nltk.download('wordnet', quiet=True)
+
+# ====================== PREPROCESSING ======================
+# Same output as lowercasing, word_tokenize, dropping non-alphanumeric tokens
+# and English stopwords, then WordNet-lemmatizing what is left. The stopword
+# set and lemmatizer are built once, and lemmas and whole results are
+# memoized, so repeated words and repeated questions skip WordNet entirely.
+
+
+class TextPreprocessor:
+    def __init__(self, lemma_cache_size=LEMMA_CACHE_SIZE, text_cache_size=PREPROCESS_CACHE_SIZE):
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.lemmatize = lru_cache(maxsize=lemma_cache_size)(WordNetLemmatizer().lemmatize)
+        self.preprocess = lru_cache(maxsize=text_cache_size)(self._preprocess)
+
+    def _preprocess(self, text):
+        stop_words = self.stop_words
+        lemmatize = self.lemmatize
+        return ' '.join([lemmatize(t) for t in word_tokenize(text.lower()) if t.isalnum() and t not in stop_words])
+
+    def __call__(self, text):
+        return self.preprocess(text)
+
+    def batch(self, texts):
+        preprocess = self.preprocess
+        return [preprocess(t) for t in texts]
+
+    def cache_info(self):
+        return {"lemmas": self.lemmatize.cache_info(), "texts": self.preprocess.cache_info()}
+
+
+_preprocessor = None
+_preprocessor_lock = threading.Lock()
+
+def get_preprocessor():
+    global _preprocessor
+    if _preprocessor is None:
+        with _preprocessor_lock:
+            if _preprocessor is None:
+                _preprocessor = TextPreprocessor()
+    return _preprocessor
+
+def preprocess_input(text):
+    with timed("preprocess"):
+        return get_preprocessor()(text)
+
+def preprocess_batch(texts):
+    return get_preprocessor().batch(texts)
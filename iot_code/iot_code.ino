@@ -16,6 +16,31 @@ int bpmCount = 0;
 int accurateReadings = 0;
 float bpmReadings15[15];  // to store 15 valid readings
 
+// ---------- SERIAL PROTOCOL ----------
+// 1 = binary frames (see heartbot/protocol.py), 0 = the old text lines.
+// DEBUG_TEXT = 1 keeps the human-readable messages in binary mode; the
+// dashboard skips them between frames.
+#define BINARY_PROTOCOL 1
+#define DEBUG_TEXT 0
+#define TEXT_OUTPUT (!BINARY_PROTOCOL || DEBUG_TEXT)
+#define LOG(msg) do { if (TEXT_OUTPUT) Serial.println(msg); } while (0)
+
+const uint8_t FRAME_VERSION = 1;
+const uint8_t FRAME_BPM = 0x01;
+const uint8_t FRAME_RAW = 0x02;
+const uint8_t FRAME_BATCH = 0x03;
+uint16_t frameSeq = 0;
+
+// ---------- RAW STREAM MODE ----------
+// 1 = stream raw analogRead() samples so the dashboard detects beats (and HRV)
+// itself.
+#define RAW_MODE 0
+const unsigned long RAW_RATE_HZ = 500;
+const int RAW_BLOCK = 25;          // samples per RAW frame / "RAW:" line
+int rawBlock[RAW_BLOCK];
+int rawCount = 0;
+unsigned long nextSampleUs = 0;
+
 // ---------- BUZZER + LED SETUP ----------
 int buzzer = 8;
 int led1 = 4;
@@ -28,7 +53,7 @@ bool buttonPressed = false;
 
 // ---------- SETUP ----------
 void setup() {
-  Serial.begin(9600);
+  Serial.begin((BINARY_PROTOCOL || RAW_MODE) ? 115200 : 9600);
   pinMode(sensorPin, INPUT);
   pinMode(buzzer, OUTPUT);
   pinMode(led1, OUTPUT);
@@ -37,10 +62,68 @@ void setup() {
 
   for (int i = 0; i < samples; i++) readings[i] = 0;
 
-  Serial.println("💓 System Ready! Press the button to start measuring...");
+  LOG("💓 System Ready! Press the button to start measuring...");
+}
+
+// ----------- BINARY FRAMES -----------
+// A5 5A | version | type | seq (u16) | length (u16) | payload | CRC-16/CCITT-FALSE
+uint16_t crc16(const uint8_t *data, uint16_t len, uint16_t crc) {
+  for (uint16_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void putU16(uint8_t *out, uint16_t v) {
+  out[0] = v & 0xFF;
+  out[1] = v >> 8;
+}
+
+void sendFrame(uint8_t type, const uint8_t *payload, uint16_t len) {
+  uint8_t header[8] = {0xA5, 0x5A, FRAME_VERSION, type};
+  putU16(header + 4, frameSeq++);
+  putU16(header + 6, len);
+  uint16_t crc = crc16(header + 2, 6, 0xFFFF);
+  crc = crc16(payload, len, crc);
+  uint8_t tail[2];
+  putU16(tail, crc);
+
+  Serial.write(header, sizeof(header));
+  Serial.write(payload, len);
+  Serial.write(tail, sizeof(tail));
+}
+
+void sendBpmFrame(float value) {
+  uint8_t payload[6];
+  unsigned long now = millis();
+  payload[0] = now & 0xFF;
+  payload[1] = (now >> 8) & 0xFF;
+  payload[2] = (now >> 16) & 0xFF;
+  payload[3] = (now >> 24) & 0xFF;
+  putU16(payload + 4, (uint16_t)(value * 10 + 0.5));
+  sendFrame(FRAME_BPM, payload, sizeof(payload));
+}
+
+void sendRawFrame() {
+  uint8_t payload[4 + 2 * RAW_BLOCK];
+  putU16(payload, RAW_RATE_HZ);
+  putU16(payload + 2, RAW_BLOCK);
+  for (int i = 0; i < RAW_BLOCK; i++) putU16(payload + 4 + 2 * i, rawBlock[i]);
+  sendFrame(FRAME_RAW, payload, sizeof(payload));
 }
 
-// ----------- SEND JSON FUNCTION (no encryption) -----------
+// All 15 readings in one frame, so the dashboard can fill in lost BPM frames
+void sendBatchFrame() {
+  uint8_t payload[2 + 2 * 15];
+  putU16(payload, 15);
+  for (int i = 0; i < 15; i++) putU16(payload + 2 + 2 * i, (uint16_t)(bpmReadings15[i] * 10 + 0.5));
+  sendFrame(FRAME_BATCH, payload, sizeof(payload));
+}
+
+// ----------- SEND JSON FUNCTION (no encryption, text protocol only) -----------
 void sendPlainJSON() {
   StaticJsonDocument<512> doc;
   for (int i = 0; i < 15; i++) {
@@ -64,12 +147,39 @@ void resetMeasurement() {
   sum = 0;
   for (int i = 0; i < 15; i++) bpmReadings15[i] = 0;
   for (int i = 0; i < samples; i++) readings[i] = 0;
+  rawCount = 0;
+  nextSampleUs = micros();
 
   digitalWrite(buzzer, LOW);
   digitalWrite(led1, LOW);
   digitalWrite(led2, LOW);
 
-  Serial.println("🔁 Restarted Heartbeat Measurement!");
+  LOG("🔁 Restarted Heartbeat Measurement!");
+  if (RAW_MODE && !BINARY_PROTOCOL) {
+    Serial.print("RATE:");
+    Serial.println(RAW_RATE_HZ);
+  }
+}
+
+// ----------- RAW SAMPLE STREAM -----------
+void streamRawSample() {
+  // Fixed-rate sampling; beat detection happens on the dashboard
+  if ((long)(micros() - nextSampleUs) < 0) return;
+  nextSampleUs += 1000000UL / RAW_RATE_HZ;
+
+  rawBlock[rawCount++] = analogRead(sensorPin);
+  if (rawCount == RAW_BLOCK && BINARY_PROTOCOL) {
+    sendRawFrame();
+    rawCount = 0;
+  } else if (rawCount == RAW_BLOCK) {
+    Serial.print("RAW:");
+    for (int i = 0; i < RAW_BLOCK; i++) {
+      if (i) Serial.print(',');
+      Serial.print(rawBlock[i]);
+    }
+    Serial.println();
+    rawCount = 0;
+  }
 }
 
 // ----------- MAIN LOOP -----------
@@ -82,13 +192,19 @@ void loop() {
 
     heartMonitorActive = true;
     resetMeasurement();  // restart from beginning
-    Serial.println("🫀 Button Pressed → Starting 15 Heartbeat Readings!");
+    LOG("🫀 Button Pressed → Starting 15 Heartbeat Readings!");
   }
 
   if (buttonState == HIGH) {
     buttonPressed = false;
   }
 
+  // ---- Raw Stream (host-side detection) ----
+  if (heartMonitorActive && RAW_MODE) {
+    streamRawSample();
+    return;
+  }
+
   // ---- Heartbeat Measurement Logic ----
   if (heartMonitorActive) {
     int sensorValue = analogRead(sensorPin);
@@ -113,10 +229,13 @@ void loop() {
           if (accurateReadings < 15) {
             bpmReadings15[accurateReadings] = bpmAvg;
             accurateReadings++;
-            Serial.print("Heartbeat #");
-            Serial.print(accurateReadings);
-            Serial.print(" | BPM: ");
-            Serial.println(bpmAvg, 1);
+            if (BINARY_PROTOCOL) sendBpmFrame(bpmAvg);
+            if (TEXT_OUTPUT) {
+              Serial.print("Heartbeat #");
+              Serial.print(accurateReadings);
+              Serial.print(" | BPM: ");
+              Serial.println(bpmAvg, 1);
+            }
           }
         }
       }
@@ -129,8 +248,9 @@ void loop() {
 
     if (accurateReadings >= 15) {
       heartMonitorActive = false;
-      Serial.println("✅ 15 Heartbeats Recorded! Sending JSON...");
-      sendPlainJSON();
+      LOG("✅ 15 Heartbeats Recorded! Sending JSON...");
+      if (BINARY_PROTOCOL) sendBatchFrame();
+      if (TEXT_OUTPUT) sendPlainJSON();
 
       // Buzzer + LED Sequence
       for (int i = 0; i < 15; i++) {
@@ -143,7 +263,7 @@ void loop() {
       }
 
       digitalWrite(led2, HIGH);
-      Serial.println("🔔 Buzzer Done! LED2 ON (Process Complete)");
+      LOG("🔔 Buzzer Done! LED2 ON (Process Complete)");
     }
 
     delay(10);
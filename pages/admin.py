@@ -0,0 +1,86 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from heartbot.config import ADMIN_USERS, METRICS_HOST, METRICS_PORT, PROFILE_MAX_SECONDS, PROFILE_INTERVAL_MS
+from heartbot.metrics import counters, gauges, stage_percentiles
+from heartbot.profiler import start_profile
+
+# ====================== PAGE CONFIG ======================
+st.set_page_config(page_title="HeartBot | Admin", page_icon="Heart", layout="wide")
+st.markdown("<style>[data-testid='stSidebarNav'] {display: none;}</style>", unsafe_allow_html=True)
+
+# ====================== ACCESS CHECK ======================
+if not st.session_state.get("logged_in") or st.session_state.get("username") not in ADMIN_USERS:
+    st.error("This page is for administrators (ADMIN_USERS).")
+    st.page_link("app.py", label="Back to the dashboard")
+    st.stop()
+
+st.title("Metrics & profiling")
+st.page_link("app.py", label="Back to the dashboard", icon="⬅️")
+if METRICS_PORT:
+    st.caption(f"Prometheus scrapes the same numbers from http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+# ====================== LIVE PERCENTILES ======================
+# Over the last METRICS_WINDOW timings of each stage in this process, every
+# session and background thread included. Refreshing reruns only the fragment.
+live = st.toggle("Refresh every 2 s", value=True)
+
+@st.fragment(run_every=2 if live else None)
+def stage_table():
+    rows = [{"stage": name, **row} for name, row in stage_percentiles().items()]
+    if not rows:
+        st.info("Nothing timed yet.")
+    else:
+        st.dataframe(rows, hide_index=True, width="stretch", column_config={
+            column: st.column_config.NumberColumn(format="%.3f") for column in ["mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+        })
+    col1, col2 = st.columns(2)
+    col1.subheader("Counters")
+    col1.dataframe([{"name": k, "value": v} for k, v in sorted(counters().items())], hide_index=True, width="stretch")
+    col2.subheader("Queue depths")
+    col2.dataframe([{"name": k, "value": v} for k, v in sorted(gauges().items())], hide_index=True, width="stretch")
+
+stage_table()
+
+# ====================== SAMPLING PROFILER ======================
+# Off until started here. "This session" samples only the script threads of
+# your own browser session: start it, go back to the dashboard and use it,
+# then come back for the dump.
+st.subheader("Sampling profiler")
+col1, col2 = st.columns(2)
+seconds = col1.slider("Seconds", 1, PROFILE_MAX_SECONDS, min(10, PROFILE_MAX_SECONDS))
+scope = col2.radio("Threads", ["This session", "Whole process"], horizontal=True)
+
+if st.button("Start profiling"):
+    session_id = get_script_run_ctx().session_id
+
+    def this_session(thread):
+        ctx = getattr(thread, "streamlit_script_run_ctx", None)
+        return ctx is not None and ctx.session_id == session_id
+
+    profiler = start_profile(seconds, this_session if scope == "This session" else None)
+    if profiler is None:
+        st.warning("Another profile is running, try again when it is done.")
+    else:
+        st.session_state.profiler = profiler
+        st.rerun()
+
+profiling = st.session_state.get("profiler") is not None and st.session_state.profiler.is_alive()
+
+@st.fragment(run_every=1 if profiling else None)
+def profile_result():
+    profiler = st.session_state.get("profiler")
+    if profiler is None:
+        return
+    if profiler.is_alive():
+        st.progress(profiler.progress, text=f"Sampling every {PROFILE_INTERVAL_MS:g} ms…")
+        return
+    if profiling:
+        st.rerun()  # done: redraw the page once, without the 1 s poll
+    st.caption(f"{profiler.samples} samples over {profiler.seconds} s")
+    st.dataframe([{"function": f, "self samples": own, "total samples": total}
+                  for f, own, total in profiler.top_functions()], hide_index=True, width="stretch")
+    st.download_button("Download folded stacks (speedscope, flamegraph.pl)", data=profiler.folded(),
+                       file_name="heartbot_profile.folded", mime="text/plain", on_click="ignore")
+
+profile_result()
@@ -0,0 +1,56 @@
+import streamlit as st
+
+from heartbot.chatbot import get_chatbot
+from heartbot.config import ADMIN_USERS, CURATOR_USERS, LEARNED_FAQ_REVIEW_SIZE
+from heartbot.db import LEARNED_FAQ, get_db
+from heartbot.learned_faq import top_open
+
+# ====================== PAGE CONFIG ======================
+st.set_page_config(page_title="HeartBot | Unanswered questions", page_icon="Heart", layout="wide")
+st.markdown("<style>[data-testid='stSidebarNav'] {display: none;}</style>", unsafe_allow_html=True)
+
+# ====================== ACCESS CHECK ======================
+if not st.session_state.get("logged_in") or st.session_state.get("username") not in CURATOR_USERS + ADMIN_USERS:
+    st.error("This page is for curators (CURATOR_USERS).")
+    st.page_link("app.py", label="Back to the dashboard")
+    st.stop()
+
+db = get_db()
+bot = get_chatbot()
+
+st.title("Unanswered questions")
+st.page_link("app.py", label="Back to the dashboard", icon="⬅️")
+st.caption("Questions HeartBot could not answer, from every user, most asked first. Similar phrasings are "
+           "counted together. A published answer is served to everyone right away.")
+
+# ====================== REVIEW ======================
+# One indexed read of the top LEARNED_FAQ_REVIEW_SIZE open questions per run.
+def publish(entry_id):
+    answer = st.session_state[f"answer_{entry_id}"].strip()
+    if not answer:
+        return
+    if bot.publish(entry_id, answer, st.session_state.username):
+        st.toast("Answer published")
+    else:
+        st.toast("This question no longer exists, it was dropped to make room for newer ones.")
+
+def dismiss(entry_id):
+    bot.learned.dismiss(entry_id, st.session_state.username)
+
+if not bot.is_ready:
+    st.info("HeartBot is still loading, answers can be published once it is ready.")
+
+entries = top_open(db[LEARNED_FAQ], LEARNED_FAQ_REVIEW_SIZE)
+if not entries:
+    st.success("No unanswered questions.")
+for entry in entries:
+    with st.expander(f"**{entry['count']}×** {entry['question']}"):
+        st.caption(f"Last asked {entry['last_seen']:%Y-%m-%d %H:%M} · first asked {entry['first_seen']:%Y-%m-%d}")
+        for example in reversed(entry.get("examples", [])):
+            st.markdown(f"- {example}")
+        st.text_area("Answer", key=f"answer_{entry['_id']}")
+        col1, col2 = st.columns(2)
+        col1.button("Publish answer", key=f"publish_{entry['_id']}", on_click=publish, args=(entry["_id"],),
+                    disabled=not bot.is_ready, type="primary")
+        col2.button("Dismiss", key=f"dismiss_{entry['_id']}", on_click=dismiss, args=(entry["_id"],),
+                    disabled=not bot.is_ready)
@@ -1,25 +1,13 @@
 import streamlit as st
-from pymongo import MongoClient
-import bcrypt
-import os
-from dotenv import load_dotenv
+from heartbot.auth import AuthBusy, check_password, issue_token
+from heartbot.db import get_db, find_user, token_generation
 
 # ====================== ENV & DB ======================
-load_dotenv()
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/heartbot")
-DB_NAME = "heartbot_db"
-
-@st.cache_resource
-def get_mongo_client():
-    return MongoClient(MONGODB_URI)
-
-client = get_mongo_client()
-db = client[DB_NAME]
-users_collection = db["users"]
+db = get_db()
 
 def authenticate_user(username: str, password: str) -> bool:
-    user = users_collection.find_one({"username": username})
-    return user and bcrypt.checkpw(password.encode('utf-8'), user["password"])
+    user = find_user(db, username)
+    return user and check_password(password, user["password"])
 
 # ====================== PAGE CONFIG ======================
 st.set_page_config(page_title="HeartBot | Login", page_icon="Heart", layout="centered")
@@ -121,16 +109,20 @@ with st.container():
         submit = st.form_submit_button("Login")
 
         if submit:
-            if not username or not password:
-                st.error("Please fill both fields")
-            elif authenticate_user(username, password):
-                st.session_state.logged_in = True
-                st.session_state.username = username
-                st.success(f"Welcome, **{username}**!")
-                st.balloons()
-                st.switch_page("app.py")
-            else:
-                st.error("Invalid credentials")
+            try:
+                if not username or not password:
+                    st.error("Please fill both fields")
+                elif authenticate_user(username, password):
+                    st.session_state.logged_in = True
+                    st.session_state.username = username
+                    st.success(f"Welcome, **{username}**!")
+                    st.balloons()
+                    # The token in the dashboard URL keeps the user signed in across reloads
+                    st.switch_page("app.py", query_params={"session": issue_token(username, token_generation(db, username))})
+                else:
+                    st.error("Invalid credentials")
+            except AuthBusy:
+                st.warning("Lots of people are signing in right now. Please try again in a few seconds.")
 
     st.markdown("""
     <div class='link'>
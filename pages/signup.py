@@ -1,28 +1,11 @@
 import streamlit as st
-from pymongo import MongoClient
-import bcrypt
-import os
-from dotenv import load_dotenv
-import time
+from heartbot.auth import AuthBusy, hash_password
+from heartbot.db import get_db, create_user as insert_user
 
-load_dotenv()
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/heartbot")
-DB_NAME = "heartbot_db"
-
-@st.cache_resource
-def get_mongo_client():
-    return MongoClient(MONGODB_URI)
-
-client = get_mongo_client()
-db = client[DB_NAME]
-users_collection = db["users"]
-
-def hash_password(pw): return bcrypt.hashpw(pw.encode('utf-8'), bcrypt.gensalt(12))
+db = get_db()
 
 def create_user(u, p):
-    if users_collection.find_one({"username": u}): return False
-    users_collection.insert_one({"username": u, "password": hash_password(p), "created_at": time.time()})
-    return True
+    return insert_user(db, u, hash_password(p))
 
 st.set_page_config(page_title="HeartBot | Sign Up", page_icon="Heart", layout="centered")
 st.markdown("<style>[data-testid='stSidebarNav'] {display: none;}</style>", unsafe_allow_html=True)
@@ -128,12 +111,16 @@ with st.container():
                 st.error("Password must be at least 6 characters")
             elif p != cp:
                 st.error("Passwords do not match")
-            elif create_user(u, p):
-                st.success(f"Account created: **{u}**!")
-                st.balloons()
-                st.markdown("### [Go to Login →](./login)")
             else:
-                st.error("Username already taken")
+                try:
+                    if create_user(u, p):
+                        st.success(f"Account created: **{u}**!")
+                        st.balloons()
+                        st.markdown("### [Go to Login →](./login)")
+                    else:
+                        st.error("Username already taken")
+                except AuthBusy:
+                    st.warning("Lots of people are signing up right now. Please try again in a few seconds.")
 
     st.markdown("""
     <div class='link'>